@@ -0,0 +1,181 @@
+"""
+Load balancing of mowers over several Bluetooth adapters. A single
+controller only supports a handful of simultaneous connections, hosts
+with several adapters (hci0, hci1, ...) can connect to more mowers at
+once by spreading them out.
+
+This module only does the bookkeeping, the adapter name is passed to
+bleak by `BLEClient`, which makes it easy to test with fake adapters.
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# RSSI used for adapters that have not seen the mower
+UNKNOWN_RSSI = -127
+
+# How many dB of signal one existing connection on an adapter is worth
+# when choosing an adapter
+CONNECTION_PENALTY_DB = 6
+
+
+class Adapter:
+    def __init__(self, name: str, max_connections: int = 3):
+        self.name = name
+        self.max_connections = max_connections
+        self.connections = set()
+
+        self.failed = False
+        self.failed_at = None
+        self.consecutive_failures = 0
+        self.failures = 0
+
+    def has_capacity(self) -> bool:
+        return len(self.connections) < self.max_connections
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "max_connections": self.max_connections,
+            "failed": self.failed,
+            "failures": self.failures,
+        }
+
+
+class AdapterPool:
+    def __init__(
+        self,
+        adapters,
+        max_connections: int = 3,
+        failure_threshold: int = 3,
+        retry_after: float = 60.0,
+    ):
+        """
+        `adapters` is a list of adapter names, such as ["hci0", "hci1"].
+        An adapter is marked failed after `failure_threshold` consecutive
+        connection failures and is tried again after `retry_after` seconds.
+        """
+        if not adapters:
+            raise ValueError("At least one adapter is required")
+
+        self.adapters = {name: Adapter(name, max_connections) for name in adapters}
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+
+        # address -> adapter name
+        self.assignments = {}
+        # upper case address -> {adapter name: RSSI seen at scan time}
+        self.rssi = {}
+
+    @property
+    def capacity(self) -> int:
+        """Number of connections all adapters can hold together"""
+        return sum(a.max_connections for a in self.adapters.values())
+
+    def update_rssi(self, address: str, adapter: str, rssi: int) -> None:
+        """
+        Record the signal strength an adapter saw a mower with. A
+        `ScannerService` given this pool calls it for every advertisement.
+        """
+        self.rssi.setdefault(address.upper(), {})[adapter] = rssi
+
+    def _usable(self, adapter: Adapter) -> bool:
+        if adapter.failed:
+            if time.monotonic() - adapter.failed_at < self.retry_after:
+                return False
+            logger.info("Retrying failed adapter '%s'", adapter.name)
+            adapter.failed = False
+        return True
+
+    def assign(self, address: str) -> Adapter | None:
+        """
+        Choose the adapter to connect to a mower with. The adapter already
+        assigned to the mower is kept while it is usable, otherwise the
+        usable adapter with the best signal, less a penalty for each
+        connection it already holds, is chosen. Returns None if every
+        adapter is full or failed.
+        """
+        current = self.assignments.get(address)
+        if current is not None:
+            adapter = self.adapters[current]
+            if self._usable(adapter) and (
+                address in adapter.connections or adapter.has_capacity()
+            ):
+                adapter.connections.add(address)
+                return adapter
+            self.release(address)
+
+        rssi = self.rssi.get(address.upper(), {})
+        candidates = [
+            a for a in self.adapters.values() if self._usable(a) and a.has_capacity()
+        ]
+        if not candidates:
+            logger.error("No adapter available for mower '%s'", address)
+            return None
+
+        adapter = max(
+            candidates,
+            key=lambda a: (
+                rssi.get(a.name, UNKNOWN_RSSI)
+                - CONNECTION_PENALTY_DB * len(a.connections),
+                -len(a.connections),
+            ),
+        )
+        adapter.connections.add(address)
+        self.assignments[address] = adapter.name
+        return adapter
+
+    def release(self, address: str) -> None:
+        """The mower has disconnected, free its slot on the adapter"""
+        name = self.assignments.get(address)
+        if name is not None:
+            self.adapters[name].connections.discard(address)
+
+    def forget(self, address: str) -> None:
+        """Remove all knowledge of a mower"""
+        self.release(address)
+        self.assignments.pop(address, None)
+        self.rssi.pop(address.upper(), None)
+
+    def record_success(self, name: str) -> None:
+        self.adapters[name].consecutive_failures = 0
+
+    def record_failure(self, name: str) -> list:
+        """
+        Record a failed connection on an adapter. Returns the addresses
+        that were moved off the adapter if it has now been marked failed.
+        """
+        adapter = self.adapters[name]
+        adapter.failures += 1
+        adapter.consecutive_failures += 1
+        if adapter.consecutive_failures >= self.failure_threshold:
+            return self.mark_failed(name)
+        return []
+
+    def mark_failed(self, name: str) -> list:
+        """
+        Stop using an adapter. All mowers assigned to it are unassigned,
+        so their next `assign()` picks a healthy adapter. Returns their
+        addresses.
+        """
+        adapter = self.adapters[name]
+        logger.error("Adapter '%s' failed, rebalancing its mowers", name)
+        adapter.failed = True
+        adapter.failed_at = time.monotonic()
+        adapter.consecutive_failures = 0
+        adapter.connections.clear()
+
+        moved = [a for a, n in self.assignments.items() if n == name]
+        for address in moved:
+            del self.assignments[address]
+        return moved
+
+    def mark_recovered(self, name: str) -> None:
+        adapter = self.adapters[name]
+        adapter.failed = False
+        adapter.consecutive_failures = 0
+
+    def stats(self) -> dict:
+        return {name: adapter.stats() for name, adapter in self.adapters.items()}
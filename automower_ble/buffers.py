@@ -0,0 +1,130 @@
+"""
+Buffering of notifications received from the mower. Notifications are
+copied into a fixed pool of preallocated buffers, so memory use stays
+flat no matter how fast the mower sends data or how slow the reader is.
+"""
+
+import asyncio
+from collections import deque
+
+
+class BufferClosed(Exception):
+    """Raised to readers once the buffer has been closed"""
+
+
+class NotificationBuffer:
+    def __init__(self, capacity: int = 32, buffer_size: int = 20):
+        """
+        Create a buffer that holds up to `capacity` notifications, each
+        normally at most `buffer_size` bytes long. When full the oldest
+        notification is dropped and counted in `overflows`.
+        """
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1, got: " + str(capacity))
+
+        self.capacity = capacity
+        self._free = [bytearray(buffer_size) for _ in range(capacity)]
+        self._ready = deque()  # (buffer, length)
+        self._waiters = []
+        self._closed = False
+
+        self.received = 0
+        self.overflows = 0
+        self.flushed = 0
+
+    def __len__(self) -> int:
+        return len(self._ready)
+
+    def put_nowait(self, data) -> None:
+        """Store a notification, this never blocks"""
+        if self._closed:
+            return
+
+        if self._free:
+            buffer = self._free.pop()
+        else:
+            # Full, drop the oldest notification and reuse its buffer
+            buffer, _ = self._ready.popleft()
+            self.overflows += 1
+
+        length = len(data)
+        if length > len(buffer):
+            buffer = bytearray(length)
+        buffer[:length] = data
+
+        self._ready.append((buffer, length))
+        self.received += 1
+
+        self._wake(None)
+
+    async def read_into(self, data: bytearray, timeout: float) -> int:
+        """
+        Append the next notification to `data` and return its length.
+        Raises `asyncio.TimeoutError` if nothing arrives within `timeout`
+        seconds and `BufferClosed` if the buffer is closed.
+        """
+        deadline = None
+        # Another reader, or a clear(), may empty the buffer between the
+        # wakeup and this reader running, so check again every time
+        while not self._ready:
+            if self._closed:
+                raise BufferClosed()
+
+            loop = asyncio.get_running_loop()
+            if deadline is None:
+                deadline = loop.time() + timeout
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            handle = loop.call_at(deadline, _expire, waiter)
+            try:
+                await waiter
+            finally:
+                handle.cancel()
+                self._waiters.remove(waiter)
+
+        buffer, length = self._ready.popleft()
+        data += memoryview(buffer)[:length]
+        self._free.append(buffer)
+
+        return length
+
+    def clear(self) -> None:
+        """Drop all buffered notifications"""
+        while self._ready:
+            buffer, _ = self._ready.popleft()
+            self._free.append(buffer)
+            self.flushed += 1
+
+    def close(self) -> None:
+        """Drop all buffered notifications and fail any waiting reader"""
+        self._closed = True
+        self.clear()
+        self._wake(BufferClosed())
+
+    def open(self) -> None:
+        """Start accepting notifications again after `close()`"""
+        self._closed = False
+
+    def _wake(self, exception) -> None:
+        # Every reader is woken, those that find nothing wait again
+        for waiter in self._waiters:
+            if waiter.done():
+                continue
+            if exception is None:
+                waiter.set_result(None)
+            else:
+                waiter.set_exception(exception)
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "buffered": len(self._ready),
+            "received": self.received,
+            "overflows": self.overflows,
+            "flushed": self.flushed,
+        }
+
+
+def _expire(waiter):
+    if not waiter.done():
+        waiter.set_exception(asyncio.TimeoutError())
@@ -0,0 +1,691 @@
+"""
+Encoding and decoding of the Automower BLE protocol. This module does
+not depend on bleak, so it can be used on its own to build requests or
+decode captured traffic.
+"""
+
+import json
+import struct
+import zlib
+from collections import namedtuple
+from collections.abc import Mapping
+from enum import Enum
+from functools import lru_cache
+from importlib.resources import files
+from typing import NamedTuple
+
+from .helpers import crc
+
+# struct formats of the fixed size data types
+SCALAR_FORMATS = {
+    "uint8": "B",
+    "bool": "B",
+    "int8": "b",
+    "uint16": "H",
+    "int16": "h",
+    "uint32": "I",
+    "int32": "i",
+    "tUnixTime": "I",
+}
+
+
+class ModeOfOperation(Enum):
+    # ProtocolTypes$IMowerAppMowerMode, used in modeOfOperation: 4586, 1
+    # Comments from: https://developer.husqvarnagroup.cloud/apis/Automower+Connect+API?tab=status%20description%20and%20error%20codes#user-content-mode
+    AUTO = 0
+    MANUAL = 1
+    HOME = 2  # Mower goes home and parks forever. Week schedule is not used. Cannot be overridden with forced mowing.
+    DEMO = 3  # Same as main area, but shorter times. No blade operation
+    POI = 4
+
+
+class MowerState(Enum):
+    # ProtocolTypes$IMowerAppState, used in mowerState: 4586, 2
+    # Comments from: https://developer.husqvarnagroup.cloud/apis/Automower+Connect+API?tab=status%20description%20and%20error%20codes#user-content-state
+    OFF = 0  # Mower is turned off.
+    WAIT_FOR_SAFETYPIN = 1
+    STOPPED = 2  # Mower is stopped requires manual action.
+    FATAL_ERROR = 3
+    PENDING_START = 4
+    PAUSED = 5  # Mower has been paused by user.
+    IN_OPERATION = 6  # See value in activity for status.
+    RESTRICTED = (
+        7  # Mower can currently not mow due to week calender, or override park.
+    )
+    ERROR = 8  # An error has occurred. Check errorCode. Mower requires manual action.
+
+
+class MowerActivity(Enum):
+    # ProtocolTypes$IMowerAppActivity, used in mowerActivity: 4586, 3
+    # Comments from: https://developer.husqvarnagroup.cloud/apis/Automower+Connect+API?tab=status%20description%20and%20error%20codes#user-content-activity
+    NONE = 0
+    CHARGING = 1  # Mower is charging in station due to low battery.
+    GOING_OUT = 2
+    MOWING = 3  # Mower is mowing lawn. If in demo mode the blades are not in operation.
+    GOING_HOME = 4  # Mower is going home to the charging station.
+    PARKED = 5
+    STOPPED_IN_GARDEN = 6  # Mower has stopped. Needs manual action to resume
+
+
+class ResponseResult(Enum):
+    # Result byte of every response
+    OK = 0
+    UNKNOWN_ERROR = 1
+    INVALID_VALUE = 2
+    OUT_OF_RANGE = 3
+    NOT_AVAILABLE = 4
+    NOT_ALLOWED = 5
+    INVALID_GROUP = 6
+    INVALID_ID = 7
+    DEVICE_BUSY = 8
+    INVALID_PIN = 9
+    MOWER_BLOCKED = 10
+
+
+class TaskInformation(NamedTuple):
+    next_start_time: int
+    duration_in_seconds: int
+    on_monday: bool
+    on_tuesday: bool
+    on_wednesday: bool
+    on_thursday: bool
+    on_friday: bool
+    on_saturday: bool
+    on_sunday: bool
+
+
+class Record(tuple):
+    """
+    Base of the immutable, slotted records that responses are decoded
+    into. Fields can be read as attributes, or by name like a dict to
+    stay compatible with code written against the old dict responses.
+    Iterating a record yields its values, like any tuple.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                return tuple.__getitem__(self, self._fields.index(key))
+            except ValueError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def __contains__(self, key) -> bool:
+        if isinstance(key, str):
+            return key in self._fields
+        return tuple.__contains__(self, key)
+
+    def get(self, key: str, default=None):
+        if key in self._fields:
+            return self[key]
+        return default
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def items(self):
+        return zip(self._fields, self)
+
+
+def make_record(name: str, fields) -> type:
+    """Create a `Record` type with the given field names"""
+    base = namedtuple(name, fields)
+    return type(name, (Record, base), {"__slots__": ()})
+
+
+def jsonable(value):
+    """Convert a decoded response into something JSON can encode"""
+    if isinstance(value, Record):
+        return {k: jsonable(v) for k, v in value.items()}
+    if hasattr(value, "_asdict"):
+        # Other NamedTuples, such as TaskInformation
+        return {k: jsonable(v) for k, v in value._asdict().items()}
+    if isinstance(value, dict):
+        return {k: jsonable(v) for k, v in value.items()}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    return value
+
+
+def _record_name(command_name: str | None) -> str:
+    if command_name is None:
+        return "Response"
+    return command_name[0].upper() + command_name[1:] + "Response"
+
+
+class _Scalars:
+    """A run of fixed size values, decoded with a single struct"""
+
+    __slots__ = ("struct", "count")
+
+    def __init__(self, formats: str):
+        self.struct = struct.Struct("<" + formats)
+        self.count = len(formats)
+
+    def decode(self, data: memoryview, offset: int, values: list) -> int:
+        values.extend(self.struct.unpack_from(data, offset))
+        return offset + self.struct.size
+
+    def encode(self, values) -> bytes:
+        return self.struct.pack(*[next(values) for _ in range(self.count)])
+
+
+class _Array:
+    """
+    A repeated value, with either a fixed count or prefixed by a uint8 count
+    """
+
+    __slots__ = ("item_format", "count", "struct")
+
+    def __init__(self, item_format: str, count: int | None):
+        self.item_format = item_format
+        self.count = count
+        self.struct = None
+        if count is not None:
+            self.struct = struct.Struct("<%d%s" % (count, item_format))
+
+    def decode(self, data: memoryview, offset: int, values: list) -> int:
+        array_struct = self.struct
+        if array_struct is None:
+            array_struct = struct.Struct("<%d%s" % (data[offset], self.item_format))
+            offset += 1
+        values.append(array_struct.unpack_from(data, offset))
+        return offset + array_struct.size
+
+    def encode(self, values) -> bytes:
+        value = next(values)
+        if self.count is None:
+            return bytes([len(value)]) + struct.pack(
+                "<%d%s" % (len(value), self.item_format), *value
+            )
+        return self.struct.pack(*value)
+
+
+class _Blob:
+    """
+    A string or byte blob, with either a fixed length or prefixed by a
+    uint8 length. Byte blobs are returned as a memoryview of the frame.
+    """
+
+    __slots__ = ("length", "text")
+
+    def __init__(self, length: int | None, text: bool):
+        self.length = length
+        self.text = text
+
+    def decode(self, data: memoryview, offset: int, values: list) -> int:
+        length = self.length
+        if length is None:
+            length = data[offset]
+            offset += 1
+        if offset + length > len(data):
+            raise struct.error("blob extends past the end of the data")
+
+        value = data[offset : offset + length]
+        if self.text:
+            value = str(value, "utf-8", "replace")
+            if self.length is not None:
+                value = value.rstrip("\x00")
+        values.append(value)
+        return offset + length
+
+    def encode(self, values) -> bytes:
+        value = next(values)
+        if self.text:
+            value = value.encode("utf-8")
+        value = bytes(value)
+
+        if self.length is None:
+            if len(value) > 0xFF:
+                raise ValueError("Value is too long: %d bytes" % len(value))
+            return bytes([len(value)]) + value
+        if len(value) > self.length:
+            raise ValueError(
+                "Value is too long: %d bytes of %d" % (len(value), self.length)
+            )
+        return value.ljust(self.length, b"\x00")
+
+
+class Layout:
+    """
+    The compiled encoding of a list of protocol.json data types. Besides
+    the fixed size types in SCALAR_FORMATS these are supported:
+
+        "string" / "bytes"      prefixed by a uint8 length
+        "string:N" / "bytes:N"  exactly N bytes, strings are NUL padded
+        "<type>[N]"             N values of a fixed size type
+        "<type>[]"              prefixed by a uint8 count
+
+    If every type has a fixed size `struct` is the equivalent struct.
+    """
+
+    __slots__ = ("types", "struct", "_segments")
+
+    def __init__(self, types):
+        self.types = list(types)
+        self._segments = []
+
+        formats = ""
+        for dtype in self.types:
+            if dtype in SCALAR_FORMATS:
+                formats += SCALAR_FORMATS[dtype]
+                continue
+
+            if formats:
+                self._segments.append(_Scalars(formats))
+                formats = ""
+            self._segments.append(_compile_type(dtype))
+        if formats:
+            self._segments.append(_Scalars(formats))
+
+        self.struct = None
+        if all(isinstance(segment, _Scalars) for segment in self._segments):
+            self.struct = struct.Struct(
+                "<" + "".join(SCALAR_FORMATS[dtype] for dtype in self.types)
+            )
+
+    def unpack(self, data: memoryview) -> tuple:
+        """Decode all values, `data` must be exactly as long as the values"""
+        if self.struct is not None:
+            if self.struct.size != len(data):
+                raise ValueError(
+                    "Data length mismatch. Read %d bytes of %d"
+                    % (self.struct.size, len(data))
+                )
+            return self.struct.unpack_from(data)
+
+        values = []
+        offset = 0
+        try:
+            for segment in self._segments:
+                offset = segment.decode(data, offset, values)
+        except (struct.error, IndexError):
+            raise ValueError(
+                "Data length mismatch. Ran out of data at byte %d of %d"
+                % (offset, len(data))
+            ) from None
+        if offset != len(data):
+            raise ValueError(
+                "Data length mismatch. Read %d bytes of %d" % (offset, len(data))
+            )
+        return tuple(values)
+
+    def pack(self, values: list) -> bytes:
+        if self.struct is not None:
+            return self.struct.pack(*values)
+
+        values = iter(values)
+        return b"".join(segment.encode(values) for segment in self._segments)
+
+
+def _compile_type(dtype: str):
+    if dtype.endswith("]") and "[" in dtype:
+        base, _, count = dtype[:-1].partition("[")
+        if base in SCALAR_FORMATS and (count == "" or count.isdigit()):
+            return _Array(SCALAR_FORMATS[base], int(count) if count else None)
+
+    name, _, length = dtype.partition(":")
+    if name in ("string", "bytes") and (length == "" or length.isdigit()):
+        return _Blob(int(length) if length else None, name == "string")
+
+    raise ValueError("Unknown data type: " + dtype)
+
+
+class CommandSpec:
+    """
+    The channel independent description of a command from protocol.json.
+    Specs are built once per process by the `ProtocolRegistry` and shared
+    by every `Command` and client.
+    """
+
+    __slots__ = (
+        "name",
+        "major",
+        "minor",
+        "request_data_type",
+        "response_data_type",
+        "description",
+        "request_layout",
+        "response_layout",
+        "response_type",
+    )
+
+    def __init__(self, parameter: dict, name: str | None = None):
+        self.name = name
+        self.major = parameter["major"]
+        self.minor = parameter["minor"]
+        self.description = parameter.get("description")
+
+        if "requestType" in parameter:
+            self.request_data_type = parameter["requestType"]
+        else:
+            self.request_data_type = None
+
+        if not isinstance(parameter["responseType"], dict):  # Always wrap in list
+            self.response_data_type = {"response": parameter["responseType"]}
+        else:
+            self.response_data_type = parameter["responseType"]
+
+        self.response_layout = None
+        self.response_type = None
+        if "no_response" not in self.response_data_type.values():
+            self.response_layout = Layout(self.response_data_type.values())
+            self.response_type = make_record(
+                _record_name(name), self.response_data_type.keys()
+            )
+
+        self.request_layout = None
+        if self.request_data_type is not None:
+            self.request_layout = Layout(self.request_data_type.values())
+
+    @property
+    def request_struct(self) -> struct.Struct | None:
+        """The struct of the request parameters, if they have a fixed size"""
+        if self.request_layout is None:
+            return None
+        return self.request_layout.struct
+
+    @property
+    def response_struct(self) -> struct.Struct | None:
+        """The struct of the response data, if it has a fixed size"""
+        if self.response_layout is None:
+            return None
+        return self.response_layout.struct
+
+
+class ProtocolRegistry(Mapping):
+    """All commands of protocol.json, by name"""
+
+    def __init__(self, protocol: dict):
+        self._commands = {
+            name: CommandSpec(parameter, name) for name, parameter in protocol.items()
+        }
+
+    def __getitem__(self, name: str) -> CommandSpec:
+        return self._commands[name]
+
+    def __iter__(self):
+        return iter(self._commands)
+
+    def __len__(self) -> int:
+        return len(self._commands)
+
+
+@lru_cache(maxsize=None)
+def get_protocol() -> ProtocolRegistry:
+    """
+    Return the process wide registry of commands, protocol.json is only
+    parsed the first time this is called
+    """
+    with files("automower_ble").joinpath("protocol.json").open("r") as f:
+        return ProtocolRegistry(json.load(f))
+
+
+def schema_hash(specs) -> int:
+    """
+    A hash of the names and response types of some commands, used to
+    detect binary data written with a different protocol.json
+    """
+    schema = ";".join(
+        spec.name
+        + "("
+        + ",".join(k + ":" + v for k, v in spec.response_data_type.items())
+        + ")"
+        for spec in specs
+    )
+    return zlib.crc32(schema.encode())
+
+
+class SnapshotLayout:
+    """
+    A fixed size binary layout holding the responses of several commands,
+    for example everything a fleet polls from a mower. It starts with a
+    uint32 bitmask of the responses that are present followed by each
+    response in the layout of its protocol.json type, so only commands
+    with fixed size responses can be part of it.
+
+    `schema_hash` identifies the commands and their types, data written
+    with a different layout can be detected by comparing it.
+    """
+
+    __slots__ = ("parameters", "struct", "schema_hash", "_specs")
+
+    def __init__(self, parameters, protocol: ProtocolRegistry | None = None):
+        if protocol is None:
+            protocol = get_protocol()
+        self.parameters = tuple(parameters)
+        if len(self.parameters) > 32:
+            raise ValueError("A snapshot holds at most 32 responses")
+
+        self._specs = []
+        formats = "I"
+        for name in self.parameters:
+            spec = protocol[name]
+            if spec.response_struct is None:
+                raise ValueError("Response of '" + name + "' has no fixed size")
+            self._specs.append(spec)
+            formats += spec.response_struct.format.lstrip("<")
+
+        self.struct = struct.Struct("<" + formats)
+        self.schema_hash = schema_hash(self._specs)
+
+    @property
+    def size(self) -> int:
+        return self.struct.size
+
+    def _values(self, snapshot) -> list:
+        present = 0
+        values = [0]
+        for bit, spec in enumerate(self._specs):
+            value = snapshot.get(spec.name)
+            fields = spec.response_data_type
+            if value is None:
+                values.extend([0] * len(fields))
+                continue
+            present |= 1 << bit
+            if len(fields) == 1:
+                values.append(value)
+            else:
+                values.extend(value[k] for k in fields)
+        values[0] = present
+        return values
+
+    def pack(self, snapshot: Mapping) -> bytes:
+        """Encode a dict of command name to value, missing values are None"""
+        return self.struct.pack(*self._values(snapshot))
+
+    def pack_into(self, buffer, offset: int, snapshot: Mapping) -> None:
+        self.struct.pack_into(buffer, offset, *self._values(snapshot))
+
+    def unpack_from(self, buffer, offset: int = 0) -> dict:
+        """Decode a snapshot, multi value responses are returned as records"""
+        values = self.struct.unpack_from(buffer, offset)
+        present = values[0]
+        snapshot = {}
+        index = 1
+        for bit, spec in enumerate(self._specs):
+            count = len(spec.response_data_type)
+            if not present & (1 << bit):
+                snapshot[spec.name] = None
+            elif count == 1:
+                snapshot[spec.name] = values[index]
+            else:
+                snapshot[spec.name] = spec.response_type(*values[index : index + count])
+            index += count
+        return snapshot
+
+
+class Command:
+    def __init__(self, channel_id: int, parameter: dict | CommandSpec):
+        """
+        `parameter` is either an entry of protocol.json or a spec from
+        `get_protocol()`
+        """
+        self.channel_id = channel_id
+
+        if not isinstance(parameter, CommandSpec):
+            parameter = CommandSpec(parameter)
+        self.spec = parameter
+
+        self.major = parameter.major
+        self.minor = parameter.minor
+        self.request_data_type = parameter.request_data_type
+        self.response_data_type = parameter.response_data_type
+        self.request_data = bytearray()
+
+    def generate_request(self, **kwargs) -> bytearray:
+        self.request_data = bytearray(18)
+        self.request_data[0] = 0x02  # Hard coded value (start of packet)
+        self.request_data[1] = 0xFD  # 0xFD = LINKED_PACKET_TYPE
+        self.request_data[2] = 0x00  # Length, low byte, updated later
+        self.request_data[3] = 0x00  # Length, high byte, updated later
+
+        # ChannelID
+        id = self.channel_id.to_bytes(4, byteorder="little")
+        self.request_data[4] = id[0]
+        self.request_data[5] = id[1]
+        self.request_data[6] = id[2]
+        self.request_data[7] = id[3]
+
+        self.request_data[8] = 0x01  # is_linked (usually 0x01)
+
+        self.request_data[9] = 0x00  # CRC, Updated later
+        self.request_data[10] = (
+            0x00  # Packet type (0x00 = request, 0x01 = response, 0x02 = event)
+        )
+        self.request_data[11] = 0xAF  # Hard coded value
+
+        major_bytes = self.major.to_bytes(2, byteorder="little")
+
+        self.request_data[12] = major_bytes[0]  # low byte of 'module'
+        self.request_data[13] = major_bytes[1]  # high byte of 'module'
+        self.request_data[14] = self.minor  # low byte of 'command'
+        self.request_data[15] = 0x00  # high byte of 'command'
+
+        request_length = 0
+        request_data = b""
+        if self.request_data_type is not None:
+            values = []
+            for request_name in self.request_data_type:
+                if request_name not in kwargs:
+                    raise ValueError(
+                        "Missing request parameter: "
+                        + request_name
+                        + " for command ("
+                        + str(self.major)
+                        + ", "
+                        + str(self.minor)
+                        + ")"
+                    )
+                values.append(kwargs[request_name])
+
+            request_data = self.spec.request_layout.pack(values)
+            request_length = len(request_data)
+        # Bytes 16 and 17 are the length of the request data
+        self.request_data[16:18] = request_length.to_bytes(2, byteorder="little")
+        if request_length > 0:
+            self.request_data += request_data
+
+        # Length, the two trailing bytes are added below
+        self.request_data[2:4] = (len(self.request_data) - 2).to_bytes(
+            2, byteorder="little"
+        )
+
+        self.request_data[9] = crc(self.request_data, 1, 8)  # CRC
+
+        # Two last bytes are crc and 0x03
+        self.request_data.append(crc(self.request_data, 1, len(self.request_data) - 1))
+        self.request_data.append(0x03)  # Hard coded value
+
+        return self.request_data
+
+    def parse_response(self, response_data: bytearray):
+        """
+        Decode the response data into the record type of the command, or
+        return None for commands without a response
+        """
+        response_type = self.spec.response_type
+        if response_type is None:
+            return None
+
+        response_length = int.from_bytes(response_data[17:19], byteorder="little")
+        data = memoryview(response_data)[19 : 19 + response_length]
+        return response_type._make(self.spec.response_layout.unpack(data))
+
+    def validate_response(self, response_data: bytearray) -> bool:
+        if not self.matches_response(response_data):
+            return False
+
+        if (
+            response_data[16] != 0x00
+        ):  # result: OK(0), UNKNOWN_ERROR(1), INVALID_VALUE(2), OUT_OF_RANGE(3), NOT_AVAILABLE(4), NOT_ALLOWED(5), INVALID_GROUP(6), INVALID_ID(7), DEVICE_BUSY(8), INVALID_PIN(9), MOWER_BLOCKED(10);
+            return False
+
+        return True
+
+    def result_code(self, response_data: bytearray) -> "ResponseResult":
+        """Return the result the mower reported for the command"""
+        try:
+            return ResponseResult(response_data[16])
+        except ValueError:
+            return ResponseResult.UNKNOWN_ERROR
+
+    def matches_response(self, response_data: bytearray) -> bool:
+        """
+        Check that `response_data` is a well formed response to this
+        command, without looking at the result the mower reported
+        """
+        if len(response_data) < 19:
+            return False
+
+        if response_data[0] != 0x02:
+            return False
+
+        if response_data[1] != 0xFD:
+            return False
+
+        id = self.channel_id.to_bytes(4, byteorder="little")
+        if response_data[4] != id[0]:
+            return False
+        if response_data[5] != id[1]:
+            return False
+        if response_data[6] != id[2]:
+            return False
+        if response_data[7] != id[3]:
+            return False
+
+        if response_data[8] != 0x01:
+            # This is a valid config, but we don't support it
+            # return m1656b(decodeState, c10786f);
+            return False
+
+        if response_data[9] != crc(response_data, 1, 8):
+            return False
+
+        if response_data[10] != 0x01:  # packet type is not 0x01 = response
+            return False
+
+        if response_data[11] != 0xAF:
+            return False
+
+        major_bytes = self.major.to_bytes(4, byteorder="little")
+        if response_data[12] != major_bytes[0]:
+            return False
+        if response_data[13] != major_bytes[1]:
+            return False
+        if response_data[14] != self.minor:
+            return False
+
+        if response_data[15] != 0x00:  # high byte of 'command' (self.minor)
+            return False
+
+        return True
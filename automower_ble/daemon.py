@@ -0,0 +1,590 @@
+"""
+A daemon that holds the connection to a mower and shares it with any
+number of local clients over a Unix socket. Reads are cached for a
+short time and identical reads that are in flight at the same time are
+only sent to the mower once, so many readers can share the single BLE
+link without fighting over it.
+
+Every message is a 4 byte big endian length followed by a JSON object.
+Requests carry an "id" that is echoed in the response:
+
+    {"id": 1, "op": "get", "name": "batteryLevel", "args": {}}
+    {"id": 1, "ok": true, "value": 100}
+
+The ops are "get", "set", "subscribe" and "unsubscribe". A subscription
+sends {"id": <subscription id>, "event": "update", "value": ...} every
+time the polled value changes.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import stat
+import struct
+import tempfile
+import time
+
+from .codec import ResponseResult, jsonable
+from .health import HealthMonitor
+from .scheduler import RequestPriority
+
+logger = logging.getLogger(__name__)
+
+FRAME_HEADER = struct.Struct(">I")
+# Frames larger than this are a protocol error
+MAX_FRAME_SIZE = 1 << 20
+
+
+async def read_frame(reader: asyncio.StreamReader) -> dict | None:
+    """Read one message, returns None when the other side has closed"""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError("Frame too large: " + str(length))
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+    return json.loads(payload)
+
+
+def write_frame(writer: asyncio.StreamWriter, message: dict) -> None:
+    payload = json.dumps(message, separators=(",", ":")).encode()
+    writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def default_socket_path() -> str:
+    """The socket lives in the per-user runtime directory when there is one"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "automower.sock")
+    return os.path.join(tempfile.gettempdir(), "automower-%d.sock" % os.getuid())
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Remove the socket a daemon left behind when it died. Raises
+    FileExistsError if `path` isn't a socket or a daemon still listens.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError("Not a socket: " + path)
+
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise FileExistsError("A daemon is already listening on " + path)
+
+
+def _request_key(name: str, args: dict) -> tuple:
+    return (name, tuple(sorted(args.items())))
+
+
+class _Subscription:
+    def __init__(self, key, interval: float):
+        self.key = key
+        self.interval = interval
+        # client writer -> subscription id
+        self.clients = {}
+        self.last_value = None
+        self.task = None
+
+
+class MowerDaemon:
+    # A client with more than this many bytes waiting to be sent isn't
+    # keeping up with its subscriptions
+    MAX_WRITE_BUFFER = 1 << 20
+
+    def __init__(
+        self,
+        mower,
+        device,
+        path: str,
+        cache_ttl: float = 5.0,
+        health_interval: float | None = None,
+    ):
+        """
+        Serve `mower` on the Unix socket at `path`. The mower is connected
+        to `device` when the daemon starts and reconnected whenever a
+        request arrives while it is disconnected. Read results are reused
+        for `cache_ttl` seconds.
+
+        If `health_interval` is set the link is checked that often while
+        idle and reconnected when it degrades or drops, see HealthMonitor.
+        """
+        self.mower = mower
+        self.device = device
+        self.path = path
+        self.cache_ttl = cache_ttl
+
+        # (name, args) -> (time, value)
+        self._cache = {}
+        # (name, args) -> task of the read in flight
+        self._inflight = {}
+        # (name, args) -> _Subscription
+        self._subscriptions = {}
+
+        self._connect_lock = asyncio.Lock()
+        self.health = None
+        if health_interval is not None:
+            self.health = HealthMonitor(mower, health_interval, lock=self._connect_lock)
+        self._server = None
+        self._socket_inode = None
+        self.clients = set()
+
+        self.requests = 0
+        self.cache_hits = 0
+        self.deduplicated = 0
+        self.mower_requests = 0
+
+    async def _ensure_connected(self):
+        async with self._connect_lock:
+            if self.mower.is_connected():
+                return
+            logger.info("Connecting to mower '%s'", self.mower.address)
+            if not await self.mower.connect(self.device):
+                raise ConnectionError("Unable to connect to " + self.mower.address)
+
+    async def _read(self, name: str, args: dict, priority):
+        await self._ensure_connected()
+        self.mower_requests += 1
+        return await self.mower.get_parameter(name, priority, **args)
+
+    async def get(
+        self, name: str, args: dict, max_age: float | None = None, priority=None
+    ):
+        """
+        Read a parameter, reusing a cached value younger than `max_age`,
+        which defaults to the cache TTL, or a read already in flight
+        """
+        self.requests += 1
+        key = _request_key(name, args)
+        if max_age is None:
+            max_age = self.cache_ttl
+
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] <= max_age:
+            self.cache_hits += 1
+            return cached[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            # The read runs in a task of its own, so cancelling the request
+            # that started it doesn't fail the others waiting for it
+            task = asyncio.create_task(self._fetch(key, name, args, priority))
+            self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, name: str, args: dict, priority):
+        try:
+            value = await self._read(name, args, priority)
+        finally:
+            del self._inflight[key]
+        if value is not None:
+            self._cache[key] = (time.monotonic(), value)
+        return value
+
+    async def set(self, name: str, args: dict):
+        """Send a command, this clears the cache as the state has changed"""
+        self.requests += 1
+        await self._ensure_connected()
+        self.mower_requests += 1
+        self._cache.clear()
+        result = await self.mower.set_parameter(name, None, **args)
+        # Clients need to know whether the mower actually took the command
+        if result is None:
+            raise ConnectionError("No acknowledgement from the mower for " + name)
+        if result != ResponseResult.OK:
+            raise ValueError("%s was rejected: %s" % (name, result.name))
+        return None
+
+    def _send(self, writer, message: dict) -> None:
+        """
+        Queue a message for a client. Clients that stop reading are
+        dropped rather than buffering their messages without a limit.
+        """
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > self.MAX_WRITE_BUFFER:
+            logger.error("Dropping client that isn't reading its messages")
+            self.unsubscribe(writer)
+            writer.close()
+            return
+        write_frame(writer, message)
+
+    async def _poll(self, subscription: _Subscription):
+        name, args = subscription.key
+        while subscription.clients:
+            try:
+                value = jsonable(
+                    await self.get(
+                        name,
+                        dict(args),
+                        subscription.interval,
+                        RequestPriority.BACKGROUND,
+                    )
+                )
+            except Exception as e:
+                logger.error("Unable to poll '%s': %s", name, e)
+                value = None
+
+            if value is not None and value != subscription.last_value:
+                subscription.last_value = value
+                for writer, subscription_id in list(subscription.clients.items()):
+                    self._send(
+                        writer,
+                        {"id": subscription_id, "event": "update", "value": value},
+                    )
+            await asyncio.sleep(subscription.interval)
+
+    def subscribe(self, writer, subscription_id, name: str, args: dict, interval):
+        """
+        Send `writer` every new value of a parameter. All clients that
+        subscribe to the same parameter share one poller, which polls at
+        the shortest interval any of them asked for.
+        """
+        key = _request_key(name, args)
+        subscription = self._subscriptions.get(key)
+        if subscription is None:
+            subscription = self._subscriptions[key] = _Subscription(key, interval)
+        subscription.interval = min(subscription.interval, interval)
+        subscription.clients[writer] = subscription_id
+
+        if subscription.last_value is not None:
+            # Give the new subscriber the current value straight away
+            self._send(
+                writer,
+                {
+                    "id": subscription_id,
+                    "event": "update",
+                    "value": subscription.last_value,
+                },
+            )
+        if subscription.task is None or subscription.task.done():
+            subscription.task = asyncio.create_task(self._poll(subscription))
+
+    def unsubscribe(self, writer, subscription_id=None):
+        """Stop sending updates, for all subscriptions of `writer` if no id"""
+        for key, subscription in list(self._subscriptions.items()):
+            if subscription.clients.get(writer) is None:
+                continue
+            if subscription_id is not None:
+                if subscription.clients[writer] != subscription_id:
+                    continue
+            del subscription.clients[writer]
+            if not subscription.clients:
+                if subscription.task is not None:
+                    subscription.task.cancel()
+                del self._subscriptions[key]
+
+    async def _handle_request(self, writer, message: dict):
+        request_id = message.get("id")
+        op = message.get("op")
+        name = message.get("name")
+        args = message.get("args") or {}
+
+        try:
+            if op == "get":
+                value = await self.get(name, args, message.get("max_age"))
+            elif op == "set":
+                value = await self.set(name, args)
+            elif op == "subscribe":
+                self.subscribe(
+                    writer, request_id, name, args, message.get("interval", 60.0)
+                )
+                value = None
+            elif op == "unsubscribe":
+                self.unsubscribe(writer, message.get("subscription"))
+                value = None
+            else:
+                raise ValueError("Unknown op: " + str(op))
+        except Exception as e:
+            logger.error("Request %s failed: %s", request_id, e)
+            response = {"id": request_id, "ok": False, "error": str(e)}
+        else:
+            response = {"id": request_id, "ok": True, "value": jsonable(value)}
+
+        self._send(writer, response)
+
+    async def _handle_client(self, reader, writer):
+        self.clients.add(writer)
+        tasks = set()
+        try:
+            while True:
+                try:
+                    message = await read_frame(reader)
+                except ValueError as e:
+                    logger.error("Dropping client: %s", e)
+                    break
+                if message is None:
+                    break
+
+                # Requests are handled concurrently so a slow read doesn't
+                # hold up the rest of the client's requests
+                task = asyncio.create_task(self._handle_request(writer, message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self.unsubscribe(writer)
+            for task in tasks:
+                task.cancel()
+            self.clients.discard(writer)
+            writer.close()
+
+    async def start(self):
+        _remove_stale_socket(self.path)
+        try:
+            await self._ensure_connected()
+        except ConnectionError as e:
+            # Requests will retry the connection
+            logger.error("%s", e)
+        if self.health is not None:
+            self.health.start()
+        self._server = await asyncio.start_unix_server(self._handle_client, self.path)
+        # Only the user running the daemon may talk to the mower
+        os.chmod(self.path, 0o600)
+        self._socket_inode = os.stat(self.path).st_ino
+        logger.info("Listening on %s", self.path)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        if self.health is not None:
+            await self.health.stop()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for subscription in self._subscriptions.values():
+            if subscription.task is not None:
+                subscription.task.cancel()
+        self._subscriptions.clear()
+        for writer in list(self.clients):
+            writer.close()
+        self._remove_socket()
+        if self.mower.is_connected():
+            await self.mower.disconnect()
+
+    def _remove_socket(self):
+        # Leave the path alone if another daemon has taken it over since
+        try:
+            if os.stat(self.path).st_ino == self._socket_inode:
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        self._socket_inode = None
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self.clients),
+            "subscriptions": len(self._subscriptions),
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "deduplicated": self.deduplicated,
+            "mower_requests": self.mower_requests,
+            "health": self.health.stats() if self.health is not None else None,
+        }
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonClient:
+    def __init__(self, path: str):
+        """A client of the `MowerDaemon` listening on the socket at `path`"""
+        self.path = path
+        self._reader = None
+        self._writer = None
+        self._ids = iter(range(1, 1 << 62))
+        self._pending = {}
+        # subscription id -> asyncio.Queue of values
+        self._subscriptions = {}
+        self._task = None
+
+    async def connect(self):
+        self._reader, self._writer = await asyncio.open_unix_connection(self.path)
+        self._task = asyncio.create_task(self._receive())
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _receive(self):
+        try:
+            while True:
+                message = await read_frame(self._reader)
+                if message is None:
+                    break
+                if message.get("event") == "update":
+                    queue = self._subscriptions.get(message["id"])
+                    if queue is not None:
+                        queue.put_nowait(message["value"])
+                    continue
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message)
+        finally:
+            error = DaemonError("Connection to the daemon closed")
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            for queue in self._subscriptions.values():
+                queue.put_nowait(None)
+
+    async def _call(self, op: str, **fields):
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        write_frame(self._writer, dict(id=request_id, op=op, **fields))
+        await self._writer.drain()
+
+        response = await future
+        if not response["ok"]:
+            raise DaemonError(response["error"])
+        return request_id, response["value"]
+
+    async def get(self, name: str, max_age: float | None = None, **kwargs):
+        """Read a parameter, values up to `max_age` seconds old may be reused"""
+        fields = {"name": name, "args": kwargs}
+        if max_age is not None:
+            fields["max_age"] = max_age
+        _, value = await self._call("get", **fields)
+        return value
+
+    async def set(self, name: str, **kwargs):
+        """Send a command to the mower"""
+        _, value = await self._call("set", name=name, args=kwargs)
+        return value
+
+    async def subscribe(self, name: str, interval: float = 60.0, **kwargs):
+        """Yield every new value of a parameter until the connection closes"""
+        request_id = next(self._ids)
+        queue = asyncio.Queue()
+        self._subscriptions[request_id] = queue
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        write_frame(
+            self._writer,
+            {
+                "id": request_id,
+                "op": "subscribe",
+                "name": name,
+                "args": kwargs,
+                "interval": interval,
+            },
+        )
+        await self._writer.drain()
+
+        try:
+            response = await future
+            if not response["ok"]:
+                raise DaemonError(response["error"])
+            while True:
+                value = await queue.get()
+                if value is None:
+                    return
+                yield value
+        finally:
+            del self._subscriptions[request_id]
+            if self._writer is not None and not self._writer.is_closing():
+                write_frame(
+                    self._writer,
+                    {
+                        "id": next(self._ids),
+                        "op": "unsubscribe",
+                        "subscription": request_id,
+                    },
+                )
+
+
+async def main(args: argparse.Namespace):
+    from .mower import Mower
+    from .scanner import ScannerService
+
+    mower = Mower(1197489078, args.address, args.pin)
+    async with ScannerService() as scanner:
+        device = await scanner.find_device(args.address)
+    if device is None:
+        print("Unable to find mower: " + args.address)
+        return
+
+    daemon = MowerDaemon(mower, device, args.socket, args.ttl, args.health_interval)
+    await daemon.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--address",
+        metavar="<address>",
+        required=True,
+        help="the Bluetooth address of the Automower device to connect to",
+    )
+    parser.add_argument(
+        "--pin",
+        metavar="<code>",
+        type=int,
+        default=None,
+        help="Send PIN to authenticate. This feature is experimental and might not work.",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="<path>",
+        default=default_socket_path(),
+        help="Path of the Unix socket to listen on, by default in the user's runtime directory.",
+    )
+    parser.add_argument(
+        "--ttl",
+        metavar="<seconds>",
+        type=float,
+        default=5.0,
+        help="How long read results are shared between clients.",
+    )
+    parser.add_argument(
+        "--health-interval",
+        metavar="<seconds>",
+        type=float,
+        default=None,
+        help="Check the link this often while idle and reconnect when it degrades.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)-15s %(name)-8s %(levelname)s: %(message)s",
+    )
+    asyncio.run(main(args))
@@ -0,0 +1,257 @@
+"""
+Fault injection for the link to a mower, to see how the client copes
+with a bad radio and whether changes to timeouts and retries help or
+hurt. The injector wraps the BleakClient of a BLEClient and, seeded so
+that every run injects the same faults, can:
+
+    lose requests and notifications
+    duplicate notifications
+    swap a notification with the one after it
+    corrupt the CRC bytes of a response
+    delay notifications
+    drop the connection in the middle of a response
+
+`run_workload()` sends requests through a client and reports goodput,
+latency percentiles and how many requests only succeeded after a retry.
+"""
+
+import asyncio
+import logging
+import math
+import random
+from collections import deque
+
+from bleak.exc import BleakError
+
+logger = logging.getLogger(__name__)
+
+FAULTS = ("loss", "duplicate", "reorder", "corrupt", "delay", "disconnect")
+
+
+def _corrupt_crc(data: bytearray, rng: random.Random) -> None:
+    """Flip the header or trailing CRC if the fragment has one"""
+    if len(data) > 9 and data[0] == 0x02 and data[1] == 0xFD:
+        data[9] ^= 0xFF
+    elif len(data) >= 2 and data[-1] == 0x03:
+        data[-2] ^= 0xFF
+    elif data:
+        data[rng.randrange(len(data))] ^= 0xFF
+
+
+def _percentile(values: list, fraction: float) -> float | None:
+    """Nearest rank percentile of sorted `values`"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+class FaultInjector:
+    def __init__(
+        self,
+        seed: int = 0,
+        loss: float = 0.0,
+        duplicate: float = 0.0,
+        reorder: float = 0.0,
+        corrupt: float = 0.0,
+        delay: float = 0.0,
+        max_delay: float = 1.0,
+        disconnect: float = 0.0,
+    ):
+        """
+        Every fault is the probability of it happening to a notification,
+        `loss` also applies to every write. Delayed notifications arrive
+        up to `max_delay` seconds late, but in order. The same `seed`
+        injects the same faults into the same traffic.
+        """
+        self.random = random.Random(seed)
+        self.loss = loss
+        self.duplicate = duplicate
+        self.reorder = reorder
+        self.corrupt = corrupt
+        self.delay = delay
+        self.max_delay = max_delay
+        self.disconnect = disconnect
+        self.injected = dict.fromkeys(FAULTS, 0)
+
+    def attach(self, client):
+        """Inject faults into every connection `client`, a BLEClient, makes"""
+        create = client.client_factory or client._create_bleak_client
+        client.client_factory = lambda device: FaultyClient(create(device), self)
+
+    def _roll(self, fault: str) -> bool:
+        probability = getattr(self, fault)
+        if probability <= 0 or self.random.random() >= probability:
+            return False
+        self.injected[fault] += 1
+        return True
+
+    def stats(self) -> dict:
+        """Number of times each fault was injected"""
+        return dict(self.injected)
+
+
+class FaultyClient:
+    """Wraps a BleakClient and injects the faults of a FaultInjector"""
+
+    def __init__(self, client, injector: FaultInjector):
+        self._client = client
+        self._injector = injector
+        self._callback = None
+        self._dropped = False
+        self._held = None
+        self._held_timer = None
+        self._ready_at = 0.0
+        self._late = deque()  # (time, characteristic, data) in order
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    @property
+    def is_connected(self) -> bool:
+        return not self._dropped and self._client.is_connected
+
+    async def write_gatt_char(self, char, data, response=False):
+        if self._dropped:
+            raise BleakError("Not connected")
+        if self._injector._roll("loss"):
+            return
+        await self._client.write_gatt_char(char, data, response=response)
+
+    async def start_notify(self, char, callback, **kwargs):
+        self._callback = callback
+        await self._client.start_notify(char, self._on_notification, **kwargs)
+
+    def _on_notification(self, characteristic, data):
+        injector = self._injector
+        if self._dropped:
+            return
+        data = bytearray(data)
+
+        if injector._roll("disconnect"):
+            # Part of the notification makes it, then the link is gone
+            self._deliver(characteristic, data[: len(data) // 2])
+            self._dropped = True
+            return
+        if injector._roll("loss"):
+            return
+        if injector._roll("corrupt"):
+            _corrupt_crc(data, injector.random)
+
+        if self._held is None and injector._roll("reorder"):
+            # Sent after the next notification, or late if there is none
+            self._held = (characteristic, data)
+            self._held_timer = asyncio.get_running_loop().call_later(
+                injector.max_delay, self._release
+            )
+            return
+
+        self._deliver(characteristic, data)
+        if injector._roll("duplicate"):
+            self._deliver(characteristic, data)
+        self._release()
+
+    def _release(self):
+        # Otherwise the timer would release a notification held later on
+        if self._held_timer is not None:
+            self._held_timer.cancel()
+            self._held_timer = None
+        held, self._held = self._held, None
+        if held is not None:
+            self._deliver(*held)
+
+    def _deliver(self, characteristic, data):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        at = now
+        if self._injector._roll("delay"):
+            at += self._injector.random.uniform(0, self._injector.max_delay)
+        # Never overtake a delayed notification
+        at = max(at, self._ready_at)
+        self._ready_at = at
+
+        if at <= now and not self._late:
+            self._callback(characteristic, data)
+            return
+        # One timer at a time, timers that are due together may run in
+        # any order
+        self._late.append((at, characteristic, data))
+        if len(self._late) == 1:
+            self._schedule_late()
+
+    def _schedule_late(self):
+        loop = asyncio.get_running_loop()
+        loop.call_later(max(0.0, self._late[0][0] - loop.time()), self._deliver_late)
+
+    def _deliver_late(self):
+        _, characteristic, data = self._late.popleft()
+        if not self._dropped:
+            self._callback(characteristic, data)
+        if self._late:
+            self._schedule_late()
+
+
+async def run_workload(
+    mower, parameters=("batteryLevel",), requests: int = 100, reconnect=True
+) -> dict:
+    """
+    Read `parameters` in turn, `requests` times in all, and measure how
+    the client copes. The parameters must have a response, as a None
+    result counts as a failure. If the link drops and `reconnect` is
+    set the mower is reconnected before the next request, the time
+    this takes counts towards the latency of that request.
+    """
+    loop = asyncio.get_running_loop()
+    latencies = []
+    succeeded = failed = recovered = reconnects = 0
+
+    started = loop.time()
+    for i in range(requests):
+        name = parameters[i % len(parameters)]
+        request_started = loop.time()
+
+        if reconnect and not mower.is_connected() and mower.device is not None:
+            reconnects += 1
+            await mower.disconnect()
+            try:
+                connected = await mower.connect(mower.device)
+            except Exception as e:
+                logger.debug("Unable to reconnect: %s", e)
+                connected = False
+            if not connected:
+                failed += 1
+                await mower.disconnect()
+                continue
+
+        retries = mower.retries
+        try:
+            value = await mower.get_parameter(name)
+        except Exception as e:
+            logger.debug("Request for '%s' failed: %s", name, e)
+            value = None
+
+        if value is None:
+            failed += 1
+            continue
+        succeeded += 1
+        latencies.append(loop.time() - request_started)
+        if mower.retries > retries:
+            recovered += 1
+
+    duration = loop.time() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "succeeded": succeeded,
+        "failed": failed,
+        "recovered": recovered,
+        "reconnects": reconnects,
+        "duration": duration,
+        "goodput": succeeded / duration if duration > 0 else 0.0,
+        "latency": {
+            "p50": _percentile(latencies, 0.5),
+            "p90": _percentile(latencies, 0.9),
+            "p99": _percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+    }
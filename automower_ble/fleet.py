@@ -0,0 +1,371 @@
+"""
+Polling of many mowers from one process. The fleet owns the mowers,
+decides when each one is polled and limits how many are connected at
+the same time, as a BLE adapter only supports a few simultaneous
+connections.
+"""
+
+import asyncio
+import logging
+import time
+
+from bleak import BleakScanner
+
+from .adapters import AdapterPool
+from .mower import Mower
+from .policy import ConnectionPolicy, ManagedConnection
+from .scanner import ScannerService
+from .scheduler import PrioritySemaphore, RequestPriority
+
+logger = logging.getLogger(__name__)
+
+# The parameters read from every mower on each poll, unless overridden
+DEFAULT_POLL_PARAMETERS = (
+    "batteryLevel",
+    "isCharging",
+    "mowerState",
+    "mowerActivity",
+    "nextStartTime",
+    "errorCode",
+)
+
+
+class FleetMember:
+    def __init__(
+        self,
+        mower: Mower,
+        device=None,
+        interval: float = 60.0,
+        priority: RequestPriority = RequestPriority.BACKGROUND,
+        parameters=DEFAULT_POLL_PARAMETERS,
+    ):
+        """
+        A mower in the fleet. `device` is the BLEDevice to connect to, if
+        it is None the mower is looked up by address before connecting.
+        """
+        self.mower = mower
+        self.device = device
+        self.interval = interval
+        self.priority = priority
+        self.parameters = tuple(parameters)
+
+        self.snapshot = {}
+        self.last_poll = None
+        self.next_poll = 0.0
+        self.polls = 0
+        self.failures = 0
+        self.total_wait = 0.0
+        self.total_duration = 0.0
+
+        self.task = None
+        self.connection = None  # ManagedConnection if the fleet has a policy
+
+    @property
+    def address(self) -> str:
+        return self.mower.address
+
+    def stats(self) -> dict:
+        return {
+            "polls": self.polls,
+            "failures": self.failures,
+            "last_poll": self.last_poll,
+            "average_wait": self.total_wait / self.polls if self.polls else 0.0,
+            "average_duration": (
+                self.total_duration / self.polls if self.polls else 0.0
+            ),
+        }
+
+
+class Fleet:
+    def __init__(
+        self,
+        max_connections: int | None = None,
+        disconnect_after_poll: bool = True,
+        on_snapshot=None,
+        adapters: AdapterPool | None = None,
+        scanner: ScannerService | None = None,
+        policy: ConnectionPolicy | None = None,
+        keepalive_interval: float = 20.0,
+    ):
+        """
+        `max_connections` is the number of mowers that may be connected
+        or polled at the same time across the whole fleet. `on_snapshot`
+        is called with the member and its new snapshot after each poll.
+
+        With `disconnect_after_poll` set to False mowers stay connected
+        between polls. Idle connections are dropped when a mower that
+        isn't connected needs the slot, so no more than `max_connections`
+        mowers are ever connected.
+
+        If `adapters` is set mowers are spread over the adapters in the
+        pool and `max_connections` defaults to the capacity of the pool,
+        otherwise the default adapter is used and it defaults to 3.
+
+        If `scanner` is set, mowers without a device are looked up in its
+        advertisement cache instead of scanning before every connection.
+
+        If `policy` is set it decides after every poll whether a mower
+        stays connected, with a keepalive every `keepalive_interval`
+        seconds, and `disconnect_after_poll` is ignored.
+        """
+        if max_connections is None:
+            max_connections = adapters.capacity if adapters is not None else 3
+
+        self.adapters = adapters
+        self.scanner = scanner
+        self.max_connections = max_connections
+        self.disconnect_after_poll = disconnect_after_poll
+        self.on_snapshot = on_snapshot
+        self.policy = policy
+        self.keepalive_interval = keepalive_interval
+
+        self.connections = PrioritySemaphore(max_connections)
+        self.members = {}
+        # Addresses of the mowers being polled right now
+        self._polling = set()
+        # Held while making room for a connection and connecting
+        self._connect_lock = asyncio.Lock()
+        self._running = False
+        self._stopped = None
+
+    def add(self, mower: Mower, **kwargs) -> FleetMember:
+        """
+        Add a mower to the fleet, `kwargs` are passed on to `FleetMember`.
+        If the fleet is running the mower is polled straight away.
+        """
+        if mower.address in self.members:
+            raise ValueError("Mower already in fleet: " + mower.address)
+
+        member = FleetMember(mower, **kwargs)
+        if self.policy is not None:
+            member.connection = ManagedConnection(
+                mower,
+                self.policy,
+                keepalive_interval=self.keepalive_interval,
+                connect=lambda: self._connect(member),
+                disconnect=lambda: self._disconnect(member),
+            )
+        self.members[mower.address] = member
+        if self._running:
+            member.task = asyncio.create_task(self._poll_loop(member))
+        return member
+
+    async def remove(self, address: str) -> None:
+        """Stop polling a mower and disconnect from it"""
+        member = self.members.pop(address)
+        if member.task is not None:
+            member.task.cancel()
+            await asyncio.gather(member.task, return_exceptions=True)
+        await self._close(member)
+        if self.adapters is not None:
+            self.adapters.forget(address)
+
+    async def _connect(self, member: FleetMember) -> bool:
+        if member.mower.is_connected():
+            return True
+
+        adapter = None
+        scan_kwargs = {}
+        if self.adapters is not None:
+            adapter = self.adapters.assign(member.address)
+            if adapter is None:
+                return False
+            member.mower.adapter = adapter.name
+            scan_kwargs["adapter"] = adapter.name
+
+        connected = False
+        try:
+            device = member.device
+            if device is None and self.scanner is not None:
+                device = await self.scanner.find_device(member.address, **scan_kwargs)
+            elif device is None:
+                device = await BleakScanner.find_device_by_address(
+                    member.address, **scan_kwargs
+                )
+            if device is None:
+                logger.error("Unable to find mower '%s'", member.address)
+            else:
+                connected = await member.mower.connect(device)
+        except Exception as e:
+            logger.error("Unable to connect to mower '%s': %s", member.address, e)
+
+        if not connected and self.scanner is not None:
+            # The cached device may be stale, look it up again next time
+            self.scanner.invalidate(member.address)
+
+        if adapter is not None:
+            if connected:
+                self.adapters.record_success(adapter.name)
+            else:
+                self.adapters.release(member.address)
+                moved = self.adapters.record_failure(adapter.name)
+                await self._disconnect_moved(moved)
+
+        return connected
+
+    async def _disconnect(self, member: FleetMember):
+        if member.mower.is_connected():
+            await member.mower.disconnect()
+        if self.adapters is not None:
+            self.adapters.release(member.address)
+
+    async def _close(self, member: FleetMember):
+        if member.connection is not None:
+            await member.connection.close()
+        else:
+            await self._disconnect(member)
+
+    async def _acquire(self, member: FleetMember) -> bool:
+        if member.mower.is_connected():
+            return await self._open(member)
+        # Otherwise two polls could count the same connections and evict
+        # the same idle mower, and both connect
+        async with self._connect_lock:
+            await self._evict_idle()
+            return await self._open(member)
+
+    async def _open(self, member: FleetMember) -> bool:
+        if member.connection is None:
+            return await self._connect(member)
+        return await member.connection.acquire()
+
+    async def _evict_idle(self):
+        """Drop an idle connection if connecting would exceed the limit"""
+        connected = [m for m in self.members.values() if m.mower.is_connected()]
+        if len(connected) < self.max_connections:
+            return
+        idle = [m for m in connected if m.address not in self._polling]
+        if idle:
+            # The one that was polled longest ago
+            victim = min(idle, key=lambda m: m.last_poll or 0.0)
+            logger.debug("Dropping idle connection to '%s'", victim.address)
+            await self._close(victim)
+
+    async def _release(self, member: FleetMember):
+        if member.connection is not None:
+            await member.connection.release(self.connections.waiting() > 0)
+        elif self.disconnect_after_poll:
+            await self._disconnect(member)
+
+    async def _disconnect_moved(self, addresses):
+        """Disconnect mowers that were moved off a failed adapter"""
+        for address in addresses:
+            member = self.members.get(address)
+            if member is not None and member.mower.is_connected():
+                await member.mower.disconnect()
+
+    async def poll(self, member: FleetMember) -> dict | None:
+        """
+        Poll a single mower now, waiting for a free connection slot.
+        Returns the new snapshot, or None if the mower could not be reached.
+        """
+        queued = time.monotonic()
+        async with self.connections.slot(member.priority):
+            started = time.monotonic()
+            member.total_wait += started - queued
+
+            snapshot = None
+            self._polling.add(member.address)
+            try:
+                if await self._acquire(member):
+                    snapshot = {}
+                    for parameter in member.parameters:
+                        snapshot[parameter] = await member.mower.get_parameter(
+                            parameter, RequestPriority.BACKGROUND
+                        )
+            except Exception as e:
+                logger.error("Unable to poll mower '%s': %s", member.address, e)
+                snapshot = None
+            finally:
+                await self._release(member)
+                self._polling.discard(member.address)
+
+            member.polls += 1
+            member.total_duration += time.monotonic() - started
+            member.last_poll = time.time()
+
+        if snapshot is None or all(v is None for v in snapshot.values()):
+            member.failures += 1
+            return None
+
+        member.snapshot = snapshot
+        if self.on_snapshot is not None:
+            try:
+                self.on_snapshot(member, snapshot)
+            except Exception:
+                logger.exception("Snapshot callback failed for '%s'", member.address)
+        return snapshot
+
+    async def _poll_loop(self, member: FleetMember):
+        loop = asyncio.get_running_loop()
+        member.next_poll = loop.time()
+        while True:
+            delay = member.next_poll - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Schedule from the start of the poll so slow polls don't drift
+            member.next_poll = loop.time() + member.interval
+            try:
+                await self.poll(member)
+            except Exception:
+                # Keep polling, the next poll may well succeed
+                logger.exception("Polling mower '%s' failed", member.address)
+
+    async def run(self):
+        """Poll all mowers until `stop()` is called"""
+        self._running = True
+        self._stopped = asyncio.Event()
+        for member in self.members.values():
+            if member.task is None or member.task.done():
+                member.task = asyncio.create_task(self._poll_loop(member))
+
+        try:
+            await self._stopped.wait()
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        """Stop polling and disconnect from every mower"""
+        self._running = False
+        if self._stopped is not None:
+            self._stopped.set()
+        tasks = []
+        for member in self.members.values():
+            if member.task is not None:
+                member.task.cancel()
+                tasks.append(member.task)
+                member.task = None
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for member in self.members.values():
+            await self._close(member)
+
+    def stats(self) -> dict:
+        """Return metrics aggregated over the whole fleet"""
+        polls = sum(m.polls for m in self.members.values())
+        return {
+            "mowers": len(self.members),
+            "connected": sum(
+                1 for m in self.members.values() if m.mower.is_connected()
+            ),
+            "active": self.connections.active,
+            "waiting": self.connections.waiting(),
+            "polls": polls,
+            "failures": sum(m.failures for m in self.members.values()),
+            "average_wait": (
+                sum(m.total_wait for m in self.members.values()) / polls
+                if polls
+                else 0.0
+            ),
+            "average_duration": (
+                sum(m.total_duration for m in self.members.values()) / polls
+                if polls
+                else 0.0
+            ),
+            "members": {
+                address: member.stats() for address, member in self.members.items()
+            },
+            "adapters": self.adapters.stats() if self.adapters is not None else None,
+            "policy": self.policy.stats() if self.policy is not None else None,
+        }
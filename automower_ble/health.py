@@ -0,0 +1,250 @@
+"""
+Watching the health of the link to a mower. Without it a dead link is
+only noticed when a request times out, the caller gets None and the
+next poll pays for the reconnect.
+
+The monitor probes the link with a keepalive whenever it is idle and
+marks it degraded if:
+
+    the keepalive gets no response
+    the round trip time drifts far above its moving average
+    the share of requests that had to be retried rises too high
+    the last request got no notification back at all
+
+A degraded link, or one that dropped, is reconnected straight away
+while nobody is using it, before the next poll needs it.
+"""
+
+import asyncio
+import logging
+import time
+from enum import Enum
+
+from .scheduler import RequestPriority
+
+logger = logging.getLogger(__name__)
+
+
+class LinkState(Enum):
+    HEALTHY = "healthy"
+    DEGRADED = "degraded"
+    DOWN = "down"
+
+
+class HealthMonitor:
+    def __init__(
+        self,
+        mower,
+        interval: float = 30.0,
+        probe_timeout: float = 15.0,
+        rtt_drift: float = 3.0,
+        max_retry_rate: float = 0.2,
+        notification_gap: float = 10.0,
+        alpha: float = 0.2,
+        min_samples: int = 3,
+        reconnect: bool = True,
+        lock: asyncio.Lock | None = None,
+    ):
+        """
+        Check the link to `mower` every `interval` seconds. It is degraded
+        if a keepalive takes longer than `probe_timeout` or `rtt_drift`
+        times the average round trip, if more than `max_retry_rate` of the
+        requests since the last check were retried, or if the last request
+        got no notification within `notification_gap` seconds.
+
+        The average round trip uses `alpha` as the weight of each new
+        sample and is only trusted after `min_samples` probes. With
+        `reconnect` set degraded and dropped links are reconnected, while
+        holding `lock` if it is shared with something else that connects.
+
+        Stop the monitor before disconnecting the mower on purpose,
+        otherwise it is reconnected.
+        """
+        self.mower = mower
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.rtt_drift = rtt_drift
+        self.max_retry_rate = max_retry_rate
+        self.notification_gap = notification_gap
+        self.alpha = alpha
+        self.min_samples = min_samples
+        self.reconnect = reconnect
+        self.lock = lock
+
+        self.state = LinkState.DOWN if not mower.is_connected() else LinkState.HEALTHY
+        self.reason = None
+        self.rtt = None  # Moving average of healthy round trips
+        self.last_rtt = None
+        self.samples = 0
+
+        self.checks = 0
+        self.skipped = 0
+        self.degraded = 0
+        self.reconnects = 0
+        self.failed_reconnects = 0
+
+        self._link = mower.link_stats()
+        self._task = None
+
+    def _retry_rate(self) -> float | None:
+        link = self.mower.link_stats()
+        attempts = link["attempts"] - self._link["attempts"]
+        retries = link["retries"] - self._link["retries"]
+        self._link = link
+        # Too few requests to tell
+        if attempts < 3:
+            return None
+        return retries / attempts
+
+    def _notification_gap(self) -> float | None:
+        """Seconds the last request has been waiting for any notification"""
+        last_write = self.mower.last_write
+        if last_write is None:
+            return None
+        last_notification = self.mower.last_notification
+        if last_notification is not None and last_notification >= last_write:
+            return None
+        return time.monotonic() - last_write
+
+    async def _probe(self) -> float | None:
+        try:
+            return await asyncio.wait_for(
+                self.mower.probe(RequestPriority.BACKGROUND), self.probe_timeout
+            )
+        except asyncio.TimeoutError:
+            return None
+
+    async def check(self) -> LinkState:
+        """Check the link once, reconnecting it if needed"""
+        self.checks += 1
+        if not self.mower.is_connected():
+            self._set_state(LinkState.DOWN, "disconnected")
+        elif not self.mower.scheduler.is_idle():
+            # The probe would queue behind the traffic and look slow, so
+            # the state is left as it was until the link is idle again
+            self.skipped += 1
+            return self.state
+        else:
+            self._set_state(*await self._assess())
+
+        if self.reconnect and self.state != LinkState.HEALTHY:
+            if self.lock is None:
+                await self._reconnect()
+            else:
+                async with self.lock:
+                    await self._reconnect()
+        return self.state
+
+    async def _assess(self) -> tuple:
+        # Look at what happened since the last check before probing
+        gap = self._notification_gap()
+        retry_rate = self._retry_rate()
+
+        rtt = await self._probe()
+        self._link = self.mower.link_stats()
+        self.last_rtt = rtt
+
+        if rtt is None:
+            return LinkState.DEGRADED, "no response"
+        if gap is not None and gap > self.notification_gap:
+            return LinkState.DEGRADED, "no notifications for %.1f s" % gap
+        if retry_rate is not None and retry_rate > self.max_retry_rate:
+            return LinkState.DEGRADED, "%.0f%% of requests retried" % (retry_rate * 100)
+        if self.samples >= self.min_samples and rtt > self.rtt_drift * self.rtt:
+            return LinkState.DEGRADED, "round trip %.2f s, usually %.2f s" % (
+                rtt,
+                self.rtt,
+            )
+
+        # Only healthy round trips move the average
+        if self.rtt is None:
+            self.rtt = rtt
+        else:
+            self.rtt = self.alpha * rtt + (1 - self.alpha) * self.rtt
+        self.samples += 1
+        return LinkState.HEALTHY, None
+
+    def _set_state(self, state: LinkState, reason: str | None):
+        if state != self.state:
+            logger.info(
+                "Link to '%s' is %s%s",
+                self.mower.address,
+                state.value,
+                ": " + reason if reason else "",
+            )
+        if state == LinkState.DEGRADED:
+            self.degraded += 1
+        self.state = state
+        self.reason = reason
+
+    async def _reconnect(self):
+        # Never take the link away from a request
+        if self.mower.device is None or not self.mower.scheduler.is_idle():
+            return
+        if self.state == LinkState.DOWN and self.mower.is_connected():
+            # Somebody else reconnected it in the meantime
+            self._set_state(LinkState.HEALTHY, None)
+            return
+
+        logger.info("Reconnecting to '%s'", self.mower.address)
+        if self.mower.is_connected():
+            await self.mower.disconnect()
+        try:
+            connected = await self.mower.connect(self.mower.device)
+        except Exception as e:
+            logger.error("Unable to reconnect to '%s': %s", self.mower.address, e)
+            connected = False
+
+        if not connected:
+            self.failed_reconnects += 1
+            if self.mower.is_connected():
+                await self.mower.disconnect()
+            self._set_state(LinkState.DOWN, "reconnect failed")
+            return
+
+        self.reconnects += 1
+        # A new link has its own round trip time
+        self.rtt = None
+        self.samples = 0
+        self._link = self.mower.link_stats()
+        self._set_state(LinkState.HEALTHY, None)
+
+    async def run(self):
+        """Check the link every `interval` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error("Unable to check link to '%s': %s", self.mower.address, e)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state.value,
+            "reason": self.reason,
+            "rtt": self.rtt,
+            "last_rtt": self.last_rtt,
+            "checks": self.checks,
+            "skipped": self.skipped,
+            "degraded": self.degraded,
+            "reconnects": self.reconnects,
+            "failed_reconnects": self.failed_reconnects,
+            "link": self.mower.link_stats(),
+        }
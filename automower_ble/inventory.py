@@ -0,0 +1,203 @@
+"""
+Inventory of the mowers at a site. Every mower is probed once for its
+static information, the device name and type strings, the device type
+tuple and serial number, and the results are stored in a JSON file
+keyed by address. Mowers are probed concurrently as connecting is
+slow, with a limit on how many connections are open at once.
+"""
+
+import asyncio
+import logging
+import time
+
+from bleak import BleakScanner
+
+from .metadata import load_metadata, save_metadata
+from .models import MowerModels
+from .mower import Mower
+from .scanner import ScannerService
+
+logger = logging.getLogger(__name__)
+
+
+class InventoryEntry:
+    __slots__ = (
+        "address",
+        "name",
+        "device_type_name",
+        "device_type",
+        "device_sub_type",
+        "serial_number",
+        "manufacturer",
+        "model",
+        "probed_at",
+    )
+
+    def __init__(
+        self,
+        address: str,
+        name: str | None = None,
+        device_type_name: str | None = None,
+        device_type: int | None = None,
+        device_sub_type: int | None = None,
+        serial_number: int | None = None,
+        probed_at: float | None = None,
+    ):
+        """
+        `name` and `device_type_name` are the strings read from the GATT
+        characteristics, `device_type` and `device_sub_type` the values
+        of the deviceType command and are mapped through MowerModels.
+        """
+        self.address = address
+        self.name = name
+        self.device_type_name = device_type_name
+        self.device_type = device_type
+        self.device_sub_type = device_sub_type
+        self.serial_number = serial_number
+        self.probed_at = probed_at
+
+        model_information = MowerModels.get((device_type, device_sub_type))
+        if model_information is not None:
+            self.manufacturer = model_information.manufacturer
+            self.model = model_information.model
+        elif device_type is not None:
+            self.manufacturer = (
+                f"Unknown Manufacturer ({device_type}, {device_sub_type})"
+            )
+            self.model = f"Unknown Model ({device_type}, {device_sub_type})"
+        else:
+            self.manufacturer = None
+            self.model = None
+
+    def to_dict(self) -> dict:
+        return {
+            name: getattr(self, name) for name in self.__slots__ if name != "address"
+        }
+
+    @classmethod
+    def from_dict(cls, address: str, data: dict):
+        return cls(
+            address,
+            data.get("name"),
+            data.get("device_type_name"),
+            data.get("device_type"),
+            data.get("device_sub_type"),
+            data.get("serial_number"),
+            data.get("probed_at"),
+        )
+
+
+async def probe_mower(
+    mower: Mower, device, settle_delay: float = 1.0
+) -> InventoryEntry | None:
+    """
+    Connect to a mower and read its static information. Only the
+    characteristics of the channel are looked up and the mower gets
+    `settle_delay` seconds before the channel is set up, a probe needs
+    a lot less than a full connection for polling.
+    """
+    try:
+        if not await mower.connect(device, discover=False, settle_delay=settle_delay):
+            return None
+        name, device_type_name = await mower.read_device_information()
+        device_type = await mower.get_parameter("deviceType")
+        serial_number = await mower.get_parameter("serialNumber")
+    finally:
+        await mower.disconnect()
+
+    if device_type is None:
+        logger.error("Unable to read the device type of '%s'", mower.address)
+        return None
+
+    return InventoryEntry(
+        mower.address,
+        name,
+        device_type_name,
+        device_type["deviceType"],
+        device_type["deviceSubType"],
+        serial_number,
+        time.time(),
+    )
+
+
+class Inventory:
+    def __init__(
+        self,
+        path=None,
+        channel_id: int = 1197489078,
+        pin: int | None = None,
+        concurrency: int = 4,
+        scanner: ScannerService | None = None,
+        mower_factory=None,
+    ):
+        """
+        Probe mowers `concurrency` at a time and store the results in the
+        file at `path`, if it is set. Devices are looked up with `scanner`
+        or a scan for each address. `mower_factory` creates the Mower for
+        an address and defaults to a Mower with `channel_id` and `pin`.
+        """
+        self.path = path
+        self.channel_id = channel_id
+        self.pin = pin
+        self.concurrency = concurrency
+        self.scanner = scanner
+        self.mower_factory = mower_factory
+
+        self.entries = {}
+        if path is not None:
+            for address, data in load_metadata(path).items():
+                self.entries[address] = InventoryEntry.from_dict(address, data)
+
+    def _create_mower(self, address: str):
+        if self.mower_factory is not None:
+            return self.mower_factory(address)
+        return Mower(self.channel_id, address, self.pin)
+
+    async def _find_device(self, address: str):
+        if self.scanner is not None:
+            return await self.scanner.find_device(address)
+        return await BleakScanner.find_device_by_address(address)
+
+    async def _probe(self, semaphore, address, device) -> InventoryEntry | None:
+        async with semaphore:
+            try:
+                if device is None:
+                    device = await self._find_device(address)
+                if device is None:
+                    logger.error("Unable to find mower '%s'", address)
+                    return None
+                return await probe_mower(self._create_mower(address), device)
+            except Exception as e:
+                logger.error("Unable to probe mower '%s': %s", address, e)
+                return None
+
+    async def probe(self, addresses, devices=None, refresh: bool = False) -> dict:
+        """
+        Probe every address that isn't in the inventory yet, or all of
+        them if `refresh` is set. `devices` optionally maps addresses to
+        already discovered BLEDevices. Returns a dict of address to
+        InventoryEntry, or None for mowers that could not be probed.
+        """
+        devices = devices or {}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        addresses = list(addresses)
+        todo = [a for a in addresses if refresh or a not in self.entries]
+        results = await asyncio.gather(
+            *(self._probe(semaphore, a, devices.get(a)) for a in todo)
+        )
+
+        for address, entry in zip(todo, results):
+            if entry is not None:
+                self.entries[address] = entry
+        if self.path is not None and any(e is not None for e in results):
+            self.save()
+
+        return {address: self.entries.get(address) for address in addresses}
+
+    def save(self) -> None:
+        # Keep anything else stored in the file, such as cached metadata
+        mowers = load_metadata(self.path)
+        for address, entry in self.entries.items():
+            mowers.setdefault(address, {}).update(entry.to_dict())
+        save_metadata(self.path, mowers)
@@ -0,0 +1,161 @@
+"""
+Persistent cache of the static information about each mower. The GATT
+handles of the request and response characteristics, the device type,
+serial number and task schedule rarely change, so they are stored on
+disk and reused after a restart instead of being read again on every
+connection.
+
+The cache uses the same file format as the inventory, entries are
+keyed by address and an entry is dropped when the mower reports a
+different serial number than the one that was cached. Changes are
+merged into the file as it is on disk, so the cache and an inventory
+can share the file without overwriting each other's values.
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def load_metadata(path) -> dict:
+    """Read a metadata or inventory file, returns a dict of address to dict"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.error("Unable to read '%s': %s", path, e)
+        return {}
+    return data.get("mowers", {})
+
+
+def save_metadata(path, mowers: dict) -> None:
+    """Write a metadata or inventory file, `mowers` is a dict of address to dict"""
+    # Write to a temporary file first so a crash can't leave half a file
+    tmp = str(path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"mowers": mowers}, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class MetadataCache:
+    # Changes made within this many seconds of each other are written
+    # to disk together
+    SAVE_DELAY = 1.0
+
+    def __init__(self, path=None):
+        """
+        Load the cache from the file at `path`. Without a path the cache
+        only lives as long as the process.
+        """
+        self.path = path
+        self.entries = load_metadata(path) if path is not None else {}
+        # Addresses whose entry has been checked against the mower
+        self.validated = set()
+
+        # Addresses changed since the last save, and the keys removed from
+        # them, None if the whole entry in the file is to be replaced
+        self._changed = set()
+        self._removed = {}
+        self._save_handle = None
+
+    def get(self, address: str, key: str, default=None):
+        return self.entries.get(address, {}).get(key, default)
+
+    def update(self, address: str, **values) -> None:
+        """Store values for a mower, they are written to disk shortly after"""
+        entry = self.entries.setdefault(address, {})
+        if all(entry.get(k) == v for k, v in values.items()):
+            return
+        entry.update(values)
+        removed = self._removed.get(address)
+        if removed:
+            removed.difference_update(values)
+        self._changed.add(address)
+        self._schedule_save()
+
+    def invalidate(self, address: str) -> None:
+        """Forget the GATT handles of a mower, they are discovered again"""
+        entry = self.entries.get(address, {})
+        if entry.pop("handles", None) is None:
+            return
+        removed = self._removed.setdefault(address, set())
+        if removed is not None:
+            removed.add("handles")
+        self._changed.add(address)
+        self._schedule_save()
+
+    def forget(self, address: str) -> None:
+        """Forget everything about a mower"""
+        self.entries.pop(address, None)
+        self._removed[address] = None
+        self._changed.add(address)
+        self.validated.discard(address)
+        self._schedule_save()
+
+    def validate(self, address: str, serial_number) -> bool:
+        """
+        Check the cached entry belongs to the mower that has just been
+        connected to. If the serial number doesn't match the entry is
+        dropped and False is returned.
+        """
+        cached = self.get(address, "serial_number")
+        if cached is not None and cached != serial_number:
+            logger.warning(
+                "Serial number of '%s' changed from %s to %s, dropping cached data",
+                address,
+                cached,
+                serial_number,
+            )
+            self.forget(address)
+            self.update(address, serial_number=serial_number)
+            self.validated.add(address)
+            return False
+
+        self.update(address, serial_number=serial_number)
+        self.validated.add(address)
+        return True
+
+    def _schedule_save(self) -> None:
+        if self.path is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Nothing else to wait for outside of an event loop
+            self.save()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.SAVE_DELAY, self.save)
+
+    def save(self) -> None:
+        """Write any pending changes to disk now"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self.path is None or not self._changed:
+            return
+
+        # Keep what others, such as an inventory, stored in the meantime
+        mowers = load_metadata(self.path)
+        for address in self._changed:
+            removed = self._removed.get(address, ())
+            if removed is None:
+                entry = {}
+            else:
+                entry = mowers.get(address, {})
+                for key in removed:
+                    entry.pop(key, None)
+            entry.update(self.entries.get(address, {}))
+            if entry:
+                mowers[address] = entry
+            else:
+                mowers.pop(address, None)
+
+        save_metadata(self.path, mowers)
+        self._changed.clear()
+        self._removed.clear()
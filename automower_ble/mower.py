@@ -8,7 +8,12 @@ how the request and response classes can be used.
 
 import argparse
 import asyncio
+import json
 import logging
+import shlex
+import sys
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 
 from .protocol import (
@@ -17,34 +22,115 @@ from .protocol import (
     MowerState,
     MowerActivity,
     ModeOfOperation,
+    ResponseResult,
     TaskInformation,
 )
+from .codec import jsonable
 from .models import MowerModels
+from .scheduler import RequestPriority, priority_for
+from .metadata import MetadataCache
+from .replay import Recorder
+from .scanner import ScannerService
+from .watch import Watch, WatchHub
 from .error_codes import ErrorCodes
 
-from bleak import BleakScanner
-
 logger = logging.getLogger(__name__)
 
 
 class Mower(BLEClient):
-    def __init__(self, channel_id: int, address, pin=None):
-        super().__init__(channel_id, address, pin)
+    def __init__(
+        self,
+        channel_id: int,
+        address,
+        pin=None,
+        requests_per_second: float | None = None,
+        burst: int = 1,
+        metadata=None,
+    ):
+        super().__init__(channel_id, address, pin, requests_per_second, burst, metadata)
+        self._watches = None
+
+    def watch(self, *parameters: str, interval: float = 60.0) -> Watch:
+        """
+        Watch parameters of the mower, for example:
+
+            async with mower.watch("batteryLevel", interval=30) as levels:
+                async for level in levels:
+                    ...
 
-    async def set_parameter(self, parameter_name: str, **kwargs) -> None:
+        Yields the value of a single parameter or a dict of several each
+        time one of them changes. All watches share one poll for each
+        parameter, sent with RequestPriority.BACKGROUND, and a consumer
+        that falls behind only gets the latest value.
+        """
+        if self._watches is None:
+            self._watches = WatchHub(
+                lambda name: self.get_parameter(name, RequestPriority.BACKGROUND)
+            )
+        return self._watches.watch(parameters, interval)
+
+    def watch_stats(self) -> dict:
+        """Watchers and polls of every watched parameter"""
+        if self._watches is None:
+            return {}
+        return self._watches.stats()
+
+    async def connect(self, device, **kwargs) -> bool:
+        """
+        Connect to the mower, on the first connection the cached metadata
+        is checked against the serial number of the mower. `kwargs` are
+        passed on to BLEClient.connect().
+        """
+        if not await super().connect(device, **kwargs):
+            return False
+
+        if self.metadata is not None and self.address not in self.metadata.validated:
+            serial_number = await self.get_parameter("serialNumber")
+            if serial_number is not None:
+                self.metadata.validate(self.address, serial_number)
+        return True
+
+    async def set_parameter(
+        self,
+        parameter_name: str,
+        priority: RequestPriority | None = None,
+        **kwargs,
+    ) -> ResponseResult | None:
+        """
+        Send a command to the mower. Unlike get_parameter the response is
+        not decoded, the result the mower acknowledged the command with is
+        returned instead, or None if no response arrived.
         """
-        This is the same function as get_parameter but with a different name to make syntax a bit more clear.
-        It also does not handle any response even though it upstream reads the response."""
-        self.get_parameter(parameter_name, **kwargs)
+        if priority is None:
+            priority = priority_for(parameter_name)
 
-    async def get_parameter(self, parameter_name: str, **kwargs):
+        command = Command(self.channel_id, self.protocol[parameter_name])
+        request = command.generate_request(**kwargs)
+        response = await self._request_response(request, priority)
+        if response is None or not command.matches_response(response):
+            return None
+        return command.result_code(response)
+
+    async def get_parameter(
+        self,
+        parameter_name: str,
+        priority: RequestPriority | None = None,
+        **kwargs,
+    ):
         """
         This function is used to get a parameter from the mower. It will send a request to the mower and then
         wait for a response. The response will be parsed and returned to the caller.
+
+        Control commands are sent with RequestPriority.CONTROL and everything else with
+        RequestPriority.INTERACTIVE, unless `priority` is set. Pollers should use
+        RequestPriority.BACKGROUND so they never delay user initiated requests.
         """
+        if priority is None:
+            priority = priority_for(parameter_name)
+
         command = Command(self.channel_id, self.protocol[parameter_name])
         request = command.generate_request(**kwargs)
-        response = await self._request_response(request)
+        response = await self._request_response(request, priority)
         if response is None:
             return None
 
@@ -53,6 +139,8 @@ class Mower(BLEClient):
             return None
 
         response_dict = command.parse_response(response)
+        if response_dict is None:
+            return None
         if (
             len(response_dict) == 1
         ):  # If there is only one key in the response, return the value
@@ -60,9 +148,28 @@ class Mower(BLEClient):
         else:
             return response_dict
 
+    async def _device_type(self) -> dict | None:
+        """The deviceType response, from the metadata cache if possible"""
+        if self.metadata is not None:
+            device_type = self.metadata.get(self.address, "device_type")
+            if device_type is not None:
+                return {
+                    "deviceType": device_type,
+                    "deviceSubType": self.metadata.get(self.address, "device_sub_type"),
+                }
+
+        model = await self.get_parameter("deviceType")
+        if model is not None and self.metadata is not None:
+            self.metadata.update(
+                self.address,
+                device_type=model["deviceType"],
+                device_sub_type=model["deviceSubType"],
+            )
+        return model
+
     async def get_manufacturer(self) -> str | None:
         """Get the mower manufacturer"""
-        model = await self.get_parameter("deviceType")
+        model = await self._device_type()
         if model is None:
             return None
 
@@ -76,7 +183,7 @@ class Mower(BLEClient):
 
     async def get_model(self) -> str | None:
         """Get the mower model"""
-        model = await self.get_parameter("deviceType")
+        model = await self._device_type()
         if model is None:
             return None
 
@@ -123,11 +230,16 @@ class Mower(BLEClient):
         """
         Force the mower to run for the specified duration in hours.
         """
-        # Set mode of operation to manual:
-        await self.set_parameter("setModeOfOperation", mode=ModeOfOperation.MANUAL)
+        async with self.transaction() as transaction:
+            # Set mode of operation to manual:
+            transaction.add("setModeOfOperation", mode=ModeOfOperation.MANUAL.value)
+
+            # Set the duration of operation:
+            transaction.add("overrideDuration", duration=duration_hours * 3600)
 
-        # Set the duration of operation:
-        await self.set_parameter("overrideDuration", duration=duration_hours * 3600)
+        for result in transaction.results:
+            if result.result != ResponseResult.OK:
+                logger.error("%s failed: %s", result.name, result.result)
 
     async def mower_pause(self):
         await self.set_parameter("pause")
@@ -138,6 +250,29 @@ class Mower(BLEClient):
     async def mower_park(self):
         await self.set_parameter("park")
 
+    @asynccontextmanager
+    async def transaction(self, timeout: float = 10.0):
+        """
+        Queue several commands and send them in one pipelined burst when
+        the context exits, for example:
+
+            async with mower.transaction() as transaction:
+                transaction.add("setModeOfOperation", mode=ModeOfOperation.MANUAL.value)
+                transaction.add("overrideDuration", duration=3600)
+
+            print(transaction.results)
+
+        All acknowledgements are awaited with a single deadline of `timeout`
+        seconds, the per command results are available in `results`.
+        """
+        transaction = Transaction(self, timeout)
+        yield transaction
+        await transaction.execute()
+
+    async def keepalive(self) -> None:
+        """Send a keepalive to the mower to keep the connection open"""
+        await self.get_parameter("keepalive")
+
     async def get_task(self, taskid: int) -> TaskInformation | None:
         """
         Get information about a specific task
@@ -146,20 +281,194 @@ class Mower(BLEClient):
         if task is None:
             return None
         return TaskInformation(
-            task["next_start_time"],
-            task["duration_in_seconds"],
-            task["on_monday"],
-            task["on_tuesday"],
-            task["on_wednesday"],
-            task["on_thursday"],
-            task["on_friday"],
-            task["on_saturday"],
-            task["on_sunday"],
+            task.next_start_time,
+            task.duration_in_seconds,
+            task.on_monday,
+            task.on_tuesday,
+            task.on_wednesday,
+            task.on_thursday,
+            task.on_friday,
+            task.on_saturday,
+            task.on_sunday,
         )
 
+    async def get_tasks(self, refresh: bool = False) -> list | None:
+        """
+        Get all tasks of the schedule. They are stored in the metadata
+        cache, if there is one, and only read from the mower again when
+        `refresh` is set.
+        """
+        if self.metadata is not None and not refresh:
+            tasks = self.metadata.get(self.address, "tasks")
+            if tasks is not None:
+                return [TaskInformation(*task) for task in tasks]
+
+        count = await self.get_parameter("getNumberOfTasks")
+        if count is None:
+            return None
 
-async def main(mower: Mower):
-    device = await BleakScanner.find_device_by_address(mower.address)
+        tasks = []
+        for taskid in range(count):
+            task = await self.get_task(taskid)
+            if task is None:
+                return None
+            tasks.append(task)
+
+        if self.metadata is not None:
+            self.metadata.update(self.address, tasks=[list(task) for task in tasks])
+        return tasks
+
+
+class TransactionResult:
+    def __init__(self, name: str, result: ResponseResult | None, value):
+        """
+        The outcome of a single command in a transaction. `result` is None
+        if no response arrived before the deadline.
+        """
+        self.name = name
+        self.result = result
+        self.value = value
+
+
+class Transaction:
+    """
+    A group of commands that are sent to the mower in one pipelined burst,
+    see `Mower.transaction()`
+    """
+
+    def __init__(self, mower: Mower, timeout: float):
+        self.mower = mower
+        self.timeout = timeout
+        self.commands = []
+        self.results = []
+
+    def add(self, parameter_name: str, **kwargs) -> None:
+        """Queue a command, it is sent when the transaction completes"""
+        command = Command(self.mower.channel_id, self.mower.protocol[parameter_name])
+        request = command.generate_request(**kwargs)
+        self.commands.append((parameter_name, command, request))
+
+    async def execute(self) -> list:
+        """Send all queued commands and wait for every acknowledgement"""
+        responses = await self.mower._request_responses(
+            [request for _, _, request in self.commands], self.timeout
+        )
+
+        self.results = []
+        for (name, command, _), response in zip(self.commands, responses):
+            if response is None or not command.matches_response(response):
+                self.results.append(TransactionResult(name, None, None))
+                continue
+
+            result = command.result_code(response)
+            value = None
+            if result == ResponseResult.OK:
+                value = command.parse_response(response)
+            self.results.append(TransactionResult(name, result, value))
+
+        return self.results
+
+    def succeeded(self) -> bool:
+        """True if every command was acknowledged with ResponseResult.OK"""
+        return len(self.results) == len(self.commands) and all(
+            r.result == ResponseResult.OK for r in self.results
+        )
+
+
+def _parse_value(value: str):
+    try:
+        return int(value, 0)
+    except ValueError:
+        return value
+
+
+def parse_command(line: str) -> tuple:
+    """
+    Split a command such as "get getTask task=0" into the verb, its
+    positional arguments and its keyword arguments
+    """
+    words = shlex.split(line)
+    positional = [w for w in words[1:] if "=" not in w]
+    # The parameter name of get and set is never a number
+    first = 1 if words[0] in ("get", "set") else 0
+    positional[first:] = [_parse_value(w) for w in positional[first:]]
+    kwargs = {}
+    for word in words[1:]:
+        if "=" in word:
+            key, value = word.split("=", 1)
+            kwargs[key] = _parse_value(value)
+    return words[0], positional, kwargs
+
+
+# Commands that map straight onto a Mower method
+SHORTCUTS = {
+    "park": "mower_park",
+    "pause": "mower_pause",
+    "resume": "mower_resume",
+    "override": "mower_override",
+    "keepalive": "keepalive",
+    "tasks": "get_tasks",
+    "model": "get_model",
+    "manufacturer": "get_manufacturer",
+}
+
+
+async def run_command(mower: Mower, line: str) -> dict:
+    """Run one command and return its result as a dict"""
+    started = time.monotonic()
+    result = {"command": line}
+    try:
+        verb, positional, kwargs = parse_command(line)
+        if verb in ("get", "set") and not positional:
+            raise ValueError("Missing parameter name")
+        if verb == "get":
+            value = await mower.get_parameter(positional[0], **kwargs)
+        elif verb == "set":
+            acknowledged = await mower.set_parameter(positional[0], **kwargs)
+            if acknowledged is None:
+                raise ConnectionError("No acknowledgement from the mower")
+            if acknowledged != ResponseResult.OK:
+                raise ValueError("Rejected by the mower: " + acknowledged.name)
+            value = None
+        elif verb in SHORTCUTS:
+            value = await getattr(mower, SHORTCUTS[verb])(*positional, **kwargs)
+        else:
+            raise ValueError("Unknown command: " + verb)
+        result["ok"] = True
+        result["value"] = jsonable(value)
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = str(e) or type(e).__name__
+    result["elapsed_ms"] = round((time.monotonic() - started) * 1000, 1)
+    return result
+
+
+async def run_session(mower: Mower, source, prompt: bool = False):
+    """
+    Run the commands read from `source`, one per line, over the open
+    connection and print each result as a line of JSON. Empty lines and
+    lines starting with # are skipped, "quit" ends the session.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        if prompt:
+            print("> ", end="", file=sys.stderr, flush=True)
+        line = await loop.run_in_executor(None, source.readline)
+        if not line:
+            break
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line in ("quit", "exit"):
+            break
+        print(json.dumps(await run_command(mower, line)), flush=True)
+
+
+async def main(mower: Mower, args: argparse.Namespace | None = None):
+    # Returns as soon as the mower advertises instead of scanning for
+    # the full timeout
+    async with ScannerService() as scanner:
+        device = await scanner.find_device(mower.address)
 
     if device is None:
         print("Unable to connect to device address: " + mower.address)
@@ -168,7 +477,23 @@ async def main(mower: Mower):
         )
         return
 
-    await mower.connect(device)
+    if not await mower.connect(device):
+        print("Unable to connect to device address: " + mower.address)
+        await mower.disconnect()
+        return
+
+    if args is not None and (args.batch is not None or args.interactive):
+        try:
+            if args.interactive:
+                await run_session(mower, sys.stdin, prompt=sys.stdin.isatty())
+            elif args.batch == "-":
+                await run_session(mower, sys.stdin)
+            else:
+                with open(args.batch) as f:
+                    await run_session(mower, f)
+        finally:
+            await mower.disconnect()
+        return
 
     manufacturer = await mower.get_manufacturer()
     print("Mower manufacturer: " + manufacturer)
@@ -249,9 +574,53 @@ if __name__ == "__main__":
         default=None,
         help="Send PIN to authenticate. This feature is experimental and might not work.",
     )
+
+    parser.add_argument(
+        "--rate",
+        metavar="<requests/s>",
+        type=float,
+        default=None,
+        help="Limit the sustained number of requests per second sent to the mower.",
+    )
+
+    parser.add_argument(
+        "--burst",
+        metavar="<requests>",
+        type=int,
+        default=1,
+        help="Number of requests that can be sent back to back when --rate is set.",
+    )
+    parser.add_argument(
+        "--cache",
+        metavar="<path>",
+        default=None,
+        help="File to cache static mower information in between runs.",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="<path>",
+        default=None,
+        help="Record the session to a file that can be replayed in tests.",
+    )
+
+    session_group = parser.add_mutually_exclusive_group()
+    session_group.add_argument(
+        "--batch",
+        metavar="<file>",
+        default=None,
+        help="Run the commands in a file, or - for stdin, over one connection "
+        "and print the results as JSON lines.",
+    )
+    session_group.add_argument(
+        "--interactive",
+        action="store_true",
+        help="Read commands such as 'get batteryLevel', 'get getTask task=0' "
+        "or 'park' from the terminal.",
+    )
     args = parser.parse_args()
 
-    mower = Mower(1197489078, args.address, args.pin)
+    metadata = MetadataCache(args.cache) if args.cache is not None else None
+    mower = Mower(1197489078, args.address, args.pin, args.rate, args.burst, metadata)
 
     log_level = logging.INFO
     logging.basicConfig(
@@ -259,4 +628,9 @@ if __name__ == "__main__":
         format="%(asctime)-15s %(name)-8s %(levelname)s: %(message)s",
     )
 
-    asyncio.run(main(mower))
+    if args.record is not None:
+        with Recorder(args.record, mower.channel_id) as recorder:
+            recorder.attach(mower)
+            asyncio.run(main(mower, args))
+    else:
+        asyncio.run(main(mower, args))
@@ -0,0 +1,251 @@
+"""
+Deciding when to keep a connection to a mower open. Reconnecting costs
+several seconds, while an open connection ties up one of the few slots
+of the adapter. The policy learns how long each mower takes to connect
+and how long it is idle between uses, and after every use decides to:
+
+    HOLD        stay connected, with keepalives, as the mower will be
+                used again before a reconnect would pay off
+    LINGER      stay connected for a while in case it is used again soon,
+                for as long as a reconnect costs
+    DISCONNECT  disconnect now, as it won't be used again for a long time
+                or another mower is waiting for the slot
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import Enum
+
+logger = logging.getLogger(__name__)
+
+
+class Decision(Enum):
+    HOLD = "hold"
+    LINGER = "linger"
+    DISCONNECT = "disconnect"
+
+
+class _MowerHistory:
+    def __init__(self, reconnect_cost: float):
+        self.reconnect_cost = reconnect_cost
+        self.idle_time = None  # EWMA, None until the mower was reused
+        self.last_release = None
+
+        self.connects = 0
+        self.reuses = 0
+        self.decisions = dict.fromkeys((d.value for d in Decision), 0)
+
+    def stats(self) -> dict:
+        return {
+            "reconnect_cost": self.reconnect_cost,
+            "idle_time": self.idle_time,
+            "connects": self.connects,
+            "reuses": self.reuses,
+            "decisions": dict(self.decisions),
+        }
+
+
+class ConnectionPolicy:
+    def __init__(
+        self,
+        alpha: float = 0.3,
+        default_reconnect_cost: float = 8.0,
+        max_linger: float = 60.0,
+    ):
+        """
+        `alpha` is the weight of the newest sample in the moving averages
+        of the reconnect cost and idle time. Until a mower has connected
+        once it is assumed to take `default_reconnect_cost` seconds.
+        Connections never linger for longer than `max_linger` seconds.
+        """
+        self.alpha = alpha
+        self.default_reconnect_cost = default_reconnect_cost
+        self.max_linger = max_linger
+        self._history = {}
+
+    def _get(self, address: str) -> _MowerHistory:
+        history = self._history.get(address)
+        if history is None:
+            history = self._history[address] = _MowerHistory(
+                self.default_reconnect_cost
+            )
+        return history
+
+    def _average(self, current: float | None, sample: float) -> float:
+        if current is None:
+            return sample
+        return self.alpha * sample + (1 - self.alpha) * current
+
+    def record_connect(self, address: str, duration: float) -> None:
+        """Record how long connecting, including the handshake, took"""
+        history = self._get(address)
+        if history.connects == 0:
+            history.reconnect_cost = duration
+        else:
+            history.reconnect_cost = self._average(history.reconnect_cost, duration)
+        history.connects += 1
+
+    def record_use(self, address: str, reused: bool) -> None:
+        """Record that the mower is being used again"""
+        history = self._get(address)
+        if reused:
+            history.reuses += 1
+        if history.last_release is not None:
+            idle = time.monotonic() - history.last_release
+            history.idle_time = self._average(history.idle_time, idle)
+
+    def decide(self, address: str, contended: bool = False) -> tuple:
+        """
+        Decide what to do with a connection that is no longer used.
+        `contended` is True if another mower is waiting for the slot.
+        Returns the decision and, for LINGER, how many seconds to wait.
+        """
+        history = self._get(address)
+        history.last_release = time.monotonic()
+
+        if contended:
+            decision, linger = Decision.DISCONNECT, 0.0
+        elif history.idle_time is None:
+            # No idea when it is used next, lingering for as long as a
+            # reconnect costs is never more than twice as bad as the best
+            # choice in hindsight
+            decision = Decision.LINGER
+            linger = min(history.reconnect_cost, self.max_linger)
+        elif history.idle_time < history.reconnect_cost:
+            decision, linger = Decision.HOLD, 0.0
+        elif history.idle_time < 2 * history.reconnect_cost:
+            decision = Decision.LINGER
+            linger = min(history.reconnect_cost, self.max_linger)
+        else:
+            decision, linger = Decision.DISCONNECT, 0.0
+
+        history.decisions[decision.value] += 1
+        return decision, linger
+
+    def stats(self) -> dict:
+        return {address: history.stats() for address, history in self._history.items()}
+
+
+class ManagedConnection:
+    def __init__(
+        self,
+        mower,
+        policy: ConnectionPolicy,
+        device=None,
+        keepalive_interval: float = 20.0,
+        connect=None,
+        disconnect=None,
+    ):
+        """
+        Connects `mower` to `device` on demand and applies `policy` every
+        time it is released. While the connection is held or lingering a
+        keepalive is sent every `keepalive_interval` seconds.
+
+        `connect` and `disconnect` are coroutine functions that replace
+        connecting to `device` and disconnecting, for example to pick
+        the adapter first.
+        """
+        self.mower = mower
+        self.policy = policy
+        self.device = device
+        self.keepalive_interval = keepalive_interval
+        self._connect = connect if connect is not None else self._connect_device
+        self._disconnect = disconnect if disconnect is not None else mower.disconnect
+        self.in_use = False
+        self.last_decision = None
+        self._idle_task = None
+
+    async def _connect_device(self) -> bool:
+        if await self.mower.connect(self.device):
+            return True
+        if self.mower.is_connected():
+            await self.mower.disconnect()
+        return False
+
+    @property
+    def address(self) -> str:
+        return self.mower.address
+
+    async def _stop_idle(self):
+        task, self._idle_task = self._idle_task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def acquire(self) -> bool:
+        """Make sure the mower is connected, returns False if it can't be"""
+        await self._stop_idle()
+        self.in_use = True
+
+        if self.mower.is_connected():
+            self.policy.record_use(self.address, reused=True)
+            return True
+
+        self.policy.record_use(self.address, reused=False)
+        started = time.monotonic()
+        if not await self._connect():
+            return False
+        self.policy.record_connect(self.address, time.monotonic() - started)
+        return True
+
+    async def release(self, contended: bool = False) -> Decision:
+        """Stop using the mower, the policy decides whether to disconnect"""
+        self.in_use = False
+        if not self.mower.is_connected():
+            return Decision.DISCONNECT
+
+        decision, linger = self.policy.decide(self.address, contended)
+        self.last_decision = decision
+        logger.debug("%s connection to '%s'", decision.value, self.address)
+
+        if decision == Decision.DISCONNECT:
+            await self._disconnect()
+        else:
+            self._idle_task = asyncio.create_task(
+                self._idle(linger if decision == Decision.LINGER else None)
+            )
+        return decision
+
+    async def _idle(self, linger: float | None):
+        loop = asyncio.get_running_loop()
+        deadline = None if linger is None else loop.time() + linger
+        while self.mower.is_connected():
+            remaining = self.keepalive_interval
+            if deadline is not None:
+                remaining = min(remaining, deadline - loop.time())
+                if remaining <= 0:
+                    await self._disconnect()
+                    return
+            await asyncio.sleep(remaining)
+            if deadline is None or loop.time() < deadline:
+                try:
+                    await self.mower.keepalive()
+                except Exception as e:
+                    logger.error("Keepalive to '%s' failed: %s", self.address, e)
+                    break
+
+        # The link dropped or failed, clean up after it all the same so
+        # whatever was reserved for the connection is given back
+        await self._disconnect()
+
+    async def close(self):
+        """Disconnect regardless of the policy"""
+        await self._stop_idle()
+        self.in_use = False
+        if self.mower.is_connected():
+            await self._disconnect()
+
+    @asynccontextmanager
+    async def session(self, contended=lambda: False):
+        """
+        Hold the connection for the duration of the context. `contended`
+        is called on the way out to tell the policy if the slot is needed.
+        Yields whether the mower is connected.
+        """
+        connected = await self.acquire()
+        try:
+            yield connected
+        finally:
+            await self.release(contended())
@@ -1,273 +1,176 @@
 import binascii
+from .buffers import BufferClosed, NotificationBuffer
+from .codec import (  # noqa: F401
+    Command,
+    CommandSpec,
+    ModeOfOperation,
+    MowerActivity,
+    MowerState,
+    ResponseResult,
+    TaskInformation,
+    get_protocol,
+)
 from .helpers import crc
-from enum import Enum
+from .ratelimit import TokenBucket
+from .scheduler import RequestPriority, RequestScheduler
 import asyncio
 import logging
-import json
-from importlib.resources import files
+import time
 from bleak import BleakClient
 from bleak.backends.characteristic import BleakGATTCharacteristic
 
 logger = logging.getLogger(__name__)
 
+# Upper bound, in seconds, for each step of tearing down a connection
+DISCONNECT_TIMEOUT = 5.0
 
-class ModeOfOperation(Enum):
-    # ProtocolTypes$IMowerAppMowerMode, used in modeOfOperation: 4586, 1
-    # Comments from: https://developer.husqvarnagroup.cloud/apis/Automower+Connect+API?tab=status%20description%20and%20error%20codes#user-content-mode
-    AUTO = 0
-    MANUAL = 1
-    HOME = 2  # Mower goes home and parks forever. Week schedule is not used. Cannot be overridden with forced mowing.
-    DEMO = 3  # Same as main area, but shorter times. No blade operation
-    POI = 4
-
-
-class MowerState(Enum):
-    # ProtocolTypes$IMowerAppState, used in mowerState: 4586, 2
-    # Comments from: https://developer.husqvarnagroup.cloud/apis/Automower+Connect+API?tab=status%20description%20and%20error%20codes#user-content-state
-    OFF = 0  # Mower is turned off.
-    WAIT_FOR_SAFETYPIN = 1
-    STOPPED = 2  # Mower is stopped requires manual action.
-    FATAL_ERROR = 3
-    PENDING_START = 4
-    PAUSED = 5  # Mower has been paused by user.
-    IN_OPERATION = 6  # See value in activity for status.
-    RESTRICTED = (
-        7  # Mower can currently not mow due to week calender, or override park.
-    )
-    ERROR = 8  # An error has occurred. Check errorCode. Mower requires manual action.
-
-
-class MowerActivity(Enum):
-    # ProtocolTypes$IMowerAppActivity, used in mowerActivity: 4586, 3
-    # Comments from: https://developer.husqvarnagroup.cloud/apis/Automower+Connect+API?tab=status%20description%20and%20error%20codes#user-content-activity
-    NONE = 0
-    CHARGING = 1  # Mower is charging in station due to low battery.
-    GOING_OUT = 2
-    MOWING = 3  # Mower is mowing lawn. If in demo mode the blades are not in operation.
-    GOING_HOME = 4  # Mower is going home to the charging station.
-    PARKED = 5
-    STOPPED_IN_GARDEN = 6  # Mower has stopped. Needs manual action to resume
-
-
-class TaskInformation(object):
-    def __init__(
-        self,
-        next_start_time,
-        duration_in_seconds,
-        on_monday,
-        on_tuesday,
-        on_wednesday,
-        on_thursday,
-        on_friday,
-        on_saturday,
-        on_sunday,
-    ):
-        self.next_start_time = next_start_time
-        self.duration_in_seconds = duration_in_seconds
-        self.on_monday = on_monday
-        self.on_tuesday = on_tuesday
-        self.on_wednesday = on_wednesday
-        self.on_thursday = on_thursday
-        self.on_friday = on_friday
-        self.on_saturday = on_saturday
-        self.on_sunday = on_sunday
-
-
-class Command:
-    def __init__(self, channel_id: int, parameter: dict):
-        self.channel_id = channel_id
-
-        self.major = parameter["major"]
-        self.minor = parameter["minor"]
-
-        if "requestType" in parameter:
-            self.request_data_type = parameter["requestType"]
-        else:
-            self.request_data_type = None
+# GATT characteristics the channel writes requests to and gets
+# responses from
+WRITE_CHAR = "98bd0002-0b0e-421a-84e5-ddbf75dc6de4"
+READ_CHAR = "98bd0003-0b0e-421a-84e5-ddbf75dc6de4"
 
-        if not isinstance(parameter["responseType"], dict):  # Always wrap in list
-            self.response_data_type = {"response": parameter["responseType"]}
-        else:
-            self.response_data_type = parameter["responseType"]
-        self.request_data = bytearray()
-
-    def generate_request(self, **kwargs) -> bytearray:
-        self.request_data = bytearray(18)
-        self.request_data[0] = 0x02  # Hard coded value (start of packet)
-        self.request_data[1] = 0xFD  # 0xFD = LINKED_PACKET_TYPE
-        self.request_data[2] = 0x00  # Length, low byte, updated later
-        self.request_data[3] = 0x00  # Length, high byte, updated later
-
-        # ChannelID
-        id = self.channel_id.to_bytes(4, byteorder="little")
-        self.request_data[4] = id[0]
-        self.request_data[5] = id[1]
-        self.request_data[6] = id[2]
-        self.request_data[7] = id[3]
+# GATT characteristics holding the device name and type strings
+DEVICE_NAME_CHAR = "00002a00-0000-1000-8000-00805f9b34fb"
+DEVICE_TYPE_CHAR = "98bd0004-0b0e-421a-84e5-ddbf75dc6de4"
 
-        self.request_data[8] = 0x01  # is_linked (usually 0x01)
-
-        self.request_data[9] = 0x00  # CRC, Updated later
-        self.request_data[10] = (
-            0x00  # Packet type (0x00 = request, 0x01 = response, 0x02 = event)
-        )
-        self.request_data[11] = 0xAF  # Hard coded value
-
-        major_bytes = self.major.to_bytes(2, byteorder="little")
-
-        self.request_data[12] = major_bytes[0]  # low byte of 'module'
-        self.request_data[13] = major_bytes[1]  # high byte of 'module'
-        self.request_data[14] = self.minor  # low byte of 'command'
-        self.request_data[15] = 0x00  # high byte of 'command'
-
-        # Byte 16 represents length of request data type
-        request_length = 0
-        request_data = bytearray()
-        if self.request_data_type is not None:
-            for request_name, request_type in self.request_data_type.items():
-                if request_name not in kwargs:
-                    raise ValueError(
-                        "Missing request parameter: "
-                        + request_name
-                        + " for command ("
-                        + str(self.major)
-                        + ", "
-                        + str(self.minor)
-                        + ")"
-                    )
 
-                if request_type == "uint32":
-                    request_length += 4
-                    request_data += kwargs[request_name].to_bytes(4, byteorder="little")
-                elif request_type == "uint16":
-                    request_length += 2
-                    request_data += kwargs[request_name].to_bytes(2, byteorder="little")
-                elif request_type == "uint8":
-                    request_length += 1
-                    request_data += kwargs[request_name].to_bytes(1, byteorder="little")
-                else:
-                    raise ValueError("Unknown request type: " + self.request_type)
-        self.request_data[16] = request_length
+class _Preempted(Exception):
+    pass
 
-        self.request_data[17] = 0x00  # high byte of request_length
-        if request_length > 0:
-            self.request_data += request_data
 
-        self.request_data[2] = len(self.request_data) - 2  # Length
+class _Disconnected(Exception):
+    pass
 
-        self.request_data[9] = crc(self.request_data, 1, 8)  # CRC
 
-        # Two last bytes are crc and 0x03
-        self.request_data.append(crc(self.request_data, 1, len(self.request_data) - 1))
-        self.request_data.append(0x03)  # Hard coded value
+def _valid_frame(data, channel_id: int | None = None) -> bool:
+    """
+    Check the framing of a response to the channel setup or handshake,
+    which aren't command responses. If `channel_id` is set the response
+    must carry it.
+    """
+    if len(data) < 12 or data[0] != 0x02 or data[1] != 0xFD or data[-1] != 0x03:
+        return False
+    if data[9] != crc(data, 1, 8):
+        return False
+    # The CRC before the end byte covers everything after the start byte
+    if data[-2] != crc(data, 1, len(data) - 3):
+        return False
+    if channel_id is not None and data[4:8] != channel_id.to_bytes(4, "little"):
+        return False
+    return True
 
-        return self.request_data
 
-    def parse_response(self, response_data: bytearray) -> int | None:
-        response_length = response_data[17]
-        data = response_data[19 : 19 + response_length]
-        response = dict()
-        dpos = 0  # data position
-        for name, dtype in self.response_data_type.items():
-            if dtype == "no_response":
-                return None
-            elif (dtype == "tUnixTime") or (dtype == "uint32"):
-                response[name] = int.from_bytes(
-                    data[dpos : dpos + 4], byteorder="little"
-                )
-                dpos += 4
-            elif dtype == "uint16":
-                response[name] = int.from_bytes(
-                    data[dpos : dpos + 2], byteorder="little"
-                )
-                dpos += 2
-            elif (dtype == "uint8") or (dtype == "bool"):
-                response[name] = data[dpos]
-                dpos += 1
-            else:
-                raise ValueError("Unknown data type: " + dtype)
-        if dpos != len(data):
-            raise ValueError(
-                "Data length mismatch. Read %d bytes of %d" % (dpos, len(data))
-            )
-        return response
+class ChannelSession:
+    """The channel and login negotiated with a mower"""
 
-    def validate_response(self, response_data: bytearray) -> bool:
-        if response_data[0] != 0x02:
-            return False
+    def __init__(self, channel_id: int, authenticated: bool):
+        self.channel_id = channel_id
+        self.authenticated = authenticated
+        # When the session was last known to work
+        self.last_seen = time.monotonic()
 
-        if response_data[1] != 0xFD:
-            return False
 
-        if response_data[3] != 0x00:  # high byte of length
-            return False
+class BLEClient:
+    # Number of notifications buffered before the oldest is dropped
+    NOTIFICATION_BUFFERS = 32
+    # Seconds to wait for the start of a response and for each further
+    # fragment of it, and how often a request is sent before giving up
+    RESPONSE_TIMEOUT = 10.0
+    FRAGMENT_TIMEOUT = 5.0
+    REQUEST_ATTEMPTS = 5
+    # A reconnect within this many seconds of the last one first tries to
+    # reuse the channel and login, waiting at most SESSION_PROBE_TIMEOUT
+    SESSION_TTL = 60.0
+    SESSION_PROBE_TIMEOUT = 2.0
+    # Seconds to give the mower after subscribing to notifications before
+    # the channel is set up
+    SETTLE_DELAY = 5.0
 
-        id = self.channel_id.to_bytes(4, byteorder="little")
-        if response_data[4] != id[0]:
-            return False
-        if response_data[5] != id[1]:
-            return False
-        if response_data[6] != id[2]:
-            return False
-        if response_data[7] != id[3]:
-            return False
+    def __init__(
+        self,
+        channel_id: int,
+        address,
+        pin=None,
+        requests_per_second: float | None = None,
+        burst: int = 1,
+        metadata=None,
+    ):
+        """
+        If `requests_per_second` is set every request sent to the mower,
+        including retries, the connect handshake and keepalives, is
+        limited by a token bucket that allows `burst` back to back requests.
 
-        if response_data[8] != 0x01:
-            # This is a valid config, but we don't support it
-            # return m1656b(decodeState, c10786f);
-            return False
+        `metadata` is an optional `MetadataCache`, it is used to skip
+        discovering the characteristics on every connection.
+        """
+        self.channel_id = channel_id
+        self.address = address
+        self.pin = pin
+        self.MTU_SIZE = 20
 
-        if response_data[9] != crc(response_data, 1, 8):
-            return False
+        if requests_per_second is not None:
+            self.rate_limiter = TokenBucket(requests_per_second, burst)
+        else:
+            self.rate_limiter = None
 
-        if response_data[10] != 0x01:  # packet type is not 0x01 = response
-            return False
+        self.scheduler = RequestScheduler()
 
-        if response_data[11] != 0xAF:
-            return False
+        # The Bluetooth adapter to connect with, such as "hci1". None uses
+        # the default adapter.
+        self.adapter = None
 
-        major_bytes = self.major.to_bytes(4, byteorder="little")
-        if response_data[12] != major_bytes[0]:
-            return False
-        if response_data[13] != major_bytes[1]:
-            return False
-        if response_data[14] != self.minor:
-            return False
+        # Called with the device to create the client instead of a
+        # BleakClient, used to record or replay sessions (see replay.py)
+        self.client_factory = None
 
-        if response_data[15] != 0x00:  # high byte of 'command' (self.minor)
-            return False
+        self.client = None
+        # The device of the last connection, so it can be reconnected
+        self.device = None
+        # Set while disconnected, wakes up everything waiting for the mower
+        self._disconnected = asyncio.Event()
 
-        if (
-            response_data[16] != 0x00
-        ):  # result: OK(0), UNKNOWN_ERROR(1), INVALID_VALUE(2), OUT_OF_RANGE(3), NOT_AVAILABLE(4), NOT_ALLOWED(5), INVALID_GROUP(6), INVALID_ID(7), DEVICE_BUSY(8), INVALID_PIN(9), MOWER_BLOCKED(10);
-            return False
+        self.notifications = NotificationBuffer(
+            self.NOTIFICATION_BUFFERS, self.MTU_SIZE
+        )
 
-        return True
+        self.protocol = get_protocol()  # Shared by all clients
+        self.metadata = metadata
 
+        self.session = None
+        self.handshakes = 0
+        self.resumed_sessions = 0
 
-class BLEClient:
-    def __init__(self, channel_id: int, address, pin=None):
-        self.channel_id = channel_id
-        self.address = address
-        self.pin = pin
-        self.MTU_SIZE = 20
+        # Link metrics, see link_stats()
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.last_write = None
+        self.last_notification = None
 
-        self.queue = asyncio.Queue()
-
-        with files("automower_ble").joinpath("protocol.json").open("r") as f:
-            self.protocol = json.load(f)  # Load the JSON file
+    async def _next_notification(self, data: bytearray, timeout: float) -> int:
+        """
+        Append the next notification from the mower to `data`. Raises
+        `asyncio.TimeoutError` if none arrives in time and `_Disconnected`
+        as soon as `disconnect()` is called.
+        """
+        try:
+            return await self.notifications.read_into(data, timeout)
+        except BufferClosed:
+            raise _Disconnected() from None
 
-    async def _get_response(self):
+    async def _get_response(self, data: bytearray) -> bool:
         try:
-            data = await asyncio.wait_for(self.queue.get(), timeout=10)
+            await self._next_notification(data, timeout=self.RESPONSE_TIMEOUT)
 
-        except TimeoutError:
+        except asyncio.TimeoutError:
             logger.error("Unable to get response from device: '%s'", self.address)
+            # A mower that stopped answering may have dropped the channel
+            self.session = None
             if self.is_connected():
                 await self.disconnect()
-            return None
+            return False
 
-        return data
+        return True
 
     async def _write_data(self, data):
         logger.info("Writing: " + str(binascii.hexlify(data)))
@@ -277,31 +180,33 @@ class BLEClient:
             data[i : i + chunk_size] for i in range(0, len(data), chunk_size)
         ):
             await self.client.write_gatt_char(self.write_char, chunk, response=False)
+        self.last_write = time.monotonic()
 
         logger.debug("Finished writing")
 
     async def _read_data(self):
-        data = await self._get_response()
+        data = bytearray()
 
-        if data is None:
+        if not await self._get_response(data):
             return None
 
-        if len(data) < 3:
+        if len(data) < 4:
             # We got such a small amount of data, let's try again
-            data = data + await self._get_response()
+            if not await self._get_response(data):
+                return None
 
-            if len(data) < 3:
+            if len(data) < 4:
                 # Something is wrong
                 return None
 
-        length = data[2] + 4
+        length = int.from_bytes(data[2:4], byteorder="little") + 4
 
         logger.debug("Waiting for %d bytes", length)
 
-        while len(data) != length:
+        while len(data) < length:
             try:
-                data = data + await asyncio.wait_for(self.queue.get(), timeout=5)
-            except TimeoutError:
+                await self._next_notification(data, timeout=self.FRAGMENT_TIMEOUT)
+            except asyncio.TimeoutError:
                 logger.error(
                     "Unable to get full response from device: '%s', currently have"
                     + str(binascii.hexlify(data)),
@@ -309,44 +214,225 @@ class BLEClient:
                 )
                 return None
 
-        logger.info("Final response: " + str(binascii.hexlify(data)))
+        if len(data) > length:
+            logger.debug("Dropping %d bytes after the response", len(data) - length)
+            del data[length:]
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Final response: " + str(binascii.hexlify(data)))
 
         return data
 
-    async def _request_response(self, request_data):
-        i = 5
-        while i > 0:
-            try:
-                # If there are previous responses, flush them out
-                while not self.queue.empty():
-                    await self.queue.get()
+    async def _read_data_preemptible(self):
+        """
+        Read a response, but give up as soon as a higher priority request
+        is waiting for the link
+        """
+        read = asyncio.ensure_future(self._read_data())
+        preempt = asyncio.ensure_future(self.scheduler.preempt.wait())
+        try:
+            await asyncio.wait({read, preempt}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            preempt.cancel()
+            if not read.done():
+                read.cancel()
+
+        if not read.done():
+            await asyncio.wait({read})
+            raise _Preempted()
+        return read.result()
+
+    async def _read_response(self, request_data, priority: RequestPriority):
+        """
+        Read the response to `request_data`, skipping any late responses
+        to earlier requests that were given up on
+        """
+        while True:
+            if priority == RequestPriority.BACKGROUND:
+                response_data = await self._read_data_preemptible()
+            else:
+                response_data = await self._read_data()
 
-                await self._write_data(request_data)
+            if (
+                response_data is not None
+                and len(response_data) >= 16
+                and request_data[11] == 0xAF
+                and response_data[11] == 0xAF
+                and response_data[12:16] != request_data[12:16]
+            ):
+                logger.debug("Discarding response to a different request")
+                continue
 
-                response_data = await self._read_data()
-                if response_data is None:
-                    i = i - 1
+            return response_data
+
+    async def _request_response(
+        self, request_data, priority: RequestPriority = RequestPriority.INTERACTIVE
+    ):
+        """
+        Send a request and wait for the response. The link is shared, so
+        this first waits for all queued requests with a higher priority.
+        Background requests are deferred if a higher priority request
+        arrives while they are waiting for a response or retrying.
+        """
+        await self.scheduler.acquire(priority)
+        held = True
+
+        try:
+            i = self.REQUEST_ATTEMPTS
+            while i > 0:
+                if priority == RequestPriority.BACKGROUND:
+                    if self.scheduler.has_waiters_above(priority):
+                        logger.debug("Deferring background request")
+                        held = False
+                        self.scheduler.release()
+                        await self.scheduler.acquire(priority)
+                        held = True
+                    else:
+                        self.scheduler.preempt.clear()
+
+                if self._disconnected.is_set():
+                    logger.debug("Not connected, dropping request")
+                    return None
+
+                try:
+                    # If there are previous responses, flush them out
+                    self.notifications.clear()
+
+                    if self.rate_limiter is not None:
+                        await self.rate_limiter.acquire()
+
+                    self.attempts += 1
+                    await self._write_data(request_data)
+
+                    response_data = await self._read_response(request_data, priority)
+                    if response_data is None:
+                        self.retries += 1
+                        i = i - 1
+                        continue
+
+                except _Preempted:
+                    logger.debug("Background request preempted")
                     continue
 
-            except asyncio.exceptions.CancelledError:
-                logger.debug("Received CancelledError")
-                i = i - 1
-                continue
+                except _Disconnected:
+                    logger.debug("Disconnected while waiting for a response")
+                    return None
 
-            break
+                break
 
-        if i == 0:
-            logger.error("Unable to communicate with device: '%s'", self.address)
-            if self.is_connected():
-                await self.disconnect()
-            return None
+            if i == 0:
+                self.failures += 1
+                logger.error("Unable to communicate with device: '%s'", self.address)
+                self.session = None
+                if self.is_connected():
+                    await self.disconnect()
+                return None
 
-        return response_data
+            self._session_seen()
+            return response_data
+        finally:
+            if held:
+                self.scheduler.release()
 
-    async def connect(self, device) -> bool:
+    async def _request_responses(
+        self,
+        requests: list,
+        timeout: float = 10.0,
+        priority: RequestPriority = RequestPriority.CONTROL,
+    ) -> list:
+        """
+        Send several requests back to back and then wait for all of the
+        responses with a single deadline. Responses are matched to the
+        requests by command, the returned list has a response (or None if
+        it did not arrive in time) for every request in order.
+        """
+        responses = [None] * len(requests)
+
+        async with self.scheduler.slot(priority):
+            if self._disconnected.is_set():
+                logger.debug("Not connected, dropping requests")
+                return responses
+
+            # If there are previous responses, flush them out
+            self.notifications.clear()
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+
+            for request_data in requests:
+                if self.rate_limiter is not None:
+                    await self.rate_limiter.acquire()
+                self.attempts += 1
+                await self._write_data(request_data)
+
+            remaining = len(requests)
+            while remaining > 0:
+                try:
+                    response_data = await asyncio.wait_for(
+                        self._read_data(), deadline - loop.time()
+                    )
+                except (asyncio.TimeoutError, _Disconnected):
+                    break
+
+                if response_data is None:
+                    break
+
+                for i, request_data in enumerate(requests):
+                    if (
+                        responses[i] is None
+                        and len(response_data) >= 16
+                        and response_data[12:16] == request_data[12:16]
+                    ):
+                        responses[i] = response_data
+                        remaining -= 1
+                        break
+                else:
+                    logger.debug("Discarding response to a different request")
+
+        if remaining > 0:
+            logger.error(
+                "Missing %d of %d responses from device: '%s'",
+                remaining,
+                len(requests),
+                self.address,
+            )
+        if remaining < len(requests):
+            self._session_seen()
+
+        return responses
+
+    def _session_seen(self):
+        # The mower answered, so the session is known to work
+        if self.session is not None:
+            self.session.last_seen = time.monotonic()
+
+    def _create_client(self, device):
+        if self.client_factory is not None:
+            return self.client_factory(device)
+        return self._create_bleak_client(device)
+
+    def _create_bleak_client(self, device) -> BleakClient:
+        """Create the BleakClient for `device`, on `self.adapter` if set"""
+        kwargs = {}
+        if self.adapter is not None:
+            kwargs["adapter"] = self.adapter
+        return BleakClient(
+            device,
+            services=["98bd0001-0b0e-421a-84e5-ddbf75dc6de4"],
+            use_cached=True,
+            **kwargs,
+        )
+
+    async def connect(
+        self, device, discover: bool = True, settle_delay: float | None = None
+    ) -> bool:
         """
         Connect to a device and setup the channel
 
+        Without `discover` only the two characteristics of the channel
+        are looked up, instead of reading every characteristic of the
+        mower. `settle_delay` overrides SETTLE_DELAY.
+
         Returns True on success
         """
         logger.info("starting scan...")
@@ -356,11 +442,12 @@ class BLEClient:
             return False
 
         logger.info("connecting to device...")
-        self.client = BleakClient(
-            device, services=["98bd0001-0b0e-421a-84e5-ddbf75dc6de4"], use_cached=True
-        )
+        self.device = device
+        self.client = self._create_client(device)
         await self.client.connect()
         logger.info("connected")
+        self._disconnected.clear()
+        self.notifications.open()
 
         logger.info("pairing device...")
         await self.client.pair()
@@ -368,6 +455,140 @@ class BLEClient:
 
         self.client._backend._mtu_size = self.MTU_SIZE
 
+        cached = self._cached_characteristics()
+        if not cached:
+            if discover:
+                await self._discover_characteristics()
+            elif not self._lookup_characteristics():
+                return False
+
+        await self.client.start_notify(self.read_char, self._notification_handler)
+
+        await asyncio.sleep(self.SETTLE_DELAY if settle_delay is None else settle_delay)
+
+        return await self._setup_session(cached)
+
+    async def _setup_session(self, cached: bool = False) -> bool:
+        if await self._resume_session():
+            return True
+        return await self._open_session(cached)
+
+    async def _resume_session(self) -> bool:
+        """
+        Reuse the channel and login of a recent connection. This costs a
+        single round trip instead of the channel setup, the handshake and
+        the PIN, returns False if the full handshake is needed.
+        """
+        session = self.session
+        if session is None or session.channel_id != self.channel_id:
+            return False
+        if time.monotonic() - session.last_seen > self.SESSION_TTL:
+            self.session = None
+            return False
+
+        # Only answered on a channel the mower still knows about
+        command = Command(self.channel_id, self.protocol["isOperatorLoggedIn"])
+        (response,) = await self._request_responses(
+            [command.generate_request()],
+            timeout=self.SESSION_PROBE_TIMEOUT,
+            priority=RequestPriority.CONTROL,
+        )
+        self.session = None
+        if response is None or not command.validate_response(response):
+            logger.info("Unable to resume the session with '%s'", self.address)
+            return False
+
+        authenticated = bool(command.parse_response(response)["response"])
+        if self.pin is not None and not authenticated:
+            authenticated = await self._send_pin()
+            if authenticated is None:
+                return False
+
+        self.session = ChannelSession(self.channel_id, authenticated)
+        self.resumed_sessions += 1
+        logger.info("Resumed the session with '%s'", self.address)
+        return True
+
+    async def _open_session(self, cached: bool = False) -> bool:
+        """Setup the channel, handshake and send the PIN if there is one"""
+        request = self.generate_request_setup_channel_id()
+        response = await self._request_response(request, RequestPriority.CONTROL)
+        if response is None:
+            if cached:
+                # The handles may be stale, discover them next time
+                self.metadata.invalidate(self.address)
+            return False
+        if not _valid_frame(response):
+            logger.error("Invalid channel setup response from '%s'", self.address)
+            return False
+
+        request = self.generate_request_handshake()
+        response = await self._request_response(request, RequestPriority.CONTROL)
+        if response is None:
+            return False
+        if not _valid_frame(response, self.channel_id):
+            logger.error("Invalid handshake response from '%s'", self.address)
+            return False
+
+        authenticated = False
+        if self.pin is not None:
+            authenticated = await self._send_pin()
+            if authenticated is None:
+                return False
+
+        self.session = ChannelSession(self.channel_id, authenticated)
+        self.handshakes += 1
+        return True
+
+    async def _send_pin(self) -> bool | None:
+        """
+        Returns whether the PIN was accepted, or None if the mower did
+        not respond
+        """
+        command = Command(self.channel_id, self.protocol["pin"])
+        request = command.generate_request(code=self.pin)
+        response = await self._request_response(request, RequestPriority.CONTROL)
+        if response is None:
+            return None
+        if not command.validate_response(response):
+            # Reading still works without logging in
+            logger.error(
+                "PIN not accepted by '%s': %s",
+                self.address,
+                command.result_code(response).name,
+            )
+            return False
+        return True
+
+    def _cached_characteristics(self) -> bool:
+        """Look up the characteristics by their cached handles"""
+        if self.metadata is None:
+            return False
+        handles = self.metadata.get(self.address, "handles")
+        if handles is None:
+            return False
+
+        write_char = self.client.services.get_characteristic(handles[0])
+        read_char = self.client.services.get_characteristic(handles[1])
+        if write_char is None or read_char is None:
+            logger.info("Cached handles of '%s' are stale", self.address)
+            return False
+
+        self.write_char = write_char
+        self.read_char = read_char
+        return True
+
+    def _lookup_characteristics(self) -> bool:
+        """Look up the characteristics of the channel by UUID, reading nothing"""
+        services = self.client.services
+        self.write_char = services.get_characteristic(WRITE_CHAR)
+        self.read_char = services.get_characteristic(READ_CHAR)
+        if self.write_char is None or self.read_char is None:
+            logger.error("Mower '%s' has no channel characteristics", self.address)
+            return False
+        return True
+
+    async def _discover_characteristics(self):
         for service in self.client.services:
             logger.info("[Service] %s", service)
 
@@ -393,115 +614,142 @@ class BLEClient:
                     logger.debug(
                         "  [Characteristic] %s (%s)", char, ",".join(char.properties)
                     )
-                if char.uuid == "98bd0002-0b0e-421a-84e5-ddbf75dc6de4":
+                if char.uuid == WRITE_CHAR:
                     self.write_char = char
 
-                if char.uuid == "98bd0003-0b0e-421a-84e5-ddbf75dc6de4":
+                if char.uuid == READ_CHAR:
                     self.read_char = char
 
-        async def notification_handler(
-            characteristic: BleakGATTCharacteristic, data: bytearray
-        ):
-            logger.info("Received: " + str(binascii.hexlify(data)))
-            await self.queue.put(data)
-
-        await self.client.start_notify(self.read_char, notification_handler)
-
-        await asyncio.sleep(5.0)
-
-        request = self.generate_request_setup_channel_id()
-        response = await self._request_response(request)
-        if response is None:
-            return False
-
-        ### TODO: Check response
-
-        request = self.generate_request_handshake()
-        response = await self._request_response(request)
-        if response is None:
-            return False
+        if self.metadata is not None:
+            self.metadata.update(
+                self.address, handles=[self.write_char.handle, self.read_char.handle]
+            )
 
-        ### TODO: Check response
+    def _notification_handler(
+        self, characteristic: BleakGATTCharacteristic, data: bytearray
+    ):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Received: " + str(binascii.hexlify(data)))
+        self.last_notification = time.monotonic()
+        self.notifications.put_nowait(data)
 
-        if self.pin is not None:
-            command = Command(self.channel_id, self.protocol["pin"])
-            request = command.generate_request(code=self.pin)
-            response = await self._request_response(request)
-            if response is None:
-                return False
+    def notification_stats(self) -> dict:
+        """Return the receive buffer metrics, including dropped notifications"""
+        return self.notifications.stats()
 
-        return True
+    def link_stats(self) -> dict:
+        """
+        Return the number of requests written, including retries, how
+        many of them got no response, how many requests failed after all
+        retries and how many connections did the full handshake or
+        resumed the previous session
+        """
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "failures": self.failures,
+            "handshakes": self.handshakes,
+            "resumed_sessions": self.resumed_sessions,
+        }
+
+    async def probe(
+        self, priority: RequestPriority = RequestPriority.BACKGROUND
+    ) -> float | None:
+        """
+        Send a keepalive and return the round trip time in seconds, or
+        None if the mower did not respond
+        """
+        command = Command(self.channel_id, self.protocol["keepalive"])
+        request = command.generate_request()
+        started = time.monotonic()
+        response = await self._request_response(request, priority)
+        if response is None or not command.matches_response(response):
+            return None
+        return time.monotonic() - started
 
     def is_connected(self) -> bool:
+        if self.client is None:
+            return False
         return self.client.is_connected
 
+    def rate_limit_stats(self) -> dict | None:
+        """
+        Return the queueing delay metrics of the rate limiter, or None
+        if rate limiting is disabled
+        """
+        if self.rate_limiter is None:
+            return None
+        return self.rate_limiter.stats()
+
     async def probe_gatts(self, device):
         if device is None:
             logger.error("could not find device with address '%s'", self.address)
             return False
 
         logger.info("connecting to device...")
-        client = BleakClient(
-            device, services=["98bd0001-0b0e-421a-84e5-ddbf75dc6de4"], use_cached=True
-        )
+        client = self._create_client(device)
 
         await client.connect()
         logger.info("connected")
 
         manufacture = None
-        model = None
-        device_type = None
-
         for service in client.services:
             logger.debug("[Service] %s", service)
-
             if service.uuid == "98bd0001-0b0e-421a-84e5-ddbf75dc6de4":
                 manufacture = service.description
 
-            for char in service.characteristics:
-                if "read" in char.properties:
-                    try:
-                        value = await client.read_gatt_char(char.uuid)
-                        logger.debug(
-                            "  [Characteristic] %s (%s), Value: %r",
-                            char,
-                            ",".join(char.properties),
-                            value,
-                        )
-                    except Exception as e:
-                        logger.error(
-                            "  [Characteristic] %s (%s), Error: %s",
-                            char,
-                            ",".join(char.properties),
-                            e,
-                        )
-
-                else:
-                    logger.debug(
-                        "  [Characteristic] %s (%s)", char, ",".join(char.properties)
-                    )
-
-                if char.uuid == "00002a00-0000-1000-8000-00805f9b34fb":
-                    model = await client.read_gatt_char(char)
-
-                if char.uuid == "98bd0004-0b0e-421a-84e5-ddbf75dc6de4":
-                    device_type = await client.read_gatt_char(char)
+        model, device_type = await self._read_device_strings(client)
 
         await client.disconnect()
 
-        return (manufacture, device_type.decode(), model.decode())
+        return (manufacture, device_type, model)
 
-    async def disconnect(self):
+    async def _read_device_strings(self, client) -> tuple:
+        values = []
+        for uuid in (DEVICE_NAME_CHAR, DEVICE_TYPE_CHAR):
+            try:
+                value = await client.read_gatt_char(uuid)
+                values.append(bytes(value).decode())
+            except Exception as e:
+                logger.error("Unable to read characteristic %s: %s", uuid, e)
+                values.append(None)
+        return tuple(values)
+
+    async def read_device_information(self) -> tuple:
+        """
+        Read the device name and device type strings of the connected
+        mower, either is None if it could not be read
+        """
+        return await self._read_device_strings(self.client)
+
+    async def disconnect(self, timeout: float = DISCONNECT_TIMEOUT):
         """
         Disconnect from the mower, this should be called after every
         `connect()` before the Python script exits
+
+        Any request waiting for the mower fails straight away and each
+        step of the teardown is limited to `timeout` seconds, so this
+        finishes in bounded time even if the link is already dead.
         """
+        self._disconnected.set()
+        self.notifications.close()
+        if self.metadata is not None:
+            self.metadata.save()
 
-        await self.client.stop_notify(self.read_char)
-        await self.queue.put(None)
+        if self.client is None:
+            return
+
+        try:
+            await asyncio.wait_for(self.client.stop_notify(self.read_char), timeout)
+        except Exception as e:
+            logger.debug("Unable to stop notifications: %s", e)
 
         logger.info("disconnecting...")
-        await self.client.disconnect()
+        try:
+            await asyncio.wait_for(self.client.disconnect(), timeout)
+        except Exception as e:
+            logger.error("Unable to disconnect from device '%s': %s", self.address, e)
+            return
         logger.info("disconnected")
 
     def generate_request_setup_channel_id(self) -> bytearray:
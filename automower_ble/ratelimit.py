@@ -0,0 +1,76 @@
+"""
+Client side rate limiting of requests sent to the mower. The mower
+firmware starts returning DEVICE_BUSY or dropping notifications when
+it receives requests too quickly, so every write goes through a token
+bucket that allows short bursts but enforces a sustained rate.
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        `rate` is the sustained number of requests per second and `burst`
+        is the number of requests that can be sent back to back
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be positive, got: " + str(rate))
+        if burst < 1:
+            raise ValueError("Burst must be at least 1, got: " + str(burst))
+
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        # Waiters are served in FIFO order
+        self._lock = asyncio.Lock()
+
+        self.acquired = 0
+        self.delayed = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """
+        Wait until a request can be sent. Returns the time in seconds
+        the caller was delayed for.
+        """
+        start = time.monotonic()
+        waited = self._lock.locked()
+
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                waited = True
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+        delay = time.monotonic() - start if waited else 0.0
+        self.acquired += 1
+        if waited:
+            self.delayed += 1
+            self.total_delay += delay
+            self.max_delay = max(self.max_delay, delay)
+
+        return delay
+
+    def stats(self) -> dict:
+        """Return the queueing delay metrics of the bucket"""
+        return {
+            "acquired": self.acquired,
+            "delayed": self.delayed,
+            "total_delay": self.total_delay,
+            "max_delay": self.max_delay,
+            "average_delay": (
+                self.total_delay / self.acquired if self.acquired > 0 else 0.0
+            ),
+        }
@@ -0,0 +1,306 @@
+"""
+Recording and replaying sessions with a mower. A recording holds every
+write of the client and every notification of the mower, fragmented and
+timed exactly as they went over the air, so a session captured from a
+real mower can be played back to a `Mower` without any Bluetooth
+hardware. This turns field captures into regression tests for response
+reassembly, retries and latency.
+
+File layout, all little endian:
+
+    header  magic "AMRP", uint8 version, uint32 channel id
+    events  uint8 kind, uint32 microseconds since the previous event,
+            uint16 length, data
+
+The kinds are CONNECT, WRITE, NOTIFY and DISCONNECT, only writes and
+notifications carry data.
+"""
+
+import asyncio
+import logging
+import struct
+import time
+from types import SimpleNamespace
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AMRP"
+VERSION = 1
+
+HEADER = struct.Struct("<4sBI")
+EVENT = struct.Struct("<BIH")
+
+CONNECT = 1
+WRITE = 2
+NOTIFY = 3
+DISCONNECT = 4
+
+SERVICE_UUID = "98bd0001-0b0e-421a-84e5-ddbf75dc6de4"
+WRITE_CHAR_UUID = "98bd0002-0b0e-421a-84e5-ddbf75dc6de4"
+READ_CHAR_UUID = "98bd0003-0b0e-421a-84e5-ddbf75dc6de4"
+
+
+class ReplayMismatch(Exception):
+    """Raised by a strict replay when the client writes something else"""
+
+
+class Recording:
+    def __init__(self, channel_id: int, events: list):
+        """
+        `events` is a list of (seconds since the previous event, kind,
+        data) tuples
+        """
+        self.channel_id = channel_id
+        self.events = events
+
+    @property
+    def duration(self) -> float:
+        return sum(event[0] for event in self.events)
+
+    def count(self, kind: int) -> int:
+        return sum(1 for event in self.events if event[1] == kind)
+
+
+def load_recording(path) -> Recording:
+    """Read a recording, raises ValueError if it is not one"""
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError("Not a session recording: " + str(path))
+    magic, version, channel_id = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a session recording: " + str(path))
+
+    events = []
+    offset = HEADER.size
+    while offset < len(data):
+        if offset + EVENT.size > len(data):
+            raise ValueError("Truncated session recording: " + str(path))
+        kind, delta, length = EVENT.unpack_from(data, offset)
+        offset += EVENT.size
+        if offset + length > len(data):
+            raise ValueError("Truncated session recording: " + str(path))
+        events.append((delta / 1e6, kind, data[offset : offset + length]))
+        offset += length
+    return Recording(channel_id, events)
+
+
+class Recorder:
+    def __init__(self, path, channel_id: int):
+        """Record the sessions of clients passed to `attach()` to `path`"""
+        self._file = open(path, "wb")
+        self._file.write(HEADER.pack(MAGIC, VERSION, channel_id))
+        self._last = None
+        self.events = 0
+
+    def record(self, kind: int, data: bytes = b""):
+        now = time.monotonic()
+        delta = 0 if self._last is None else round((now - self._last) * 1e6)
+        self._last = now
+        self._file.write(EVENT.pack(kind, min(delta, 0xFFFFFFFF), len(data)))
+        self._file.write(data)
+        self.events += 1
+
+    def attach(self, client):
+        """Record every connection `client`, a BLEClient, makes from now on"""
+        create = client._create_bleak_client
+        client.client_factory = lambda device: RecordingClient(create(device), self)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RecordingClient:
+    """Wraps a BleakClient and records the traffic going through it"""
+
+    def __init__(self, client, recorder: Recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    async def connect(self, **kwargs):
+        await self._client.connect(**kwargs)
+        self._recorder.record(CONNECT)
+
+    async def write_gatt_char(self, char, data, response=False):
+        self._recorder.record(WRITE, bytes(data))
+        await self._client.write_gatt_char(char, data, response=response)
+
+    async def start_notify(self, char, callback, **kwargs):
+        def record(characteristic, data):
+            self._recorder.record(NOTIFY, bytes(data))
+            callback(characteristic, data)
+
+        await self._client.start_notify(char, record, **kwargs)
+
+    async def disconnect(self):
+        self._recorder.record(DISCONNECT)
+        return await self._client.disconnect()
+
+
+class _Characteristic:
+    def __init__(self, uuid: str, handle: int, properties: list):
+        self.uuid = uuid
+        self.handle = handle
+        self.properties = properties
+
+    def __str__(self):
+        return self.uuid
+
+
+class _Services:
+    """Just enough of a BleakGATTServiceCollection for BLEClient"""
+
+    def __init__(self):
+        self.service = SimpleNamespace(
+            uuid=SERVICE_UUID,
+            characteristics=[
+                _Characteristic(WRITE_CHAR_UUID, 1, ["write-without-response"]),
+                _Characteristic(READ_CHAR_UUID, 2, ["notify"]),
+            ],
+        )
+
+    def __iter__(self):
+        return iter([self.service])
+
+    def get_characteristic(self, handle):
+        for char in self.service.characteristics:
+            if char.handle == handle:
+                return char
+        return None
+
+
+class ReplayClient:
+    """Stands in for a BleakClient, the mower's side comes from a recording"""
+
+    def __init__(self, replayer):
+        self._replayer = replayer
+        self._callback = None
+        self.is_connected = False
+        self.services = _Services()
+        self._backend = SimpleNamespace(_mtu_size=None)
+
+    async def connect(self, **kwargs):
+        self._replayer._connect()
+        self.is_connected = True
+
+    async def pair(self, **kwargs):
+        pass
+
+    async def start_notify(self, char, callback, **kwargs):
+        self._callback = callback
+        # Anything the mower sent before the first request
+        self._replayer._play(self)
+
+    async def stop_notify(self, char):
+        self._callback = None
+
+    async def write_gatt_char(self, char, data, response=False):
+        self._replayer._write(self, bytes(data))
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    def _notify(self, data: bytes):
+        if self._callback is not None and self.is_connected:
+            self._callback(None, bytearray(data))
+
+
+class Replayer:
+    def __init__(self, recording: Recording, speed: float | None = None, strict=False):
+        """
+        Play `recording` back to clients passed to `attach()`. After each
+        write the notifications that followed it are sent with the
+        recorded timing divided by `speed`, or one per event loop
+        iteration if `speed` is None.
+
+        A write that is not in the recording is never answered, like a
+        lost request, unless `strict` is set, then ReplayMismatch is
+        raised instead.
+        """
+        self.recording = recording
+        self.speed = speed
+        self.strict = strict
+        self._position = 0
+
+        self.writes = 0
+        self.unmatched = 0
+        self.notifications = 0
+
+    def attach(self, client):
+        """
+        Replace the BleakClient of `client`, a BLEClient. Replaying as
+        fast as possible also skips the settle delay of the client.
+        """
+        client.client_factory = lambda device: ReplayClient(self)
+        if self.speed is None:
+            client.SETTLE_DELAY = 0.0
+
+    def _connect(self):
+        events = self.recording.events
+        for i in range(self._position, len(events)):
+            if events[i][1] == CONNECT:
+                self._position = i + 1
+                return
+        logger.debug("No more connections in the recording")
+
+    def _write(self, client: ReplayClient, data: bytes):
+        self.writes += 1
+        events = self.recording.events
+        for i in range(self._position, len(events)):
+            if events[i][1] != WRITE:
+                continue
+            if events[i][2] == data:
+                self._position = i + 1
+                self._play(client)
+                return
+            if self.strict:
+                raise ReplayMismatch(
+                    "Expected write %s, got %s" % (events[i][2].hex(), data.hex())
+                )
+
+        self.unmatched += 1
+        if self.strict:
+            raise ReplayMismatch("Unexpected write " + data.hex())
+        logger.debug("Write not in the recording: %s", data.hex())
+
+    def _play(self, client: ReplayClient):
+        """Send the notifications up to the next write to `client`"""
+        events = self.recording.events
+        end = self._position
+        while end < len(events) and events[end][1] == NOTIFY:
+            end += 1
+        start, self._position = self._position, end
+        if start < end:
+            self._schedule(client, start, end)
+
+    def _schedule(self, client: ReplayClient, index: int, end: int):
+        delay, _, data = self.recording.events[index]
+        delay = delay / self.speed if self.speed is not None else 0.0
+
+        def fire():
+            if not client.is_connected:
+                return
+            self.notifications += 1
+            client._notify(data)
+            if index + 1 < end:
+                self._schedule(client, index + 1, end)
+
+        asyncio.get_running_loop().call_later(delay, fire)
+
+    def stats(self) -> dict:
+        return {
+            "writes": self.writes,
+            "unmatched": self.unmatched,
+            "notifications": self.notifications,
+            "remaining": len(self.recording.events) - self._position,
+        }
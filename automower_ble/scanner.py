@@ -0,0 +1,222 @@
+"""
+Passive scanning for mowers. Looking a mower up with a fresh scan
+before every connection takes seconds, so the scanner service keeps
+scanning in the background and caches the latest advertisement of
+each Husqvarna device it sees. Connecting can then use the cached
+device straight away.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from bleak import BleakScanner
+
+from .adapters import AdapterPool
+
+logger = logging.getLogger(__name__)
+
+# "Husqvarna AB" in the Bluetooth SIG company identifiers
+HUSQVARNA_MANUFACTURER_ID = 0x0426
+
+
+def is_husqvarna(advertisement_data) -> bool:
+    return HUSQVARNA_MANUFACTURER_ID in advertisement_data.manufacturer_data
+
+
+class Advertisement:
+    __slots__ = ("device", "rssi", "last_seen", "adapter")
+
+    def __init__(self, device, rssi: int, last_seen: float, adapter: str | None):
+        self.device = device
+        self.rssi = rssi
+        self.last_seen = last_seen
+        self.adapter = adapter
+
+
+class ScannerService:
+    def __init__(
+        self,
+        adapters=None,
+        ttl: float = 120.0,
+        max_entries: int = 256,
+        pool: AdapterPool | None = None,
+        scanner_factory=BleakScanner,
+    ):
+        """
+        Scan on each adapter in `adapters`, or the default adapter if it
+        is None. Advertisements older than `ttl` seconds are ignored and
+        at most `max_entries` mowers are cached, the least recently seen
+        are evicted first. If `pool` is set it is fed the RSSI of every
+        advertisement so it can pick the best adapter for each mower.
+        """
+        self.adapters = list(adapters) if adapters else [None]
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.pool = pool
+        self.scanner_factory = scanner_factory
+
+        # address -> {adapter: Advertisement}, least recently seen first
+        self._cache = OrderedDict()
+        # address -> futures waiting for the mower to be seen
+        self._waiters = {}
+        self._scanners = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._scanners)
+
+    async def start(self):
+        if self.running:
+            return
+        for adapter in self.adapters:
+            kwargs = {}
+            if adapter is not None:
+                kwargs["adapter"] = adapter
+            scanner = self.scanner_factory(
+                detection_callback=self._callback_for(adapter), **kwargs
+            )
+            await scanner.start()
+            self._scanners.append(scanner)
+        logger.info("Scanning on %d adapter(s)", len(self._scanners))
+
+    async def stop(self):
+        scanners, self._scanners = self._scanners, []
+        for scanner in scanners:
+            try:
+                await scanner.stop()
+            except Exception as e:
+                logger.error("Unable to stop scanner: %s", e)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    def _callback_for(self, adapter: str | None):
+        def callback(device, advertisement_data):
+            self.on_advertisement(device, advertisement_data, adapter)
+
+        return callback
+
+    def on_advertisement(self, device, advertisement_data, adapter=None):
+        """Record an advertisement, called by the scanners"""
+        if not is_husqvarna(advertisement_data):
+            return
+
+        address = device.address.upper()
+        entries = self._cache.get(address)
+        if entries is None:
+            entries = self._cache[address] = {}
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._cache.move_to_end(address)
+
+        advertisement = Advertisement(
+            device, advertisement_data.rssi, time.monotonic(), adapter
+        )
+        entries[adapter] = advertisement
+        if self.pool is not None and adapter is not None:
+            self.pool.update_rssi(address, adapter, advertisement_data.rssi)
+
+        for future in self._waiters.pop(address, []):
+            if not future.done():
+                future.set_result(None)
+
+    def get(self, address: str, adapter: str | None = None) -> Advertisement | None:
+        """
+        Return the latest advertisement of a mower that is younger than
+        the TTL. If `adapter` is set only advertisements seen by that
+        adapter are used, otherwise the one with the best signal.
+        """
+        entries = self._cache.get(address.upper())
+        if not entries:
+            return None
+
+        oldest = time.monotonic() - self.ttl
+        live = [
+            a
+            for a in entries.values()
+            if a.last_seen >= oldest and (adapter is None or a.adapter == adapter)
+        ]
+        if not live:
+            return None
+        return max(live, key=lambda a: a.rssi)
+
+    def invalidate(self, address: str) -> None:
+        """Drop a mower from the cache, for example after connecting failed"""
+        self._cache.pop(address.upper(), None)
+
+    def devices(self) -> list:
+        """The best live advertisement of every cached mower"""
+        advertisements = (self.get(address) for address in list(self._cache))
+        return [a for a in advertisements if a is not None]
+
+    def _scanning_on(self, adapter: str | None) -> bool:
+        return self.running and (adapter is None or adapter in self.adapters)
+
+    async def find_device(
+        self, address: str, adapter: str | None = None, timeout: float = 10.0
+    ):
+        """
+        Return the BLEDevice of a mower, or None if it wasn't seen within
+        `timeout` seconds. A cached advertisement is used if there is one,
+        otherwise we wait for the running scanners to see the mower or,
+        if they don't cover `adapter`, do a scan for just this address.
+        """
+        advertisement = self.get(address, adapter)
+        if advertisement is not None:
+            self.hits += 1
+            return advertisement.device
+        self.misses += 1
+
+        if not self._scanning_on(adapter):
+            kwargs = {}
+            if adapter is not None:
+                kwargs["adapter"] = adapter
+            return await self.scanner_factory.find_device_by_address(
+                address, timeout=timeout, **kwargs
+            )
+
+        address = address.upper()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+
+            future = loop.create_future()
+            self._waiters.setdefault(address, []).append(future)
+            try:
+                await asyncio.wait_for(future, remaining)
+            except asyncio.TimeoutError:
+                return None
+            finally:
+                waiters = self._waiters.get(address)
+                if waiters is not None and future in waiters:
+                    waiters.remove(future)
+                    if not waiters:
+                        del self._waiters[address]
+
+            # The mower may have been seen on another adapter first
+            advertisement = self.get(address, adapter)
+            if advertisement is not None:
+                return advertisement.device
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
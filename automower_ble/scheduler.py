@@ -0,0 +1,148 @@
+"""
+Scheduling of requests over the single BLE link to a mower. Only one
+request can be in flight at a time, so callers queue for the link and
+are served by priority. Control commands jump ahead of interactive
+reads which jump ahead of background polling.
+"""
+
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from enum import IntEnum
+
+
+class RequestPriority(IntEnum):
+    # Lower values are served first
+    CONTROL = 0
+    INTERACTIVE = 1
+    BACKGROUND = 2
+
+
+# Commands that change what the mower is doing, these are always sent
+# before any queued reads
+CONTROL_COMMANDS = frozenset(
+    [
+        "park",
+        "pause",
+        "resume",
+        "overrideDuration",
+        "setModeOfOperation",
+    ]
+)
+
+
+def priority_for(parameter_name: str) -> RequestPriority:
+    """Return the default priority used for a protocol.json command"""
+    if parameter_name in CONTROL_COMMANDS:
+        return RequestPriority.CONTROL
+    return RequestPriority.INTERACTIVE
+
+
+class PrioritySemaphore:
+    """
+    A semaphore that wakes waiters with the highest priority first, and
+    in the order they arrived within a priority
+    """
+
+    def __init__(self, capacity: int = 1):
+        if capacity < 1:
+            raise ValueError("Capacity must be at least 1, got: " + str(capacity))
+
+        self.capacity = capacity
+        self._waiters = []  # heap of (priority, sequence, future)
+        self._sequence = itertools.count()
+        self._active = 0
+
+    def _pending(self):
+        return [w for w in self._waiters if not w[2].done()]
+
+    def _granted(self, priority: RequestPriority):
+        """Called whenever a slot is handed to a waiter of `priority`"""
+
+    def _queued(self, priority: RequestPriority):
+        """Called whenever a waiter of `priority` has to wait"""
+
+    @property
+    def active(self) -> int:
+        """Number of slots currently held"""
+        return self._active
+
+    def waiting(self) -> int:
+        """Number of waiters"""
+        return len(self._pending())
+
+    def is_idle(self) -> bool:
+        """True if no slot is held or waited for"""
+        return self._active == 0 and self.waiting() == 0
+
+    def has_waiters_above(self, priority: RequestPriority) -> bool:
+        """True if a waiter with a higher priority than `priority` exists"""
+        return any(w[0] < priority for w in self._pending())
+
+    async def acquire(self, priority: RequestPriority):
+        if self._active < self.capacity and self.waiting() == 0:
+            self._active += 1
+            self._granted(priority)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        self._queued(priority)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # We were handed a slot just as we were cancelled
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiters:
+            priority, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                # The waiter was cancelled
+                continue
+            # Hand the slot straight to the waiter
+            self._granted(priority)
+            future.set_result(None)
+            return
+
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: RequestPriority):
+        """Hold a slot for the duration of the context"""
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class RequestScheduler(PrioritySemaphore):
+    """Grants the single BLE link to one request at a time"""
+
+    def __init__(self):
+        super().__init__(capacity=1)
+        self.current_priority = None
+        # Set when a request is waiting that should preempt the
+        # background request currently holding the link
+        self.preempt = asyncio.Event()
+
+    def _granted(self, priority: RequestPriority):
+        self.current_priority = priority
+
+    def _queued(self, priority: RequestPriority):
+        if (
+            self.current_priority == RequestPriority.BACKGROUND
+            and priority < RequestPriority.BACKGROUND
+        ):
+            self.preempt.set()
+
+    def release(self):
+        self.preempt.clear()
+        super().release()
+        if self._active == 0:
+            self.current_priority = None
@@ -0,0 +1,193 @@
+"""
+Publication of the latest state of each mower through a memory mapped
+file. A poller writes every new snapshot into a fixed size slot and any
+number of local processes can read the current state as often as they
+like without asking the poller, reading is just a struct unpack from
+the mapping.
+
+Each slot is protected by a sequence lock. The writer makes the
+sequence number odd while it updates the slot and even again when it
+is done, readers retry until they see the same even number before and
+after reading, so they never see a half written snapshot.
+
+File layout, all little endian:
+
+    header  magic "AMSS", uint16 version, uint16 slot count,
+            uint32 slot size, uint32 schema hash
+    slots   uint64 sequence, float64 timestamp, 64 byte NUL padded
+            address, snapshot (see SnapshotLayout)
+
+A publisher that is restarted reuses the file, it is never shrunk while
+readers may still have it mapped.
+"""
+
+import mmap
+import os
+import struct
+import time
+
+from .codec import SnapshotLayout
+
+MAGIC = b"AMSS"
+VERSION = 2
+
+HEADER = struct.Struct("<4sHHII")
+# Long enough for the UUIDs that stand in for addresses on macOS
+ADDRESS_SIZE = 64
+SLOT_HEADER = struct.Struct("<Qd%ds" % ADDRESS_SIZE)
+SEQUENCE = struct.Struct("<Q")
+
+# How often a reader retries a slot that is being written
+MAX_READ_ATTEMPTS = 10000
+
+
+def _slot_size(layout: SnapshotLayout) -> int:
+    size = SLOT_HEADER.size + layout.size
+    # Keep every slot, and so every sequence number, 8 byte aligned
+    return (size + 7) & ~7
+
+
+class StatePublisher:
+    def __init__(self, path, parameters, slots: int = 64):
+        """
+        Create the state file at `path` with room for `slots` mowers,
+        each holding the responses of `parameters`
+        """
+        self.path = path
+        self.layout = SnapshotLayout(parameters)
+        self.slots = slots
+        self.slot_size = _slot_size(self.layout)
+        self._slot_for = {}  # address -> slot index
+
+        size = HEADER.size + slots * self.slot_size
+        # Truncating would make the pages of a reader's mapping disappear
+        # and SIGBUS it, so an existing file is only ever grown
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        # Forget the mowers of a previous publisher, a zero sequence
+        # number marks a slot that has never been written
+        self._mmap[HEADER.size : size] = bytes(size - HEADER.size)
+        HEADER.pack_into(
+            self._mmap,
+            0,
+            MAGIC,
+            VERSION,
+            slots,
+            self.slot_size,
+            self.layout.schema_hash,
+        )
+
+    def _offset(self, address: str) -> int:
+        slot = self._slot_for.get(address)
+        if slot is None:
+            if len(address.encode()) > ADDRESS_SIZE:
+                raise ValueError("Mower address is too long: " + address)
+            if len(self._slot_for) >= self.slots:
+                raise ValueError("No free slot for mower: " + address)
+            slot = self._slot_for[address] = len(self._slot_for)
+        return HEADER.size + slot * self.slot_size
+
+    def publish(self, address: str, snapshot, timestamp: float | None = None):
+        """Write the latest snapshot of a mower, a dict of name to value"""
+        if timestamp is None:
+            timestamp = time.time()
+        offset = self._offset(address)
+        buffer = self._mmap
+
+        (sequence,) = SEQUENCE.unpack_from(buffer, offset)
+        SEQUENCE.pack_into(buffer, offset, sequence + 1)
+        SLOT_HEADER.pack_into(buffer, offset, sequence + 1, timestamp, address.encode())
+        self.layout.pack_into(buffer, offset + SLOT_HEADER.size, snapshot)
+        SEQUENCE.pack_into(buffer, offset, sequence + 2)
+
+    def on_snapshot(self, member, snapshot):
+        """Can be used as the `on_snapshot` callback of a `Fleet`"""
+        self.publish(member.address, snapshot, member.last_poll)
+
+    def close(self):
+        self._mmap.close()
+
+
+class StateReader:
+    def __init__(self, path, parameters):
+        """
+        Open a state file written by a `StatePublisher` with the same
+        `parameters`. Raises ValueError if the file has a different
+        format or holds different parameters.
+        """
+        self.layout = SnapshotLayout(parameters)
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, slots, slot_size, schema_hash = HEADER.unpack_from(
+            self._mmap, 0
+        )
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError("Not a mower state file: " + str(path))
+        if schema_hash != self.layout.schema_hash:
+            self._mmap.close()
+            raise ValueError("State file holds different parameters: " + str(path))
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self._slot_for = {}
+
+    def read_slot(self, slot: int) -> tuple | None:
+        """
+        Return (address, timestamp, snapshot) of a slot, or None if it
+        has never been written
+        """
+        offset = HEADER.size + slot * self.slot_size
+        buffer = self._mmap
+        for _ in range(MAX_READ_ATTEMPTS):
+            (before,) = SEQUENCE.unpack_from(buffer, offset)
+            if before & 1:
+                # Let the writer finish, it may be a thread of this process
+                time.sleep(0)
+                continue
+            if before == 0:
+                return None
+            _, timestamp, address = SLOT_HEADER.unpack_from(buffer, offset)
+            snapshot = self.layout.unpack_from(buffer, offset + SLOT_HEADER.size)
+            (after,) = SEQUENCE.unpack_from(buffer, offset)
+            if before == after:
+                return address.rstrip(b"\x00").decode(), timestamp, snapshot
+            time.sleep(0)
+        raise TimeoutError("Slot %d is continuously being written" % slot)
+
+    def read(self, address: str) -> tuple | None:
+        """Return (timestamp, snapshot) of a mower, or None if it is unknown"""
+        slot = self._slot_for.get(address)
+        if slot is not None:
+            state = self.read_slot(slot)
+            if state is not None and state[0] == address:
+                return state[1:]
+
+        # Slots are handed out in order, so only the new ones are scanned
+        for slot in range(len(self._slot_for), self.slots):
+            state = self.read_slot(slot)
+            if state is None:
+                break
+            self._slot_for[state[0]] = slot
+            if state[0] == address:
+                return state[1:]
+        return None
+
+    def read_all(self) -> dict:
+        """Return {address: (timestamp, snapshot)} of every published mower"""
+        states = {}
+        for slot in range(self.slots):
+            state = self.read_slot(slot)
+            if state is None:
+                break
+            states[state[0]] = state[1:]
+        return states
+
+    def close(self):
+        self._mmap.close()
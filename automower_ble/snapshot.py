@@ -0,0 +1,172 @@
+"""
+Compact binary encoding of mower state, for shipping it between
+processes or storing it. The layouts are derived from the response
+types in protocol.json, so encoding and decoding are a single struct
+pack or unpack.
+
+Every encoded value starts with a header:
+
+    magic "AMSN", uint8 version, uint8 kind, uint32 schema hash
+
+The schema hash covers the commands and their response types, data
+written with a different protocol.json or parameter list is rejected
+with a ValueError instead of being decoded wrongly.
+
+    SNAPSHOT  float64 timestamp followed by a SnapshotLayout
+    RECORDS   uint16 count followed by that many responses of a command,
+              used for getStatuses, task lists and the message log
+"""
+
+import struct
+from functools import lru_cache
+
+from .codec import SnapshotLayout, TaskInformation, get_protocol, schema_hash
+
+MAGIC = b"AMSN"
+VERSION = 1
+
+KIND_SNAPSHOT = 1
+KIND_RECORDS = 2
+
+HEADER = struct.Struct("<4sBBI")
+TIMESTAMP = struct.Struct("<d")
+COUNT = struct.Struct("<H")
+
+
+def _check_header(data, kind: int, expected_hash: int) -> None:
+    if len(data) < HEADER.size:
+        raise ValueError("Data too short for a snapshot header")
+    magic, version, data_kind, data_hash = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not an encoded snapshot")
+    if version != VERSION:
+        raise ValueError("Unsupported snapshot version: " + str(version))
+    if data_kind != kind:
+        raise ValueError("Unexpected snapshot kind: " + str(data_kind))
+    if data_hash != expected_hash:
+        raise ValueError("Snapshot was written with a different schema")
+
+
+class SnapshotCodec:
+    def __init__(self, parameters):
+        """Encodes snapshots holding the responses of `parameters`"""
+        self.layout = SnapshotLayout(parameters)
+        self.struct = struct.Struct(
+            HEADER.format + TIMESTAMP.format[1:] + self.layout.struct.format[1:]
+        )
+        self._header = (MAGIC, VERSION, KIND_SNAPSHOT, self.layout.schema_hash)
+        self._body = HEADER.size + TIMESTAMP.size
+
+    @property
+    def parameters(self) -> tuple:
+        return self.layout.parameters
+
+    def encode(self, snapshot, timestamp: float = 0.0) -> bytes:
+        """Encode a dict of command name to value, missing values are None"""
+        data = bytearray(self.struct.size)
+        HEADER.pack_into(data, 0, *self._header)
+        TIMESTAMP.pack_into(data, HEADER.size, timestamp)
+        self.layout.pack_into(data, self._body, snapshot)
+        return bytes(data)
+
+    def decode(self, data) -> tuple:
+        """Return (timestamp, snapshot) of encoded data"""
+        _check_header(data, KIND_SNAPSHOT, self.layout.schema_hash)
+        if len(data) != self.struct.size:
+            raise ValueError(
+                "Data length mismatch. Got %d bytes of %d"
+                % (len(data), self.struct.size)
+            )
+        (timestamp,) = TIMESTAMP.unpack_from(data, HEADER.size)
+        return timestamp, self.layout.unpack_from(data, self._body)
+
+
+@lru_cache(maxsize=None)
+def snapshot_codec(parameters: tuple) -> SnapshotCodec:
+    """Return the shared codec of a parameter list"""
+    return SnapshotCodec(parameters)
+
+
+class RecordCodec:
+    def __init__(self, command: str):
+        """Encodes lists of responses of `command`, which must have a fixed size"""
+        self.spec = get_protocol()[command]
+        if self.spec.response_struct is None:
+            raise ValueError("Response of '" + command + "' has no fixed size")
+        self.item = self.spec.response_struct
+        self.fields = tuple(self.spec.response_data_type)
+        self.schema_hash = schema_hash([self.spec])
+
+    def _values(self, record) -> tuple:
+        if hasattr(record, "_asdict"):
+            record = record._asdict()
+        # Fields the record doesn't have, such as the unknown trailing
+        # field of getTask, are written as zero
+        return tuple(record.get(k, 0) for k in self.fields)
+
+    def encode(self, records) -> bytes:
+        records = list(records)
+        items = struct.Struct("<" + self.item.format[1:] * len(records))
+        data = bytearray(HEADER.size + COUNT.size + items.size)
+        HEADER.pack_into(data, 0, MAGIC, VERSION, KIND_RECORDS, self.schema_hash)
+        COUNT.pack_into(data, HEADER.size, len(records))
+        items.pack_into(
+            data,
+            HEADER.size + COUNT.size,
+            *(v for record in records for v in self._values(record)),
+        )
+        return bytes(data)
+
+    def decode(self, data) -> list:
+        """Return the responses as records of the command's response type"""
+        _check_header(data, KIND_RECORDS, self.schema_hash)
+        (count,) = COUNT.unpack_from(data, HEADER.size)
+        start = HEADER.size + COUNT.size
+        end = start + count * self.item.size
+        if len(data) != end:
+            raise ValueError(
+                "Data length mismatch. Got %d bytes of %d" % (len(data), end)
+            )
+        record_type = self.spec.response_type
+        return [
+            record_type._make(values)
+            for values in self.item.iter_unpack(memoryview(data)[start:end])
+        ]
+
+
+@lru_cache(maxsize=None)
+def record_codec(command: str) -> RecordCodec:
+    """Return the shared codec of a command's responses"""
+    return RecordCodec(command)
+
+
+def encode_statuses(statuses) -> bytes:
+    """Encode a getStatuses response, or None if there was no response"""
+    return record_codec("getStatuses").encode([] if statuses is None else [statuses])
+
+
+def decode_statuses(data):
+    """Returns None if the encoded response was None, or holds no record"""
+    statuses = record_codec("getStatuses").decode(data)
+    return statuses[0] if statuses else None
+
+
+def encode_tasks(tasks) -> bytes:
+    """Encode a list of TaskInformation, as returned by Mower.get_tasks()"""
+    return record_codec("getTask").encode(tasks)
+
+
+def decode_tasks(data) -> list:
+    return [
+        TaskInformation(*task[: len(TaskInformation._fields)])
+        for task in record_codec("getTask").decode(data)
+    ]
+
+
+def encode_messages(messages) -> bytes:
+    """Encode a list of getMessage responses"""
+    return record_codec("getMessage").encode(messages)
+
+
+def decode_messages(data) -> list:
+    return record_codec("getMessage").decode(data)
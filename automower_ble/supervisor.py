@@ -0,0 +1,326 @@
+"""
+Polling of large fleets from several processes. Decoding and callbacks
+for 100+ mowers is enough to saturate a single core, so the supervisor
+shards the mowers over worker processes. Each worker runs its own event
+loop and `Fleet` on its own subset of the Bluetooth adapters and sends
+binary encoded snapshots back over a pipe. Crashed workers are restarted
+and if a worker keeps crashing its mowers are moved to the other workers.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import struct
+import time
+
+from .fleet import DEFAULT_POLL_PARAMETERS
+from .snapshot import snapshot_codec
+
+logger = logging.getLogger(__name__)
+
+# Prefix of every snapshot a worker sends, the index of the mower
+SNAPSHOT_INDEX = struct.Struct("<I")
+
+
+class MowerConfig:
+    def __init__(
+        self,
+        address: str,
+        channel_id: int = 1197489078,
+        pin: int | None = None,
+        interval: float = 60.0,
+        parameters=DEFAULT_POLL_PARAMETERS,
+    ):
+        """
+        Everything a worker process needs to create and poll a mower.
+        Snapshots are sent to the supervisor in the binary snapshot
+        format, so every parameter needs a fixed size response.
+        """
+        self.address = address
+        self.channel_id = channel_id
+        self.pin = pin
+        self.interval = interval
+        self.parameters = tuple(parameters)
+        # Raises ValueError if a parameter can't be encoded
+        snapshot_codec(self.parameters)
+
+
+def create_mower(config: MowerConfig):
+    """
+    Create the Mower for a config, this runs in the worker process.
+    Returns the mower and its BLEDevice, None to look it up by address.
+    """
+    from .mower import Mower
+
+    return Mower(config.channel_id, config.address, config.pin), None
+
+
+async def _worker(shard, adapters, max_connections, conn, mower_factory):
+    from .adapters import AdapterPool
+    from .fleet import Fleet
+
+    # address -> index of the mower in the supervisor
+    indexes = {}
+
+    def send_snapshot(member, snapshot):
+        codec = snapshot_codec(member.parameters)
+        conn.send_bytes(
+            SNAPSHOT_INDEX.pack(indexes[member.address])
+            + codec.encode(snapshot, member.last_poll)
+        )
+
+    pool = AdapterPool(adapters) if adapters else None
+    fleet = Fleet(max_connections, adapters=pool, on_snapshot=send_snapshot)
+
+    def add(index, config):
+        indexes[config.address] = index
+        mower, device = mower_factory(config)
+        fleet.add(
+            mower,
+            device=device,
+            interval=config.interval,
+            parameters=config.parameters,
+        )
+
+    for index, config in shard:
+        add(index, config)
+
+    loop = asyncio.get_running_loop()
+    runner = asyncio.create_task(fleet.run())
+    stopping = False
+
+    def on_command():
+        nonlocal stopping
+        try:
+            message = conn.recv()
+        except EOFError:
+            # The supervisor has gone away, and a closed pipe stays
+            # readable, so stop watching it
+            loop.remove_reader(conn.fileno())
+            message = ("stop",)
+
+        if message[0] == "add":
+            add(message[1], message[2])
+        elif message[0] == "stop" and not stopping:
+            stopping = True
+            loop.create_task(fleet.stop())
+
+    loop.add_reader(conn.fileno(), on_command)
+    try:
+        await runner
+    finally:
+        loop.remove_reader(conn.fileno())
+
+
+def _worker_main(shard, adapters, max_connections, conn, mower_factory, log_level):
+    logging.basicConfig(
+        level=log_level,
+        format="%(asctime)-15s %(processName)s %(name)-8s %(levelname)s: %(message)s",
+    )
+    asyncio.run(_worker(shard, adapters, max_connections, conn, mower_factory))
+
+
+class WorkerHandle:
+    def __init__(self, worker_id: int, adapters):
+        self.worker_id = worker_id
+        self.adapters = adapters
+        self.shard = []  # [(index, MowerConfig)]
+        self.process = None
+        self.conn = None
+        self.restarts = 0
+        self.retired = False
+
+
+class Supervisor:
+    def __init__(
+        self,
+        mowers,
+        workers: int | None = None,
+        adapters=None,
+        max_connections: int | None = None,
+        on_snapshot=None,
+        max_restarts: int = 3,
+        check_interval: float = 1.0,
+        mower_factory=create_mower,
+    ):
+        """
+        Shard `mowers`, a list of `MowerConfig`, over `workers` processes.
+        If `adapters` is given each worker gets its own subset of them and
+        by default there is one worker per adapter. `on_snapshot` is called
+        in the supervisor process with the config and the snapshot dict.
+
+        A worker that crashes is restarted, once it has crashed more than
+        `max_restarts` times it is retired and its mowers are moved to the
+        remaining workers. `mower_factory` is called in the workers to
+        create each mower, see `create_mower()`, and has to be picklable.
+        """
+        self.mowers = list(mowers)
+        adapters = list(adapters) if adapters else []
+        if workers is None:
+            workers = max(1, len(adapters))
+        if adapters and workers > len(adapters):
+            raise ValueError("Every worker needs at least one adapter")
+
+        self.max_connections = max_connections
+        self.on_snapshot = on_snapshot
+        self.max_restarts = max_restarts
+        self.check_interval = check_interval
+        self.mower_factory = mower_factory
+
+        self.workers = [
+            WorkerHandle(i, adapters[i::workers] if adapters else None)
+            for i in range(workers)
+        ]
+        for index, config in enumerate(self.mowers):
+            self.workers[index % workers].shard.append((index, config))
+
+        self.snapshots = {}  # address -> (timestamp, snapshot)
+        self.received = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._running = False
+
+    def _start(self, worker: WorkerHandle):
+        parent, child = self._context.Pipe()
+        worker.conn = parent
+        worker.process = self._context.Process(
+            target=_worker_main,
+            args=(
+                worker.shard,
+                worker.adapters,
+                self.max_connections,
+                child,
+                self.mower_factory,
+                logging.getLogger().getEffectiveLevel(),
+            ),
+            name="automower-worker-%d" % worker.worker_id,
+            daemon=True,
+        )
+        worker.process.start()
+        child.close()
+
+        asyncio.get_running_loop().add_reader(parent.fileno(), self._on_message, worker)
+        logger.info(
+            "Started worker %d with %d mowers", worker.worker_id, len(worker.shard)
+        )
+
+    def _close(self, worker: WorkerHandle):
+        if worker.conn is not None:
+            asyncio.get_running_loop().remove_reader(worker.conn.fileno())
+            worker.conn.close()
+            worker.conn = None
+
+    def _on_message(self, worker: WorkerHandle):
+        try:
+            data = worker.conn.recv_bytes()
+        except (EOFError, OSError):
+            # The worker died, this is handled by _check_workers()
+            self._close(worker)
+            return
+
+        (index,) = SNAPSHOT_INDEX.unpack_from(data)
+        config = self.mowers[index]
+        codec = snapshot_codec(config.parameters)
+        try:
+            timestamp, snapshot = codec.decode(memoryview(data)[SNAPSHOT_INDEX.size :])
+        except ValueError as e:
+            logger.error("Invalid snapshot from worker %d: %s", worker.worker_id, e)
+            return
+
+        self.snapshots[config.address] = (timestamp, snapshot)
+        self.received += 1
+        if self.on_snapshot is not None:
+            self.on_snapshot(config, snapshot)
+
+    def _check_workers(self):
+        for worker in self.workers:
+            if worker.retired or worker.process is None:
+                continue
+            if worker.process.is_alive():
+                continue
+
+            logger.error(
+                "Worker %d exited with code %s",
+                worker.worker_id,
+                worker.process.exitcode,
+            )
+            self._close(worker)
+            worker.restarts += 1
+            if worker.restarts <= self.max_restarts:
+                self._start(worker)
+            else:
+                self._retire(worker)
+
+    def _retire(self, worker: WorkerHandle):
+        worker.retired = True
+        alive = [w for w in self.workers if not w.retired]
+        if not alive:
+            logger.error("All workers have failed, giving up")
+            self._running = False
+            return
+
+        logger.error(
+            "Moving %d mowers off worker %d", len(worker.shard), worker.worker_id
+        )
+        for i, (index, config) in enumerate(worker.shard):
+            target = alive[i % len(alive)]
+            target.shard.append((index, config))
+            if target.conn is not None:
+                try:
+                    target.conn.send(("add", index, config))
+                except OSError as e:
+                    # The mower is in its shard, so a restart picks it up
+                    logger.error("Unable to reach worker %d: %s", target.worker_id, e)
+            elif target.process is None:
+                # The worker had no mowers so was never started
+                self._start(target)
+        worker.shard = []
+
+    async def run(self):
+        """Start the workers and supervise them until `stop()` is called"""
+        self._running = True
+        for worker in self.workers:
+            if worker.shard:
+                self._start(worker)
+
+        try:
+            while self._running:
+                await asyncio.sleep(self.check_interval)
+                self._check_workers()
+        finally:
+            await self._shutdown()
+
+    async def stop(self):
+        self._running = False
+
+    async def _shutdown(self, timeout: float = 5.0):
+        for worker in self.workers:
+            if worker.conn is not None:
+                try:
+                    worker.conn.send(("stop",))
+                except OSError:
+                    pass
+
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            while worker.process.is_alive() and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            self._close(worker)
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "workers": {
+                worker.worker_id: {
+                    "mowers": len(worker.shard),
+                    "adapters": worker.adapters,
+                    "alive": worker.process is not None and worker.process.is_alive(),
+                    "restarts": worker.restarts,
+                    "retired": worker.retired,
+                }
+                for worker in self.workers
+            },
+        }
@@ -0,0 +1,164 @@
+"""
+Watching parameters of a mower. Every parameter that is watched is
+polled by a single task, however many watchers there are, at the
+shortest interval any of them asked for. Watchers only ever see the
+latest value, a slow consumer skips the values it missed instead of
+building up a backlog. Polling stops when the last watcher is closed.
+"""
+
+import asyncio
+import logging
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+class _Poller:
+    def __init__(self, hub, name: str):
+        self.hub = hub
+        self.name = name
+        # Watch -> interval, abandoned watches drop out by themselves
+        self.watchers = weakref.WeakKeyDictionary()
+        self.value = None
+        self.polled = False
+        self.task = None
+        self.polls = 0
+
+    @property
+    def interval(self) -> float:
+        return min(self.watchers.values())
+
+    def _notify(self):
+        # Not inlined in run(), the loop variable would keep the last
+        # watch alive while the poller sleeps
+        for watch in list(self.watchers):
+            watch._update(self.name, self.value)
+
+    async def run(self):
+        while self.watchers:
+            try:
+                value = await self.hub.poll(self.name)
+            except Exception as e:
+                logger.error("Unable to poll '%s': %s", self.name, e)
+                value = None
+            self.polls += 1
+
+            # A failed read keeps the last value
+            if value is not None or not self.polled:
+                changed = not self.polled or value != self.value
+                self.polled = True
+                if value is not None:
+                    self.value = value
+                if changed:
+                    self._notify()
+
+            if not self.watchers:
+                break
+            await asyncio.sleep(self.interval)
+
+
+class Watch:
+    """
+    An async iterator over the values of one parameter, or snapshot dicts
+    of several parameters. A new value is yielded whenever one of the
+    parameters changes. Close it, or use it as an async context manager,
+    to stop polling when it is no longer needed.
+    """
+
+    def __init__(self, hub, parameters: tuple, interval: float):
+        self.hub = hub
+        self.parameters = parameters
+        self.interval = interval
+        self._latest = {}
+        self._pending = False
+        self._closed = False
+        self._event = asyncio.Event()
+
+    def _update(self, name: str, value):
+        self._latest[name] = value
+        # Only yield once every parameter has been polled
+        if len(self._latest) == len(self.parameters):
+            self._pending = True
+            self._event.set()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._pending:
+            if self._closed:
+                raise StopAsyncIteration
+            self._event.clear()
+            await self._event.wait()
+
+        self._pending = False
+        if len(self.parameters) == 1:
+            return self._latest[self.parameters[0]]
+        return dict(self._latest)
+
+    def close(self):
+        """Stop watching, polls nobody else watches are stopped"""
+        if self._closed:
+            return
+        self._closed = True
+        self._event.set()
+        self.hub._remove(self)
+
+    async def aclose(self):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # An abandoned watch must not keep the radio busy
+        if not self._closed:
+            try:
+                self.close()
+            except RuntimeError:
+                # The event loop is already closed
+                pass
+
+
+class WatchHub:
+    def __init__(self, poll):
+        """`poll` is a coroutine function that reads a parameter by name"""
+        self.poll = poll
+        self._pollers = {}
+
+    def watch(self, parameters, interval: float) -> Watch:
+        if not parameters:
+            raise ValueError("At least one parameter is required")
+        watch = Watch(self, tuple(parameters), interval)
+
+        for name in watch.parameters:
+            poller = self._pollers.get(name)
+            if poller is None:
+                poller = self._pollers[name] = _Poller(self, name)
+            poller.watchers[watch] = interval
+            if poller.polled:
+                watch._update(name, poller.value)
+            if poller.task is None or poller.task.done():
+                poller.task = asyncio.get_running_loop().create_task(poller.run())
+        return watch
+
+    def _remove(self, watch: Watch):
+        for name in watch.parameters:
+            poller = self._pollers.get(name)
+            if poller is None:
+                continue
+            poller.watchers.pop(watch, None)
+            if not poller.watchers:
+                if poller.task is not None:
+                    poller.task.cancel()
+                del self._pollers[name]
+
+    def stats(self) -> dict:
+        """Watchers and number of polls of every watched parameter"""
+        return {
+            name: {"watchers": len(poller.watchers), "polls": poller.polls}
+            for name, poller in self._pollers.items()
+        }
@@ -5,37 +5,91 @@ https://github.com/hbldh/bleak/blob/develop/examples/discover.py
 
 import argparse
 import asyncio
+import json
+import sys
+import time
 
 from bleak import BleakScanner
 
+from automower_ble.scanner import is_husqvarna
 
-async def main(args: argparse.Namespace):
-    print(f"Scanning for {args.timeout} seconds, please wait...")
 
-    devices = await BleakScanner.discover(
-        timeout=args.timeout,
-        return_adv=True,
-        cb=dict(use_bdaddr=args.macos_use_bdaddr),
-    )
+def print_device(device, advertisement_data, args, elapsed):
+    if args.ndjson:
+        record = {
+            "address": device.address,
+            "name": device.name,
+            "rssi": advertisement_data.rssi,
+            "elapsed": round(elapsed, 3),
+        }
+        if args.show_all:
+            record["manufacturer_data"] = {
+                str(k): v.hex() for k, v in advertisement_data.manufacturer_data.items()
+            }
+        print(json.dumps(record), flush=True)
+        return
+
+    print(f"\nAddress: {device.address}")
+    print(f"\tName: {device.name}")
+    print(f"\tSignal Strength: {advertisement_data.rssi} dBm (closer to 0 is stronger)")
+    if args.show_all:
+        print(f"\tManufacturer Data: {advertisement_data.manufacturer_data}")
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Status messages go to stderr so stdout only holds results
+    status = sys.stderr if args.ndjson else sys.stdout
+    wanted = {a.upper() for a in args.address or []}
+    expect = args.expect if args.expect is not None else len(wanted) or None
+
+    if expect:
+        print(
+            f"Scanning for up to {args.timeout} seconds until {expect} "
+            "device(s) are found...",
+            file=status,
+        )
+    else:
+        print(f"Scanning for {args.timeout} seconds, please wait...", file=status)
+
+    seen = set()
+    done = asyncio.Event()
+    started = time.monotonic()
+
+    def detection_callback(device, advertisement_data):
+        # Backends differ in the case of the addresses they report
+        address = device.address.upper()
+        if address in seen:
+            return
+        if not args.show_all and not is_husqvarna(advertisement_data):
+            return
+        if wanted and address not in wanted:
+            return
+
+        if not seen and not args.show_all and not args.ndjson:
+            print("Husqvarna device(s) found!")
+        seen.add(address)
+        print_device(device, advertisement_data, args, time.monotonic() - started)
 
-    husqvarna_device_found = False
-    for d, a in devices.values():
-        # "Husqvarna AB" maps to "0x0426" for the manufacturer data
-        # Please see: https://bitbucket.org/bluetooth-SIG/public/src/main/assigned_numbers/company_identifiers/company_identifiers.yaml
-        if list(a.manufacturer_data.keys())[0] == 0x0426 or args.show_all:
-            if not husqvarna_device_found and not args.show_all:
-                print("Husqvarna device(s) found!")
-                husqvarna_device_found = True
+        if expect and len(seen) >= expect:
+            done.set()
 
-            print(f"\nAddress: {d.address}")
-            print(f"\tName: {d.name}")
-            print(f"\tSignal Strength: {a.rssi} dBm (closer to 0 is stronger)")
-            if args.show_all:
-                print(f"\tManufacturer Data: {a.manufacturer_data}")
+    async with BleakScanner(
+        detection_callback=detection_callback,
+        cb=dict(use_bdaddr=args.macos_use_bdaddr),
+    ):
+        try:
+            await asyncio.wait_for(done.wait(), args.timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    if not seen and not args.show_all:
+        print("No Husqvarna devices found!", file=status)
+        print("Make sure your Automower is powered on and nearby.", file=status)
 
-    if not husqvarna_device_found and not args.show_all:
-        print("No Husqvarna devices found!")
-        print("Make sure your Automower is powered on and nearby.")
+    if expect and len(seen) < expect:
+        print(f"Only found {len(seen)} of {expect} device(s)", file=status)
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
@@ -56,5 +110,24 @@ if __name__ == "__main__":
         action="store_true",
         help="Scan and show all devices found, not just only Husqvarna devices.",
     )
+    parser.add_argument(
+        "--address",
+        metavar="<address>",
+        action="append",
+        help="Only show this device, can be given several times. "
+        "Scanning stops once all of them are found.",
+    )
+    parser.add_argument(
+        "--expect",
+        metavar="<count>",
+        type=int,
+        default=None,
+        help="Stop scanning as soon as this many devices are found.",
+    )
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        help="Print each device as a line of JSON as soon as it is found.",
+    )
     args = parser.parse_args()
-    asyncio.run(main(args))
+    sys.exit(asyncio.run(main(args)))
@@ -0,0 +1,82 @@
+"""
+A fake BleakClient that answers requests the way a mower does, used to
+exercise BLEClient without any Bluetooth hardware.
+"""
+
+import asyncio
+from automower_ble.helpers import crc
+
+
+def make_response(request: bytes, payload: bytes = b"", result: int = 0) -> bytearray:
+    """Build the response frame the mower sends for `request`"""
+    data = bytearray(request[:16])
+    data[10] = 0x01  # Packet type, response
+    data[16:] = bytes([result])
+    data += len(payload).to_bytes(2, byteorder="little")
+    data += payload
+    data[2:4] = (len(data) - 2).to_bytes(2, byteorder="little")
+    data[9] = crc(data, 1, 8)
+    data.append(crc(data, 1, len(data) - 1))
+    data.append(0x03)
+    return data
+
+
+class FakeBleakClient:
+    def __init__(self, notify, responder=None, delay: float = 0.0, mtu: int = 20):
+        """
+        `notify` is called with every notification the mower sends and
+        `responder` is called with every complete request and returns the
+        response payload, a (payload, result) tuple, or None to not answer
+        at all.
+        """
+        self.notify = notify
+        self.responder = responder if responder is not None else lambda r: b""
+        self.delay = delay
+        self.mtu = mtu
+        self.written = []
+        self.is_connected = True
+        self._buffer = bytearray()
+
+    async def write_gatt_char(self, char, data, response=False):
+        self._buffer += data
+        if len(self._buffer) < 4:
+            return
+        length = int.from_bytes(self._buffer[2:4], byteorder="little") + 4
+        if len(self._buffer) < length:
+            return
+
+        request = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        self.written.append(request)
+        asyncio.get_running_loop().call_later(self.delay, self._respond, request)
+
+    def _respond(self, request: bytes):
+        payload = self.responder(request)
+        if payload is None:
+            return
+        if isinstance(payload, tuple):
+            frame = make_response(request, *payload)
+        else:
+            frame = make_response(request, payload)
+        for i in range(0, len(frame), self.mtu):
+            self.notify(bytearray(frame[i : i + self.mtu]))
+
+    async def start_notify(self, char, callback):
+        pass
+
+    async def stop_notify(self, char):
+        pass
+
+    async def disconnect(self):
+        self.is_connected = False
+
+
+def attach(client, **kwargs) -> FakeBleakClient:
+    """Connect `client` to a fake mower, skipping the channel setup"""
+    fake = FakeBleakClient(
+        lambda data: client._notification_handler(None, data), **kwargs
+    )
+    client.client = fake
+    client.write_char = None
+    client.read_char = None
+    return fake
@@ -0,0 +1,91 @@
+import unittest
+from automower_ble.adapters import AdapterPool
+from automower_ble.fleet import Fleet
+from tests.test_fleet import FakeMower
+
+
+class BrokenAdapterMower(FakeMower):
+    """A mower that can't be reached through the adapters in `broken`"""
+
+    broken = set()
+
+    async def connect(self, device) -> bool:
+        if self.adapter in self.broken:
+            return False
+        return await super().connect(device)
+
+
+class TestAdapterPool(unittest.TestCase):
+    def test_assign_by_rssi_and_load(self):
+        pool = AdapterPool(["hci0", "hci1"], max_connections=2)
+        pool.update_rssi("a", "hci0", -80)
+        pool.update_rssi("a", "hci1", -60)
+
+        self.assertEqual(pool.assign("a").name, "hci1")
+        # Without RSSI readings the least loaded adapter wins
+        self.assertEqual(pool.assign("b").name, "hci0")
+        # The assignment is sticky
+        self.assertEqual(pool.assign("a").name, "hci1")
+
+        pool.release("b")
+        pool.update_rssi("c", "hci0", -70)
+        pool.update_rssi("c", "hci1", -66)
+        # hci1 is 4 dB better but already holds a connection
+        self.assertEqual(pool.assign("c").name, "hci0")
+
+        self.assertEqual(pool.assign("d").name, "hci0")
+        self.assertEqual(pool.assign("e").name, "hci1")
+        self.assertIsNone(pool.assign("f"))
+
+        pool.release("a")
+        self.assertEqual(pool.assign("f").name, "hci1")
+
+    def test_failed_adapter_is_rebalanced(self):
+        pool = AdapterPool(["hci0", "hci1"], failure_threshold=2, retry_after=60)
+        self.assertEqual(pool.assign("a").name, "hci0")
+        self.assertEqual(pool.assign("b").name, "hci1")
+
+        self.assertEqual(pool.record_failure("hci0"), [])
+        self.assertEqual(pool.record_failure("hci0"), ["a"])
+        self.assertTrue(pool.stats()["hci0"]["failed"])
+
+        self.assertEqual(pool.assign("a").name, "hci1")
+        self.assertEqual(pool.assign("c").name, "hci1")
+
+        pool.mark_recovered("hci0")
+        self.assertEqual(pool.assign("d").name, "hci0")
+
+    def test_failed_adapter_is_retried(self):
+        pool = AdapterPool(["hci0"], failure_threshold=1, retry_after=0)
+        pool.record_failure("hci0")
+
+        self.assertEqual(pool.assign("a").name, "hci0")
+        self.assertFalse(pool.stats()["hci0"]["failed"])
+
+
+class TestFleetAdapters(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        FakeMower.connected = 0
+        FakeMower.max_connected = 0
+
+    async def test_fleet_moves_mowers_off_broken_adapter(self):
+        pool = AdapterPool(["hci0", "hci1"], max_connections=2, failure_threshold=1)
+        fleet = Fleet(adapters=pool)
+        self.assertEqual(fleet.max_connections, 4)
+
+        BrokenAdapterMower.broken = {"hci0"}
+        first = fleet.add(BrokenAdapterMower("a"), device=object(), parameters=("x",))
+        second = fleet.add(BrokenAdapterMower("b"), device=object(), parameters=("x",))
+
+        self.assertIsNone(await fleet.poll(first))
+        self.assertTrue(pool.stats()["hci0"]["failed"])
+
+        self.assertIsNotNone(await fleet.poll(first))
+        self.assertIsNotNone(await fleet.poll(second))
+        self.assertEqual(first.mower.adapter, "hci1")
+        self.assertEqual(second.mower.adapter, "hci1")
+        self.assertEqual(pool.stats()["hci1"]["connections"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import argparse
+import io
+import json
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+import ble_scanner
+from automower_ble.scanner import HUSQVARNA_MANUFACTURER_ID
+
+
+def advertisement(address, manufacturer_id=HUSQVARNA_MANUFACTURER_ID):
+    device = SimpleNamespace(address=address, name="Automower")
+    data = SimpleNamespace(rssi=-60, manufacturer_data={manufacturer_id: b"\x01"})
+    return device, data
+
+
+class FakeScanner:
+    """Reports the advertisements as soon as scanning starts"""
+
+    advertisements = []
+
+    def __init__(self, detection_callback, **kwargs):
+        self.detection_callback = detection_callback
+
+    async def __aenter__(self):
+        for device, data in self.advertisements:
+            self.detection_callback(device, data)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+class TestBleScanner(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.scanner = ble_scanner.BleakScanner
+        ble_scanner.BleakScanner = FakeScanner
+
+    def tearDown(self):
+        ble_scanner.BleakScanner = self.scanner
+
+    async def scan(self, **kwargs) -> tuple:
+        args = argparse.Namespace(
+            macos_use_bdaddr=False,
+            timeout=5.0,
+            show_all=False,
+            address=None,
+            expect=None,
+            ndjson=True,
+        )
+        vars(args).update(kwargs)
+        output = io.StringIO()
+        with redirect_stdout(output):
+            result = await ble_scanner.main(args)
+        return result, [json.loads(line) for line in output.getvalue().splitlines()]
+
+    async def test_stops_once_expected_devices_are_found(self):
+        FakeScanner.advertisements = [
+            advertisement("aa:aa:aa:aa:aa:aa"),
+            advertisement("CC:CC:CC:CC:CC:CC", manufacturer_id=0x004C),
+            advertisement("AA:AA:AA:AA:AA:AA"),  # Seen again, in another case
+            advertisement("bb:bb:bb:bb:bb:bb"),
+            advertisement("dd:dd:dd:dd:dd:dd"),
+        ]
+        result, records = await self.scan(
+            address=["AA:AA:AA:AA:AA:AA", "bb:bb:bb:bb:bb:bb"]
+        )
+        self.assertEqual(result, 0)
+        self.assertEqual(
+            [r["address"] for r in records],
+            ["aa:aa:aa:aa:aa:aa", "bb:bb:bb:bb:bb:bb"],
+        )
+
+    async def test_expected_count_not_reached(self):
+        FakeScanner.advertisements = [advertisement("aa:aa:aa:aa:aa:aa")]
+        result, records = await self.scan(expect=2, timeout=0.01)
+        self.assertEqual(result, 1)
+        self.assertEqual(len(records), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
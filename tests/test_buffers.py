@@ -0,0 +1,109 @@
+import unittest
+import asyncio
+from automower_ble.buffers import BufferClosed, NotificationBuffer
+
+
+class TestNotificationBuffer(unittest.IsolatedAsyncioTestCase):
+    async def test_read_in_order(self):
+        buffer = NotificationBuffer(capacity=4, buffer_size=4)
+        buffer.put_nowait(b"\x01\x02")
+        buffer.put_nowait(b"\x03\x04\x05\x06\x07")  # Longer than buffer_size
+
+        data = bytearray()
+        self.assertEqual(await buffer.read_into(data, timeout=1), 2)
+        self.assertEqual(await buffer.read_into(data, timeout=1), 5)
+        self.assertEqual(data, bytearray(range(1, 8)))
+
+    async def test_overflow_drops_oldest(self):
+        buffer = NotificationBuffer(capacity=2)
+        for i in range(5):
+            buffer.put_nowait(bytes([i]))
+
+        data = bytearray()
+        await buffer.read_into(data, timeout=1)
+        await buffer.read_into(data, timeout=1)
+
+        self.assertEqual(data, b"\x03\x04")
+        self.assertEqual(buffer.stats()["overflows"], 3)
+        self.assertEqual(buffer.stats()["received"], 5)
+
+    async def test_waiting_reader(self):
+        buffer = NotificationBuffer()
+        data = bytearray()
+
+        reader = asyncio.create_task(buffer.read_into(data, timeout=1))
+        await asyncio.sleep(0)
+        buffer.put_nowait(b"\xaa")
+
+        self.assertEqual(await reader, 1)
+        self.assertEqual(data, b"\xaa")
+
+    async def test_timeout(self):
+        buffer = NotificationBuffer()
+
+        with self.assertRaises(asyncio.TimeoutError):
+            await buffer.read_into(bytearray(), timeout=0.01)
+
+    async def test_close_fails_reader(self):
+        buffer = NotificationBuffer()
+
+        reader = asyncio.create_task(buffer.read_into(bytearray(), timeout=10))
+        await asyncio.sleep(0)
+        buffer.close()
+
+        with self.assertRaises(BufferClosed):
+            await reader
+
+        # Notifications are ignored until the buffer is opened again
+        buffer.put_nowait(b"\x01")
+        self.assertEqual(len(buffer), 0)
+        buffer.open()
+        buffer.put_nowait(b"\x01")
+        self.assertEqual(len(buffer), 1)
+
+    async def test_cleared_after_wakeup(self):
+        buffer = NotificationBuffer()
+        reader = asyncio.create_task(buffer.read_into(bytearray(), timeout=10))
+        await asyncio.sleep(0)
+
+        # Woken but emptied again before the reader gets to run
+        buffer.put_nowait(b"\x01")
+        buffer.clear()
+        await asyncio.sleep(0)
+        self.assertFalse(reader.done())
+
+        buffer.put_nowait(b"\x02")
+        self.assertEqual(await reader, 1)
+
+        reader = asyncio.create_task(buffer.read_into(bytearray(), timeout=10))
+        await asyncio.sleep(0)
+        buffer.put_nowait(b"\x03")
+        buffer.close()
+        with self.assertRaises(BufferClosed):
+            await reader
+
+    async def test_several_readers(self):
+        buffer = NotificationBuffer()
+        data = bytearray()
+        readers = [
+            asyncio.create_task(buffer.read_into(data, timeout=1)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+        buffer.put_nowait(b"\x01")
+        buffer.put_nowait(b"\x02")
+
+        self.assertEqual(await asyncio.gather(*readers), [1, 1])
+        self.assertEqual(sorted(data), [1, 2])
+
+    def test_clear(self):
+        buffer = NotificationBuffer(capacity=2)
+        buffer.put_nowait(b"\x01")
+        buffer.put_nowait(b"\x02")
+        buffer.clear()
+
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(buffer.stats()["flushed"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
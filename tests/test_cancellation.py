@@ -0,0 +1,54 @@
+import unittest
+import asyncio
+import time
+from automower_ble.mower import Mower
+from tests.fake_mower import attach
+
+
+class TestCancellation(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mower = Mower(1197489075, "00:00:00:00:00:00")
+        # The mower never answers
+        self.fake = attach(self.mower, responder=lambda request: None)
+
+    async def test_cancel_propagates(self):
+        task = asyncio.create_task(self.mower.get_parameter("batteryLevel"))
+        await asyncio.sleep(0.05)
+
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await asyncio.wait_for(task, timeout=1)
+
+        # Only one attempt was made and the link is free again
+        self.assertEqual(len(self.fake.written), 1)
+        self.assertTrue(self.mower.scheduler.is_idle())
+
+    async def test_disconnect_fails_pending_requests(self):
+        tasks = [
+            asyncio.create_task(self.mower.get_parameter("batteryLevel"))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0.05)
+
+        start = time.monotonic()
+        await self.mower.disconnect()
+        results = await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(results, [None, None, None])
+        self.assertEqual(len(self.fake.written), 1)
+
+    async def test_disconnect_is_bounded(self):
+        async def hang(*args):
+            await asyncio.sleep(60)
+
+        self.fake.stop_notify = hang
+        self.fake.disconnect = hang
+
+        start = time.monotonic()
+        await self.mower.disconnect(timeout=0.1)
+        self.assertLess(time.monotonic() - start, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import io
+import json
+import struct
+from contextlib import redirect_stdout
+from automower_ble.codec import get_protocol
+from automower_ble.mower import Mower, parse_command, run_command, run_session
+from tests.fake_mower import attach
+
+
+class TestCommands(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        commands = {(s.major, s.minor): n for n, s in get_protocol().items()}
+        self.sent = []
+
+        def responder(request):
+            name = commands[struct.unpack_from("<HB", request, 12)]
+            self.sent.append(name)
+            if name == "batteryLevel":
+                return bytes([87])
+            if name == "getTask":
+                return struct.pack("<II7BH", request[18], 3600, 1, 0, 0, 0, 0, 0, 1, 0)
+            return b""
+
+        self.mower = Mower(0x5798CA1A, "00:00:00:00:00:00")
+        attach(self.mower, responder=responder)
+
+    def test_parse_command(self):
+        self.assertEqual(
+            parse_command("get getTask task=0x02 name='a b'"),
+            ("get", ["getTask"], {"task": 2, "name": "a b"}),
+        )
+
+    async def test_positional_arguments(self):
+        self.assertEqual(parse_command("override 3"), ("override", [3], {}))
+        self.assertEqual(parse_command("get 10"), ("get", ["10"], {}))
+
+        result = await run_command(self.mower, "override 3")
+        self.assertTrue(result["ok"], result.get("error"))
+        self.assertEqual(self.sent, ["setModeOfOperation", "overrideDuration"])
+
+    async def test_run_command(self):
+        result = await run_command(self.mower, "get getTask task=2")
+        self.assertTrue(result["ok"])
+        self.assertEqual(result["value"]["next_start_time"], 2)
+        self.assertEqual(result["value"]["on_sunday"], 1)
+        self.assertIn("elapsed_ms", result)
+
+        result = await run_command(self.mower, "jump")
+        self.assertFalse(result["ok"])
+        self.assertEqual(result["error"], "Unknown command: jump")
+
+    async def test_session(self):
+        source = io.StringIO(
+            "# comment\n\nget batteryLevel\npark\nget\nquit\nget batteryLevel\n"
+        )
+        output = io.StringIO()
+        with redirect_stdout(output):
+            await run_session(self.mower, source)
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(
+            [r["command"] for r in results], ["get batteryLevel", "park", "get"]
+        )
+        self.assertEqual(results[0]["value"], 87)
+        self.assertTrue(results[1]["ok"])
+        self.assertEqual(results[2]["error"], "Missing parameter name")
+        self.assertEqual(self.sent, ["batteryLevel", "park"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import json
+import subprocess
+import sys
+from automower_ble.codec import (
+    Command,
+    CommandSpec,
+    TaskInformation,
+    get_protocol,
+    jsonable,
+)
+from automower_ble.protocol import BLEClient
+
+
+class TestProtocolRegistry(unittest.TestCase):
+    def test_registry_is_shared(self):
+        client_one = BLEClient(1197489075, "00:00:00:00:00:00")
+        client_two = BLEClient(1739453030, "00:00:00:00:00:00")
+
+        self.assertIs(client_one.protocol, client_two.protocol)
+        self.assertIs(client_one.protocol["pin"], get_protocol()["pin"])
+
+    def test_spec_from_registry(self):
+        spec = get_protocol()["pin"]
+        self.assertIsInstance(spec, CommandSpec)
+        self.assertEqual(spec.name, "pin")
+        self.assertEqual((spec.major, spec.minor), (4664, 4))
+
+        command = Command(1739453030, spec)
+        self.assertEqual(
+            command.generate_request(code=7201).hex(),
+            "02fd120066f2ad6701ad00af381204000200211c7d03",
+        )
+
+    def test_unknown_request_type(self):
+        with self.assertRaises(ValueError):
+            CommandSpec(
+                {
+                    "major": 1,
+                    "minor": 1,
+                    "requestType": {"value": "float"},
+                    "responseType": "no_response",
+                }
+            )
+
+    def test_codec_does_not_import_bleak(self):
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys, automower_ble.codec; assert 'bleak' not in sys.modules",
+            ],
+            capture_output=True,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+
+class TestJsonable(unittest.TestCase):
+    def test_named_tuples_keep_their_fields(self):
+        task = TaskInformation(3600, 7200, 1, 0, 1, 0, 1, 0, 0)
+        value = jsonable([task, b"\x01\x02"])
+        self.assertEqual(value[0]["next_start_time"], 3600)
+        self.assertEqual(value[0]["on_sunday"], 0)
+        self.assertEqual(value[1], "0102")
+
+    def test_records_are_json_objects(self):
+        command = Command(1197489078, get_protocol()["deviceType"])
+        response = command.parse_response(
+            bytearray.fromhex("02fd1300b63b604701e601af5a1209000002001701c803")
+        )
+        expected = {"deviceType": 23, "deviceSubType": 1}
+        self.assertEqual(dict(response), expected)
+        self.assertEqual(json.loads(json.dumps(jsonable(response))), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+import unittest
+import asyncio
+import os
+import socket
+import stat
+import tempfile
+from automower_ble.codec import ResponseResult
+from automower_ble.daemon import DaemonClient, DaemonError, MowerDaemon
+from tests.test_fleet import FakeMower
+
+
+class CountingMower(FakeMower):
+    """Returns an incrementing battery level and records every request"""
+
+    def __init__(self, address):
+        super().__init__(address)
+        self.level = 50
+        self.connects = 0
+        self.unacknowledged = False
+
+    async def connect(self, device) -> bool:
+        self.connects += 1
+        return await super().connect(device)
+
+    async def set_parameter(self, name, priority=None, **kwargs):
+        await self.get_parameter(name, priority, **kwargs)
+        return None if self.unacknowledged else ResponseResult.OK
+
+    async def get_parameter(self, name, priority=None, **kwargs):
+        self.requests.append((name, kwargs))
+        await asyncio.sleep(0.02)
+        if name == "batteryLevel":
+            return self.level
+        if name == "getTask":
+            return {"next_start_time": kwargs["task"], "on_monday": True}
+        if name == "park":
+            self.level += 1
+            return None
+        raise KeyError(name)
+
+
+class TestDaemon(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "mower.sock")
+        self.mower = CountingMower("00:00:00:00:00:00")
+        self.daemon = MowerDaemon(self.mower, object(), self.path, cache_ttl=60)
+        await self.daemon.start()
+
+    async def asyncTearDown(self):
+        await self.daemon.stop()
+        self.tmp.cleanup()
+
+    async def test_deduplicate_and_cache(self):
+        async with DaemonClient(self.path) as a, DaemonClient(self.path) as b:
+            values = await asyncio.gather(
+                a.get("batteryLevel"), b.get("batteryLevel"), a.get("batteryLevel")
+            )
+            self.assertEqual(values, [50, 50, 50])
+            self.assertEqual(await b.get("batteryLevel"), 50)
+            self.assertEqual(
+                await b.get("getTask", task=1),
+                {
+                    "next_start_time": 1,
+                    "on_monday": True,
+                },
+            )
+
+            # A command invalidates the cache
+            await a.set("park")
+            self.assertEqual(await b.get("batteryLevel"), 51)
+
+            with self.assertRaises(DaemonError):
+                await a.get("unknown")
+
+        self.assertEqual(
+            [name for name, _ in self.mower.requests],
+            ["batteryLevel", "getTask", "park", "batteryLevel", "unknown"],
+        )
+        self.assertEqual(self.mower.connects, 1)
+        stats = self.daemon.stats()
+        self.assertEqual(stats["deduplicated"], 2)
+        self.assertEqual(stats["cache_hits"], 1)
+
+    async def test_socket(self):
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+
+        # The socket of a running daemon is left alone
+        other = MowerDaemon(CountingMower("a"), object(), self.path)
+        with self.assertRaises(FileExistsError):
+            await other.start()
+        self.assertTrue(os.path.exists(self.path))
+
+        path = os.path.join(self.tmp.name, "file")
+        with open(path, "w") as f:
+            f.write("data")
+        other = MowerDaemon(CountingMower("a"), object(), path)
+        with self.assertRaises(FileExistsError):
+            await other.start()
+        with open(path) as f:
+            self.assertEqual(f.read(), "data")
+
+    async def test_stale_socket(self):
+        await self.daemon.stop()
+        # A daemon that died without cleaning up leaves its socket behind
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(self.path)
+        stale.close()
+
+        self.daemon = MowerDaemon(self.mower, object(), self.path, cache_ttl=60)
+        await self.daemon.start()
+        async with DaemonClient(self.path) as client:
+            self.assertEqual(await client.get("batteryLevel"), 50)
+
+    async def test_cancelled_owner_keeps_shared_read(self):
+        owner = asyncio.create_task(self.daemon.get("batteryLevel", {}))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(self.daemon.get("batteryLevel", {}))
+        await asyncio.sleep(0)
+        owner.cancel()
+
+        self.assertEqual(await waiter, 50)
+        self.assertEqual(await self.daemon.get("batteryLevel", {}), 50)
+        self.assertEqual(len(self.mower.requests), 1)
+        self.assertEqual(self.daemon.stats()["cache_hits"], 1)
+
+    async def test_slow_subscriber_is_dropped(self):
+        self.daemon.MAX_WRITE_BUFFER = 0
+        reader, writer = await asyncio.open_unix_connection(self.path)
+        await asyncio.sleep(0.01)
+        # As if updates for the subscriber piled up as it never reads them
+        (server_writer,) = self.daemon.clients
+        server_writer.transport.get_write_buffer_size = lambda: 1
+
+        self.daemon.subscribe(server_writer, 1, "batteryLevel", {}, 0.01)
+        await asyncio.sleep(0.1)
+        self.assertTrue(server_writer.is_closing())
+        self.assertEqual(self.daemon.stats()["subscriptions"], 0)
+        writer.close()
+
+    async def test_unacknowledged_set(self):
+        self.mower.unacknowledged = True
+        async with DaemonClient(self.path) as client:
+            with self.assertRaises(DaemonError):
+                await client.set("park")
+            self.mower.unacknowledged = False
+            self.assertIsNone(await client.set("park"))
+
+    async def test_reconnect(self):
+        await self.mower.disconnect()
+        async with DaemonClient(self.path) as client:
+            self.assertEqual(await client.get("batteryLevel"), 50)
+        self.assertEqual(self.mower.connects, 2)
+
+    async def test_subscribe(self):
+        async with DaemonClient(self.path) as a, DaemonClient(self.path) as b:
+            first = a.subscribe("batteryLevel", interval=0.05)
+            second = b.subscribe("batteryLevel", interval=0.05)
+            self.assertEqual(await anext(first), 50)
+            self.assertEqual(await anext(second), 50)
+
+            await a.set("park")
+            self.assertEqual(await anext(first), 51)
+            self.assertEqual(await anext(second), 51)
+            self.assertEqual(self.daemon.stats()["subscriptions"], 1)
+
+            await first.aclose()
+            await second.aclose()
+            await asyncio.sleep(0.01)
+            self.assertEqual(self.daemon.stats()["subscriptions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import asyncio
+from automower_ble.faults import FaultInjector, FaultyClient, _percentile, run_workload
+from automower_ble.mower import Mower
+from tests.test_replay import ConnectableFake, responder
+
+CHANNEL_ID = 1197489075
+
+
+class TestFaults(unittest.IsolatedAsyncioTestCase):
+    async def run_with(self, connect_faults=None, **faults) -> tuple:
+        mower = Mower(CHANNEL_ID, "00:00:00:00:00:00")
+        mower.SETTLE_DELAY = 0.0
+        mower.RESPONSE_TIMEOUT = 0.02
+        mower.FRAGMENT_TIMEOUT = 0.02
+        mower._create_bleak_client = lambda device: ConnectableFake(
+            responder=responder, mtu=7
+        )
+        injector = FaultInjector(seed=42, **(connect_faults or {}))
+        injector.attach(mower)
+        self.assertTrue(await mower.connect(object()))
+
+        # Faults only start once connected
+        for fault, probability in faults.items():
+            setattr(injector, fault, probability)
+        stats = await run_workload(mower, ("batteryLevel", "serialNumber"), requests=50)
+        await mower.disconnect()
+        return stats, injector.stats()
+
+    async def test_no_faults(self):
+        stats, injected = await self.run_with()
+        self.assertEqual(stats["succeeded"], 50)
+        self.assertEqual(stats["recovered"], 0)
+        self.assertGreater(stats["goodput"], 0)
+        self.assertIsNotNone(stats["latency"]["p99"])
+        self.assertEqual(sum(injected.values()), 0)
+
+    async def test_reproducible(self):
+        first = await self.run_with(loss=0.2, duplicate=0.1, reorder=0.05)
+        second = await self.run_with(loss=0.2, duplicate=0.1, reorder=0.05)
+        self.assertEqual(first[1], second[1])
+        for key in ("succeeded", "failed", "recovered"):
+            self.assertEqual(first[0][key], second[0][key])
+
+    async def test_loss_is_recovered_by_retries(self):
+        stats, injected = await self.run_with(loss=0.1)
+        self.assertGreater(injected["loss"], 0)
+        self.assertGreater(stats["recovered"], 0)
+        # A lost first fragment times out and drops the link instead
+        self.assertGreater(stats["reconnects"], 0)
+        self.assertEqual(stats["succeeded"] + stats["failed"], 50)
+
+    async def test_corrupt_crc(self):
+        stats, injected = await self.run_with(corrupt=1.0)
+        self.assertGreater(injected["corrupt"], 0)
+        # A response with a bad header CRC is rejected
+        self.assertEqual(stats["succeeded"], 0)
+
+    async def test_delay_keeps_order(self):
+        stats, injected = await self.run_with(delay=0.5, max_delay=0.005)
+        self.assertGreater(injected["delay"], 0)
+        self.assertEqual(stats["succeeded"], 50)
+
+    async def test_disconnect_reconnects(self):
+        stats, injected = await self.run_with(disconnect=0.05)
+        self.assertGreater(injected["disconnect"], 0)
+        self.assertGreater(stats["reconnects"], 0)
+        self.assertGreater(stats["succeeded"], 0)
+
+    async def test_reorder_timer_is_cancelled(self):
+        delivered = []
+        injector = FaultInjector(seed=1, max_delay=0.05)
+        client = FaultyClient(ConnectableFake(responder=responder), injector)
+        await client.start_notify(None, lambda c, data: delivered.append(bytes(data)))
+
+        injector.reorder = 1.0
+        client._on_notification(None, b"1")
+        injector.reorder = 0.0
+        client._on_notification(None, b"2")  # Releases the held one
+        await asyncio.sleep(0.03)
+        injector.reorder = 1.0
+        client._on_notification(None, b"3")
+
+        # The timer of the first hold is gone, so "3" is held its full time
+        await asyncio.sleep(0.03)
+        self.assertEqual(delivered, [b"2", b"1"])
+        await asyncio.sleep(0.05)
+        self.assertEqual(delivered, [b"2", b"1", b"3"])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(_percentile(values, 0.5), 50)
+        self.assertEqual(_percentile(values, 0.99), 99)
+        self.assertEqual(_percentile([1, 2, 3, 4, 5], 0.5), 3)
+        self.assertEqual(_percentile([1, 2, 3, 4, 5], 0.9), 5)
+        self.assertEqual(_percentile([3], 0.9), 3)
+        self.assertIsNone(_percentile([], 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
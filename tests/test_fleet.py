@@ -0,0 +1,169 @@
+import unittest
+import asyncio
+from automower_ble.fleet import Fleet
+from automower_ble.scheduler import RequestPriority
+
+
+class FakeMower:
+    """Just enough of a Mower to be polled by a fleet"""
+
+    connected = 0
+    max_connected = 0
+
+    def __init__(self, address, reachable=True):
+        self.address = address
+        self.reachable = reachable
+        self.adapter = None
+        self.connected_now = False
+        self.requests = []
+
+    async def connect(self, device) -> bool:
+        if not self.reachable:
+            return False
+        FakeMower.connected += 1
+        FakeMower.max_connected = max(FakeMower.max_connected, FakeMower.connected)
+        self.connected_now = True
+        return True
+
+    async def disconnect(self):
+        FakeMower.connected -= 1
+        self.connected_now = False
+
+    def is_connected(self) -> bool:
+        return self.connected_now
+
+    async def get_parameter(self, name, priority=None, **kwargs):
+        self.requests.append((name, priority))
+        await asyncio.sleep(0.01)
+        return 42
+
+
+class TestFleet(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        FakeMower.connected = 0
+        FakeMower.max_connected = 0
+
+    async def test_connection_limit(self):
+        snapshots = []
+        fleet = Fleet(max_connections=2, on_snapshot=lambda m, s: snapshots.append(m))
+        mowers = [FakeMower("00:00:00:00:00:0%d" % i) for i in range(6)]
+        for mower in mowers:
+            fleet.add(mower, device=object(), parameters=("batteryLevel",))
+
+        await asyncio.gather(*(fleet.poll(m) for m in fleet.members.values()))
+
+        self.assertEqual(FakeMower.max_connected, 2)
+        self.assertEqual(FakeMower.connected, 0)
+        self.assertEqual(len(snapshots), 6)
+        self.assertEqual(
+            mowers[0].requests, [("batteryLevel", RequestPriority.BACKGROUND)]
+        )
+
+        stats = fleet.stats()
+        self.assertEqual(stats["polls"], 6)
+        self.assertEqual(stats["failures"], 0)
+        self.assertGreater(stats["average_wait"], 0)
+
+    async def test_stay_connected_within_limit(self):
+        fleet = Fleet(max_connections=1, disconnect_after_poll=False)
+        first = fleet.add(FakeMower("first"), device=object(), parameters=("a",))
+        second = fleet.add(FakeMower("second"), device=object(), parameters=("a",))
+
+        await fleet.poll(first)
+        self.assertTrue(first.mower.is_connected())
+
+        # The idle connection makes way for the other mower
+        await fleet.poll(second)
+        self.assertFalse(first.mower.is_connected())
+        self.assertTrue(second.mower.is_connected())
+        self.assertEqual(FakeMower.max_connected, 1)
+
+        await fleet.stop()
+        self.assertEqual(FakeMower.connected, 0)
+
+    async def test_concurrent_eviction(self):
+        class SlowDisconnectMower(FakeMower):
+            async def disconnect(self):
+                self.disconnects = getattr(self, "disconnects", 0) + 1
+                await asyncio.sleep(0.05)
+                await super().disconnect()
+
+        fleet = Fleet(max_connections=2, disconnect_after_poll=False)
+        members = [
+            fleet.add(
+                SlowDisconnectMower("M%d" % i), device=object(), parameters=("a",)
+            )
+            for i in range(4)
+        ]
+        for member in members[:2]:
+            await fleet.poll(member)
+
+        # Both need a slot while the first eviction is still disconnecting
+        await asyncio.gather(fleet.poll(members[2]), fleet.poll(members[3]))
+        self.assertEqual(FakeMower.max_connected, 2)
+        self.assertEqual([m.mower.disconnects for m in members[:2]], [1, 1])
+
+        await fleet.stop()
+        self.assertEqual(FakeMower.connected, 0)
+
+    async def test_priority_order(self):
+        fleet = Fleet(max_connections=1)
+        order = []
+        fleet.on_snapshot = lambda member, snapshot: order.append(member.address)
+
+        low = fleet.add(FakeMower("low"), device=object(), parameters=("a",))
+        high = fleet.add(
+            FakeMower("high"),
+            device=object(),
+            parameters=("a",),
+            priority=RequestPriority.INTERACTIVE,
+        )
+        first = fleet.add(FakeMower("first"), device=object(), parameters=("a",))
+
+        running = asyncio.create_task(fleet.poll(first))
+        await asyncio.sleep(0)
+        await asyncio.gather(running, fleet.poll(low), fleet.poll(high))
+
+        self.assertEqual(order, ["first", "high", "low"])
+
+    async def test_unreachable_mower(self):
+        fleet = Fleet()
+        member = fleet.add(FakeMower("away", reachable=False), device=object())
+
+        self.assertIsNone(await fleet.poll(member))
+        self.assertEqual(fleet.stats()["failures"], 1)
+
+    async def test_run_and_stop(self):
+        fleet = Fleet(max_connections=3)
+        for i in range(3):
+            fleet.add(FakeMower(str(i)), device=object(), interval=0.05)
+
+        runner = asyncio.create_task(fleet.run())
+        await asyncio.sleep(0.2)
+        await fleet.stop()
+        await runner
+
+        self.assertGreaterEqual(fleet.stats()["polls"], 6)
+        self.assertEqual(FakeMower.connected, 0)
+
+        with self.assertRaises(ValueError):
+            fleet.add(FakeMower("0"))
+
+    async def test_failing_callback_keeps_polling(self):
+        def on_snapshot(member, snapshot):
+            raise ValueError("No free slot")
+
+        fleet = Fleet(on_snapshot=on_snapshot)
+        member = fleet.add(
+            FakeMower("a"), device=object(), parameters=("a",), interval=0.02
+        )
+        runner = asyncio.create_task(fleet.run())
+        await asyncio.sleep(0.1)
+        self.assertFalse(member.task.done())
+        await fleet.stop()
+        await runner
+        self.assertGreater(member.polls, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
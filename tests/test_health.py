@@ -0,0 +1,105 @@
+import unittest
+import asyncio
+from automower_ble.health import HealthMonitor, LinkState
+from automower_ble.mower import Mower
+from tests.fake_mower import attach
+
+
+class ReconnectingMower(Mower):
+    """A mower that gets a fresh, healthy fake link on every connect"""
+
+    def __init__(self):
+        super().__init__(1197489075, "00:00:00:00:00:00")
+        self.connects = 0
+
+    async def connect(self, device) -> bool:
+        self.connects += 1
+        self.device = device
+        self.fake = attach(self, delay=0.01)
+        self._disconnected.clear()
+        self.notifications.open()
+        return True
+
+
+class TestHealthMonitor(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.mower = ReconnectingMower()
+        await self.mower.connect(object())
+
+    async def test_healthy(self):
+        monitor = HealthMonitor(self.mower)
+        for _ in range(3):
+            self.assertEqual(await monitor.check(), LinkState.HEALTHY)
+
+        stats = monitor.stats()
+        self.assertGreater(stats["rtt"], 0)
+        self.assertEqual(stats["reconnects"], 0)
+        self.assertEqual(stats["link"]["attempts"], 3)
+        self.assertEqual(len(self.mower.fake.written), 3)
+
+    async def test_no_response_reconnects(self):
+        self.mower.fake.responder = lambda request: None
+        monitor = HealthMonitor(self.mower, probe_timeout=0.1)
+
+        self.assertEqual(await monitor.check(), LinkState.HEALTHY)
+        self.assertEqual(monitor.reconnects, 1)
+        self.assertEqual(monitor.degraded, 1)
+        self.assertEqual(self.mower.connects, 2)
+        self.assertTrue(self.mower.scheduler.is_idle())
+
+        # The new link works
+        self.assertEqual(await monitor.check(), LinkState.HEALTHY)
+
+    async def test_rtt_drift(self):
+        monitor = HealthMonitor(self.mower, min_samples=3, reconnect=False)
+        for _ in range(3):
+            await monitor.check()
+
+        self.mower.fake.delay = 0.2
+        self.assertEqual(await monitor.check(), LinkState.DEGRADED)
+        self.assertIn("round trip", monitor.reason)
+        self.assertEqual(self.mower.connects, 1)
+
+    async def test_retry_rate(self):
+        monitor = HealthMonitor(self.mower, reconnect=False)
+        self.mower.attempts += 10
+        self.mower.retries += 5
+        self.assertEqual(await monitor.check(), LinkState.DEGRADED)
+        self.assertIn("retried", monitor.reason)
+
+        # Only requests since the last check count
+        self.assertEqual(await monitor.check(), LinkState.HEALTHY)
+
+    async def test_dropped_link_reconnects(self):
+        self.mower.fake.is_connected = False
+        monitor = HealthMonitor(self.mower)
+        self.assertEqual(await monitor.check(), LinkState.HEALTHY)
+        self.assertEqual(self.mower.connects, 2)
+
+    async def test_busy_link_is_left_alone(self):
+        self.mower.fake.is_connected = False
+        monitor = HealthMonitor(self.mower)
+        async with self.mower.scheduler.slot(0):
+            self.assertEqual(await monitor.check(), LinkState.DOWN)
+        self.assertEqual(self.mower.connects, 1)
+
+    async def test_busy_link_is_not_probed(self):
+        monitor = HealthMonitor(self.mower)
+        self.assertEqual(await monitor.check(), LinkState.HEALTHY)
+        self.mower.fake.responder = lambda request: None
+        async with self.mower.scheduler.slot(0):
+            self.assertEqual(await monitor.check(), LinkState.HEALTHY)
+        self.assertEqual(monitor.stats()["skipped"], 1)
+        self.assertEqual(monitor.degraded, 0)
+        self.assertEqual(len(self.mower.fake.written), 1)
+
+    async def test_runs_in_background(self):
+        self.mower.fake.is_connected = False
+        async with HealthMonitor(self.mower, interval=0.01) as monitor:
+            await asyncio.sleep(0.1)
+        self.assertGreater(monitor.checks, 0)
+        self.assertTrue(self.mower.is_connected())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+from automower_ble.inventory import Inventory, InventoryEntry
+from tests.test_fleet import FakeMower
+
+
+class ProbedMower(FakeMower):
+    """A mower that answers the inventory reads"""
+
+    def __init__(self, address, reachable=True, fail=False):
+        super().__init__(address, reachable)
+        self.fail = fail
+        self.reads = []
+        self.connect_kwargs = None
+
+    async def connect(self, device, **kwargs) -> bool:
+        self.connect_kwargs = kwargs
+        connected = await super().connect(device)
+        if self.fail:
+            raise RuntimeError("Handshake failed")
+        return connected
+
+    async def disconnect(self):
+        if self.connected_now:
+            await super().disconnect()
+
+    async def read_device_information(self):
+        return ("Automower", "Automower 305")
+
+    async def get_parameter(self, name, priority=None, **kwargs):
+        self.reads.append(name)
+        await asyncio.sleep(0.01)
+        if name == "deviceType":
+            return {"deviceType": 12, "deviceSubType": 1}
+        if name == "serialNumber":
+            return 1234
+        return None
+
+
+class TestInventory(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        FakeMower.connected = 0
+        FakeMower.max_connected = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "inventory.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_probe(self):
+        mowers = {}
+
+        def factory(address):
+            mowers[address] = ProbedMower(address, reachable=address != "bad")
+            return mowers[address]
+
+        inventory = Inventory(self.path, concurrency=2, mower_factory=factory)
+        addresses = ["a", "b", "c", "d", "bad"]
+        devices = {a: object() for a in addresses}
+        results = await inventory.probe(addresses, devices)
+
+        self.assertEqual(FakeMower.max_connected, 2)
+        self.assertEqual(FakeMower.connected, 0)
+        self.assertIsNone(results["bad"])
+        self.assertEqual(results["a"].model, "Automower 315X")
+        self.assertEqual(results["a"].manufacturer, "Husqvarna")
+        self.assertEqual(results["a"].serial_number, 1234)
+        self.assertEqual(mowers["a"].reads, ["deviceType", "serialNumber"])
+        self.assertFalse(mowers["a"].connect_kwargs["discover"])
+
+        with open(self.path) as f:
+            saved = json.load(f)["mowers"]
+        self.assertEqual(sorted(saved), ["a", "b", "c", "d"])
+        self.assertEqual(saved["b"]["name"], "Automower")
+
+        # Known mowers are not probed again
+        mowers.clear()
+        inventory = Inventory(self.path, mower_factory=factory)
+        results = await inventory.probe(["a", "e"], {"e": object()})
+        self.assertEqual(list(mowers), ["e"])
+        self.assertEqual(results["a"].device_type_name, "Automower 305")
+
+    async def test_failed_connect_disconnects(self):
+        mower = ProbedMower("a", fail=True)
+        inventory = Inventory(mower_factory=lambda address: mower)
+        results = await inventory.probe(["a"], {"a": object()})
+        self.assertIsNone(results["a"])
+        self.assertFalse(mower.is_connected())
+        self.assertEqual(FakeMower.connected, 0)
+
+    def test_unknown_model(self):
+        entry = InventoryEntry("a", device_type=99, device_sub_type=2)
+        self.assertEqual(entry.model, "Unknown Model (99, 2)")
+        self.assertIsNone(InventoryEntry("a").model)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import asyncio
+import json
+import os
+import struct
+import tempfile
+from automower_ble.codec import get_protocol
+from automower_ble.inventory import Inventory, InventoryEntry
+from automower_ble.metadata import MetadataCache
+from automower_ble.mower import Mower
+from automower_ble.protocol import TaskInformation
+from tests.fake_mower import attach
+
+ADDRESS = "00:00:00:00:00:00"
+
+
+def command_of(request):
+    """The (major, minor) of a request frame"""
+    return struct.unpack_from("<HB", request, 12)
+
+
+class TestMetadataCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "mowers.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_persistence(self):
+        cache = MetadataCache(self.path)
+        cache.update(ADDRESS, handles=[10, 12], serial_number=1234)
+
+        cache = MetadataCache(self.path)
+        self.assertEqual(cache.get(ADDRESS, "handles"), [10, 12])
+        self.assertTrue(cache.validate(ADDRESS, 1234))
+        self.assertIn(ADDRESS, cache.validated)
+
+    def test_serial_number_mismatch(self):
+        cache = MetadataCache(self.path)
+        cache.update(ADDRESS, handles=[10, 12], serial_number=1234)
+
+        self.assertFalse(cache.validate(ADDRESS, 5678))
+        self.assertIsNone(cache.get(ADDRESS, "handles"))
+        self.assertEqual(MetadataCache(self.path).get(ADDRESS, "serial_number"), 5678)
+
+    def test_shared_with_inventory(self):
+        cache = MetadataCache(self.path)
+        cache.update(ADDRESS, handles=[10, 12])
+
+        inventory = Inventory(self.path)
+        inventory.entries[ADDRESS] = InventoryEntry(
+            ADDRESS, device_type=12, device_sub_type=1, serial_number=1234
+        )
+        inventory.save()
+
+        cache = MetadataCache(self.path)
+        self.assertEqual(cache.get(ADDRESS, "handles"), [10, 12])
+        self.assertEqual(cache.get(ADDRESS, "device_type"), 12)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f)["mowers"][ADDRESS]["model"], "Automower 315X")
+
+
+class TestMetadataCacheSaving(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "mowers.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    async def test_writes_are_coalesced(self):
+        cache = MetadataCache(self.path)
+        cache.SAVE_DELAY = 0.01
+        cache.update(ADDRESS, handles=[10, 12])
+        cache.update(ADDRESS, serial_number=1234)
+        self.assertFalse(os.path.exists(self.path))
+
+        await asyncio.sleep(0.05)
+        reloaded = MetadataCache(self.path)
+        self.assertEqual(reloaded.get(ADDRESS, "handles"), [10, 12])
+        self.assertEqual(reloaded.get(ADDRESS, "serial_number"), 1234)
+
+    async def test_merges_with_inventory(self):
+        cache = MetadataCache(self.path)
+        inventory = Inventory(self.path)
+        inventory.entries[ADDRESS] = InventoryEntry(ADDRESS, serial_number=1234)
+        inventory.save()
+
+        # The cache was loaded before the inventory wrote its entry
+        cache.update(ADDRESS, handles=[10, 12], tasks=[])
+        cache.invalidate(ADDRESS)
+        cache.save()
+
+        reloaded = MetadataCache(self.path)
+        self.assertIsNone(reloaded.get(ADDRESS, "handles"))
+        self.assertEqual(reloaded.get(ADDRESS, "serial_number"), 1234)
+        self.assertEqual(reloaded.get(ADDRESS, "tasks"), [])
+
+
+class TestMowerMetadata(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        protocol = get_protocol()
+        self.commands = {
+            (spec.major, spec.minor): name for name, spec in protocol.items()
+        }
+        self.reads = []
+        self.task = TaskInformation(3600, 7200, 1, 0, 1, 0, 1, 0, 0)
+
+    def responder(self, request):
+        name = self.commands[command_of(request)]
+        self.reads.append(name)
+        if name == "deviceType":
+            return bytes([12, 1])
+        if name == "getNumberOfTasks":
+            return struct.pack("<I", 2)
+        if name == "getTask":
+            return struct.pack("<II7BH", *self.task, 0)
+        return b""
+
+    async def test_static_reads_are_cached(self):
+        cache = MetadataCache()
+        mower = Mower(0x5798CA1A, ADDRESS, metadata=cache)
+        attach(mower, responder=self.responder)
+
+        self.assertEqual(await mower.get_model(), "Automower 315X")
+        self.assertEqual(await mower.get_tasks(), [self.task, self.task])
+        self.assertEqual(
+            self.reads, ["deviceType", "getNumberOfTasks", "getTask", "getTask"]
+        )
+
+        # A new process with the same cache doesn't read anything
+        self.reads.clear()
+        mower = Mower(0x5798CA1A, ADDRESS, metadata=cache)
+        attach(mower, responder=self.responder)
+        self.assertEqual(await mower.get_manufacturer(), "Husqvarna")
+        self.assertEqual(await mower.get_tasks(), [self.task, self.task])
+        self.assertEqual(self.reads, [])
+
+        await mower.get_tasks(refresh=True)
+        self.assertEqual(self.reads, ["getNumberOfTasks", "getTask", "getTask"])
+
+
+if __name__ == "__main__":
+    unittest.main()
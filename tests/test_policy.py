@@ -0,0 +1,164 @@
+import unittest
+import asyncio
+import time
+from automower_ble.fleet import Fleet
+from automower_ble.policy import ConnectionPolicy, Decision, ManagedConnection
+from tests.test_fleet import FakeMower
+
+
+class KeepaliveMower(FakeMower):
+    def __init__(self, address, reachable=True, connect_time=0.05):
+        super().__init__(address, reachable)
+        self.connect_time = connect_time
+        self.connects = 0
+        self.keepalives = 0
+
+    async def connect(self, device) -> bool:
+        self.connects += 1
+        await asyncio.sleep(self.connect_time)
+        return await super().connect(device)
+
+    async def keepalive(self):
+        self.keepalives += 1
+
+
+class TestConnectionPolicy(unittest.TestCase):
+    def test_linger_without_history(self):
+        policy = ConnectionPolicy(default_reconnect_cost=5.0, max_linger=3.0)
+        self.assertEqual(policy.decide("a"), (Decision.LINGER, 3.0))
+
+    def test_decisions_follow_idle_time(self):
+        policy = ConnectionPolicy(alpha=1.0)
+        policy.record_connect("a", 4.0)
+
+        history = policy._get("a")
+        history.idle_time = 1.0
+        self.assertEqual(policy.decide("a")[0], Decision.HOLD)
+        history.idle_time = 6.0
+        self.assertEqual(policy.decide("a"), (Decision.LINGER, 4.0))
+        history.idle_time = 60.0
+        self.assertEqual(policy.decide("a")[0], Decision.DISCONNECT)
+
+        history.idle_time = 1.0
+        self.assertEqual(policy.decide("a", contended=True)[0], Decision.DISCONNECT)
+
+        stats = policy.stats()["a"]
+        self.assertEqual(stats["reconnect_cost"], 4.0)
+        self.assertEqual(stats["decisions"], {"hold": 1, "linger": 1, "disconnect": 2})
+
+    def test_learns_idle_time(self):
+        policy = ConnectionPolicy(alpha=0.5)
+        policy.decide("a")
+        policy._get("a").last_release = time.monotonic() - 10.0
+        policy.record_use("a", reused=True)
+        self.assertAlmostEqual(policy._get("a").idle_time, 10.0, places=1)
+
+        policy._get("a").last_release = time.monotonic() - 20.0
+        policy.record_use("a", reused=False)
+        self.assertAlmostEqual(policy._get("a").idle_time, 15.0, places=1)
+        self.assertEqual(policy.stats()["a"]["reuses"], 1)
+
+
+class TestManagedConnection(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        FakeMower.connected = 0
+        FakeMower.max_connected = 0
+
+    async def test_linger_then_disconnect(self):
+        mower = KeepaliveMower("a")
+        policy = ConnectionPolicy()
+        connection = ManagedConnection(mower, policy, keepalive_interval=0.01)
+
+        self.assertTrue(await connection.acquire())
+        self.assertEqual(await connection.release(), Decision.LINGER)
+        self.assertTrue(mower.is_connected())
+
+        await asyncio.sleep(0.2)
+        self.assertFalse(mower.is_connected())
+        self.assertGreater(mower.keepalives, 0)
+
+    async def test_hold_when_reused_quickly(self):
+        mower = KeepaliveMower("a")
+        policy = ConnectionPolicy()
+        connection = ManagedConnection(mower, policy, keepalive_interval=0.01)
+
+        await connection.acquire()
+        await connection.release()
+        # Reused while lingering, no reconnect needed
+        self.assertTrue(await connection.acquire())
+        self.assertEqual(mower.connects, 1)
+        self.assertEqual(await connection.release(), Decision.HOLD)
+
+        await asyncio.sleep(0.2)
+        self.assertTrue(mower.is_connected())
+        self.assertEqual(policy.stats()["a"]["reuses"], 1)
+
+        await connection.close()
+        self.assertFalse(mower.is_connected())
+
+    async def test_contended_disconnects(self):
+        mower = KeepaliveMower("a")
+        connection = ManagedConnection(mower, ConnectionPolicy())
+        async with connection.session(contended=lambda: True) as connected:
+            self.assertTrue(connected)
+        self.assertEqual(connection.last_decision, Decision.DISCONNECT)
+        self.assertFalse(mower.is_connected())
+
+    async def test_dropped_or_failed_link_is_cleaned_up(self):
+        async def failing_keepalive():
+            raise ConnectionError("No response")
+
+        for failing in (False, True):
+            mower = KeepaliveMower("a")
+            disconnects = []
+
+            async def disconnect():
+                disconnects.append(mower.is_connected())
+                if mower.is_connected():
+                    await mower.disconnect()
+
+            if failing:
+                mower.keepalive = failing_keepalive
+            connection = ManagedConnection(
+                mower,
+                ConnectionPolicy(),
+                keepalive_interval=0.01,
+                disconnect=disconnect,
+            )
+            await connection.acquire()
+            self.assertEqual(await connection.release(), Decision.LINGER)
+            if not failing:
+                mower.connected_now = False  # The link drops while lingering
+            await asyncio.sleep(0.05)
+
+            self.assertEqual(disconnects, [failing])
+            self.assertTrue(connection._idle_task.done())
+            self.assertFalse(mower.is_connected())
+
+    async def test_unreachable(self):
+        mower = KeepaliveMower("a", reachable=False)
+        connection = ManagedConnection(mower, ConnectionPolicy())
+        self.assertFalse(await connection.acquire())
+        self.assertEqual(await connection.release(), Decision.DISCONNECT)
+
+    async def test_fleet_reuses_and_evicts(self):
+        policy = ConnectionPolicy(default_reconnect_cost=10.0)
+        fleet = Fleet(max_connections=1, policy=policy)
+        first = fleet.add(KeepaliveMower("first"), device=object(), parameters=("a",))
+        second = fleet.add(KeepaliveMower("second"), device=object(), parameters=("a",))
+
+        await fleet.poll(first)
+        await fleet.poll(first)
+        self.assertEqual(first.mower.connects, 1)
+        self.assertTrue(first.mower.is_connected())
+
+        # The lingering connection makes way for the other mower
+        await fleet.poll(second)
+        self.assertFalse(first.mower.is_connected())
+        self.assertEqual(FakeMower.max_connected, 1)
+
+        stats = fleet.stats()
+        self.assertEqual(stats["policy"]["first"]["reuses"], 1)
+
+        await fleet.stop()
+        self.assertEqual(FakeMower.connected, 0)
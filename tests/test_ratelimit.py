@@ -0,0 +1,50 @@
+import unittest
+import time
+from automower_ble.ratelimit import TokenBucket
+from automower_ble.protocol import BLEClient
+
+
+class TestTokenBucket(unittest.IsolatedAsyncioTestCase):
+    async def test_burst_is_not_delayed(self):
+        bucket = TokenBucket(rate=10, burst=3)
+
+        for _ in range(3):
+            self.assertEqual(await bucket.acquire(), 0.0)
+
+        stats = bucket.stats()
+        self.assertEqual(stats["acquired"], 3)
+        self.assertEqual(stats["delayed"], 0)
+
+    async def test_sustained_rate(self):
+        bucket = TokenBucket(rate=100, burst=1)
+
+        start = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        elapsed = time.monotonic() - start
+
+        # The first request uses the burst, the other five wait 10ms each
+        self.assertGreaterEqual(elapsed, 0.045)
+        stats = bucket.stats()
+        self.assertEqual(stats["delayed"], 5)
+        self.assertGreater(stats["max_delay"], 0)
+
+    def test_invalid_configuration(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=1, burst=0)
+
+    def test_client_rate_limiting_disabled_by_default(self):
+        client = BLEClient(1197489075, "00:00:00:00:00:00")
+        self.assertIsNone(client.rate_limit_stats())
+
+        client = BLEClient(
+            1197489075, "00:00:00:00:00:00", requests_per_second=2, burst=4
+        )
+        self.assertEqual(client.rate_limiter.burst, 4)
+        self.assertEqual(client.rate_limit_stats()["acquired"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import unittest
+import os
+import struct
+import tempfile
+import time
+from types import SimpleNamespace
+from automower_ble.mower import Mower
+from automower_ble.replay import (
+    CONNECT,
+    DISCONNECT,
+    NOTIFY,
+    WRITE,
+    Recorder,
+    Replayer,
+    ReplayMismatch,
+    _Services,
+    load_recording,
+)
+from tests.fake_mower import FakeBleakClient
+
+CHANNEL_ID = 1197489075
+ADDRESS = "00:00:00:00:00:00"
+
+
+class ConnectableFake(FakeBleakClient):
+    """A fake mower that goes through the whole of BLEClient.connect()"""
+
+    def __init__(self, **kwargs):
+        super().__init__(lambda data: self.callback(None, data), **kwargs)
+        self.is_connected = False
+        self.services = _Services()
+        self._backend = SimpleNamespace(_mtu_size=None)
+        self.callback = None
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def pair(self):
+        pass
+
+    async def start_notify(self, char, callback):
+        self.callback = callback
+
+
+def responder(request):
+    if request[8] == 0x00:
+        return b""  # Channel setup and handshake
+    major, minor = struct.unpack_from("<HB", request, 12)
+    if (major, minor) == (4698, 10):  # serialNumber
+        return struct.pack("<I", 123456)
+    return bytes([87])
+
+
+async def session(mower):
+    """The session under test, a reading of a few parameters"""
+    assert await mower.connect(object())
+    values = [
+        await mower.get_parameter("batteryLevel"),
+        await mower.get_parameter("serialNumber"),
+        await mower.get_parameter("batteryLevel"),
+    ]
+    await mower.disconnect()
+    return values
+
+
+class TestReplay(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "session.amrp")
+
+        mower = Mower(CHANNEL_ID, ADDRESS)
+        mower.SETTLE_DELAY = 0.0
+        mower._create_bleak_client = lambda device: ConnectableFake(
+            responder=responder, delay=0.05, mtu=7
+        )
+        with Recorder(self.path, CHANNEL_ID) as recorder:
+            recorder.attach(mower)
+            self.values = await session(mower)
+
+    async def asyncTearDown(self):
+        self.tmp.cleanup()
+
+    def test_recording(self):
+        self.assertEqual(self.values, [87, 123456, 87])
+        recording = load_recording(self.path)
+        self.assertEqual(recording.channel_id, CHANNEL_ID)
+        self.assertEqual(recording.events[0][1], CONNECT)
+        self.assertEqual(recording.events[-1][1], DISCONNECT)
+        self.assertGreater(recording.count(WRITE), 0)
+        # Every response was split into several 7 byte notifications
+        self.assertGreater(recording.count(NOTIFY), 5 * 3)
+        self.assertGreater(recording.duration, 0.05 * 5)
+
+    async def test_replay_as_fast_as_possible(self):
+        recording = load_recording(self.path)
+        mower = Mower(CHANNEL_ID, ADDRESS)
+        replayer = Replayer(recording, strict=True)
+        replayer.attach(mower)
+
+        start = time.monotonic()
+        self.assertEqual(await session(mower), self.values)
+        self.assertLess(time.monotonic() - start, 0.2)
+
+        stats = replayer.stats()
+        self.assertEqual(stats["unmatched"], 0)
+        self.assertEqual(stats["notifications"], recording.count(NOTIFY))
+        self.assertEqual(stats["remaining"], 1)  # The final disconnect
+
+    async def test_replay_at_recorded_speed(self):
+        recording = load_recording(self.path)
+        mower = Mower(CHANNEL_ID, ADDRESS)
+        mower.SETTLE_DELAY = 0.0
+        Replayer(recording, speed=1.0).attach(mower)
+
+        start = time.monotonic()
+        self.assertEqual(await session(mower), self.values)
+        # Setup, handshake and three reads, each answered after 50 ms
+        self.assertGreaterEqual(time.monotonic() - start, 0.05 * 5)
+
+    async def test_strict_mismatch(self):
+        mower = Mower(CHANNEL_ID, ADDRESS)
+        Replayer(load_recording(self.path), strict=True).attach(mower)
+        self.assertTrue(await mower.connect(object()))
+        with self.assertRaises(ReplayMismatch):
+            await mower.get_parameter("mowerState")
+        await mower.disconnect()
+
+    def test_not_a_recording(self):
+        with open(self.path, "r+b") as f:
+            f.write(b"XXXX")
+        with self.assertRaises(ValueError):
+            load_recording(self.path)
+
+        with open(self.path, "wb") as f:
+            f.write(b"AMRP")
+        with self.assertRaises(ValueError):
+            load_recording(self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -170,6 +170,37 @@ class TestRequestMethods(unittest.TestCase):
             b"02fd10005314a513016900af3212020000004103",
         )
 
+    def test_generate_request_extended_types(self):
+        command = Command(
+            0x13A51453,
+            parameter={
+                "major": 4698,
+                "minor": 200,
+                "requestType": {"offset": "int8", "name": "string", "ids": "uint16[]"},
+                "responseType": "no_response",
+            },
+        )
+        request = command.generate_request(offset=-1, name="abc", ids=[1, 2])
+
+        self.assertEqual(binascii.hexlify(request[16:-2]), b"0a00ff036162630201000200")
+        self.assertEqual(int.from_bytes(request[2:4], byteorder="little"), 26)
+
+    def test_generate_request_long(self):
+        command = Command(
+            0x13A51453,
+            parameter={
+                "major": 4698,
+                "minor": 200,
+                "requestType": {"data": "bytes:300"},
+                "responseType": "no_response",
+            },
+        )
+        request = command.generate_request(data=b"\x01" * 300)
+
+        self.assertEqual(len(request), 320)
+        self.assertEqual(binascii.hexlify(request[2:4]), b"3c01")
+        self.assertEqual(binascii.hexlify(request[16:18]), b"2c01")
+
 
 if __name__ == "__main__":
     unittest.main()
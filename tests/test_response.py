@@ -1,8 +1,10 @@
 import unittest
 import json
 from importlib.resources import files
-from automower_ble.protocol import Command, MowerState, MowerActivity
+from automower_ble.codec import get_protocol
+from automower_ble.protocol import BLEClient, Command, MowerState, MowerActivity
 from automower_ble.models import MowerModels
+from tests.fake_mower import attach, make_response as make_response_frame
 
 
 class TestRequestMethods(unittest.TestCase):
@@ -106,6 +108,108 @@ class TestRequestMethods(unittest.TestCase):
             1,
         )
 
+    def test_decode_response_record(self):
+        command = Command(1197489078, get_protocol()["deviceType"])
+        response = command.parse_response(
+            bytearray.fromhex("02fd1300b63b604701e601af5a1209000002001701c803")
+        )
+
+        self.assertEqual(type(response).__name__, "DeviceTypeResponse")
+        self.assertEqual((response.deviceType, response.deviceSubType), (23, 1))
+        self.assertEqual(response["deviceSubType"], 1)
+        self.assertEqual(dict(response.items()), {"deviceType": 23, "deviceSubType": 1})
+        self.assertFalse(hasattr(response, "__dict__"))
+        with self.assertRaises(AttributeError):
+            response.deviceType = 5
+        with self.assertRaises(KeyError):
+            response["unknown"]
+
+        # Records of the same command share one type
+        other = command.parse_response(
+            bytearray.fromhex("02fd130038e38f0b01dc01af5a1209000002000c005903")
+        )
+        self.assertIs(type(other), type(response))
+
+    def test_decode_response_length_mismatch(self):
+        command = Command(1197489078, self.protocol["deviceType"])
+
+        with self.assertRaises(ValueError):
+            command.parse_response(
+                bytearray.fromhex("02fd1200b63b604701e601af5a12090000010017c803")
+            )
+
+    def test_decode_extended_types(self):
+        command = Command(
+            1197489078,
+            {
+                "major": 4698,
+                "minor": 200,
+                "responseType": {
+                    "offset": "int16",
+                    "name": "string",
+                    "model": "string:8",
+                    "blob": "bytes",
+                    "zones": "uint8[]",
+                    "times": "uint16[2]",
+                },
+            },
+        )
+        payload = (
+            (-2).to_bytes(2, byteorder="little", signed=True)
+            + b"\x05Mower"
+            + b"305\x00\x00\x00\x00\x00"
+            + b"\x03\x01\x02\x03"
+            + b"\x02\x07\x09"
+            + b"\x10\x00\x20\x00"
+        )
+        response = command.parse_response(make_response(payload))
+
+        self.assertEqual(response.offset, -2)
+        self.assertEqual(response.name, "Mower")
+        self.assertEqual(response.model, "305")
+        self.assertIsInstance(response.blob, memoryview)
+        self.assertEqual(response.blob, b"\x01\x02\x03")
+        self.assertEqual(response.zones, (7, 9))
+        self.assertEqual(response.times, (16, 32))
+
+        with self.assertRaises(ValueError):
+            command.parse_response(make_response(payload[:-1]))
+
+    def test_decode_long_response(self):
+        command = Command(
+            1197489078,
+            {"major": 4698, "minor": 200, "responseType": "bytes:300"},
+        )
+        frame = make_response(bytes(range(256)) + bytes(44))
+        self.assertEqual(int.from_bytes(frame[2:4], byteorder="little"), 317)
+        self.assertTrue(command.matches_response(frame))
+
+        response = command.parse_response(frame)
+        self.assertEqual(len(response.response), 300)
+        self.assertEqual(response.response[255], 255)
+
+
+class TestLongResponse(unittest.IsolatedAsyncioTestCase):
+    async def test_read_long_response(self):
+        client = BLEClient(1197489078, "00:00:00:00:00:00")
+        attach(client, responder=lambda request: bytes(range(256)) * 2)
+
+        command = Command(
+            client.channel_id,
+            {"major": 4698, "minor": 200, "responseType": "bytes:512"},
+        )
+        response = await client._request_response(command.generate_request())
+
+        self.assertEqual(len(response), 533)
+        self.assertTrue(command.validate_response(response))
+        self.assertEqual(command.parse_response(response).response[511], 255)
+
+
+def make_response(payload: bytes) -> bytearray:
+    """Wrap `payload` in a response frame for major 4698, minor 200"""
+    request = bytearray.fromhex("02fd1000b63b6047010000af5a12c800")
+    return make_response_frame(request, payload)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+import asyncio
+from types import SimpleNamespace
+from automower_ble.adapters import AdapterPool
+from automower_ble.fleet import Fleet
+from automower_ble.scanner import HUSQVARNA_MANUFACTURER_ID, ScannerService
+from tests.test_fleet import FakeMower
+
+
+class FakeScanner:
+    """Stands in for BleakScanner, advertisements are sent with `advertise()`"""
+
+    instances = []
+    lookups = []
+
+    def __init__(self, detection_callback, adapter=None):
+        self.callback = detection_callback
+        self.adapter = adapter
+        self.scanning = False
+        FakeScanner.instances.append(self)
+
+    async def start(self):
+        self.scanning = True
+
+    async def stop(self):
+        self.scanning = False
+
+    def advertise(self, address, rssi=-70, manufacturer_id=HUSQVARNA_MANUFACTURER_ID):
+        device = SimpleNamespace(address=address)
+        data = SimpleNamespace(rssi=rssi, manufacturer_data={manufacturer_id: b""})
+        self.callback(device, data)
+        return device
+
+    @classmethod
+    async def find_device_by_address(cls, address, timeout=10.0, **kwargs):
+        cls.lookups.append((address, kwargs))
+        return SimpleNamespace(address=address)
+
+
+class TestScannerService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        FakeScanner.instances = []
+        FakeScanner.lookups = []
+
+    async def test_cache(self):
+        async with ScannerService(scanner_factory=FakeScanner) as scanner:
+            fake = FakeScanner.instances[0]
+            device = fake.advertise("aa:bb:cc:dd:ee:ff")
+            fake.advertise("11:22:33:44:55:66", manufacturer_id=0x004C)
+
+            self.assertIs(await scanner.find_device("AA:BB:CC:DD:EE:FF"), device)
+            self.assertEqual(len(scanner.devices()), 1)
+
+            scanner.invalidate("aa:bb:cc:dd:ee:ff")
+            self.assertIsNone(scanner.get("aa:bb:cc:dd:ee:ff"))
+
+        self.assertFalse(fake.scanning)
+        self.assertEqual(scanner.stats()["hits"], 1)
+
+    async def test_ttl_and_lru(self):
+        scanner = ScannerService(ttl=0.05, max_entries=2, scanner_factory=FakeScanner)
+        await scanner.start()
+        fake = FakeScanner.instances[0]
+        fake.advertise("a")
+        fake.advertise("b")
+        fake.advertise("a")
+        fake.advertise("c")
+
+        # "b" was the least recently seen
+        self.assertIsNone(scanner.get("b"))
+        self.assertIsNotNone(scanner.get("a"))
+        self.assertEqual(scanner.stats()["evictions"], 1)
+
+        await asyncio.sleep(0.1)
+        self.assertIsNone(scanner.get("a"))
+        self.assertEqual(scanner.devices(), [])
+        await scanner.stop()
+
+    async def test_wait_for_advertisement(self):
+        async with ScannerService(scanner_factory=FakeScanner) as scanner:
+            fake = FakeScanner.instances[0]
+            asyncio.get_running_loop().call_later(0.01, fake.advertise, "a")
+            device = await scanner.find_device("a", timeout=1)
+            self.assertEqual(device.address, "a")
+
+            self.assertIsNone(await scanner.find_device("b", timeout=0.01))
+        self.assertEqual(FakeScanner.lookups, [])
+
+    async def test_fallback_scan(self):
+        scanner = ScannerService(scanner_factory=FakeScanner)
+        device = await scanner.find_device("a", adapter="hci1")
+        self.assertEqual(device.address, "a")
+        self.assertEqual(FakeScanner.lookups, [("a", {"adapter": "hci1"})])
+
+    async def test_adapters(self):
+        pool = AdapterPool(["hci0", "hci1"])
+        scanner = ScannerService(
+            adapters=["hci0", "hci1"], pool=pool, scanner_factory=FakeScanner
+        )
+        await scanner.start()
+        hci0, hci1 = FakeScanner.instances
+        self.assertEqual(hci1.adapter, "hci1")
+
+        hci0.advertise("a", rssi=-80)
+        near = hci1.advertise("a", rssi=-50)
+        self.assertIs(scanner.get("a").device, near)
+        self.assertEqual(scanner.get("a", "hci0").rssi, -80)
+        self.assertEqual(pool.rssi["A"], {"hci0": -80, "hci1": -50})
+        # The mower goes to the adapter that hears it best
+        self.assertEqual(pool.assign("a").name, "hci1")
+        await scanner.stop()
+
+    async def test_fleet_uses_cache(self):
+        scanner = ScannerService(scanner_factory=FakeScanner)
+        await scanner.start()
+        FakeScanner.instances[0].advertise("A")
+        FakeScanner.instances[0].advertise("B")
+
+        fleet = Fleet(scanner=scanner)
+        reachable = fleet.add(FakeMower("A"), parameters=("batteryLevel",))
+        unreachable = fleet.add(
+            FakeMower("B", reachable=False), parameters=("batteryLevel",)
+        )
+
+        self.assertIsNotNone(await fleet.poll(reachable))
+        self.assertIsNone(await fleet.poll(unreachable))
+        self.assertEqual(scanner.stats()["hits"], 2)
+        # The failed mower is dropped so its next connection looks it up again
+        self.assertIsNotNone(scanner.get("A"))
+        self.assertIsNone(scanner.get("B"))
+        await scanner.stop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+import asyncio
+import json
+from importlib.resources import files
+from automower_ble.mower import Mower
+from automower_ble.protocol import Command
+from automower_ble.scheduler import RequestPriority, RequestScheduler, priority_for
+from tests.fake_mower import attach
+
+
+class TestRequestScheduler(unittest.IsolatedAsyncioTestCase):
+    async def test_higher_priority_is_served_first(self):
+        scheduler = RequestScheduler()
+        order = []
+
+        async def request(name, priority):
+            async with scheduler.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire(RequestPriority.INTERACTIVE)
+        tasks = [
+            asyncio.create_task(request("poll-1", RequestPriority.BACKGROUND)),
+            asyncio.create_task(request("read", RequestPriority.INTERACTIVE)),
+            asyncio.create_task(request("poll-2", RequestPriority.BACKGROUND)),
+            asyncio.create_task(request("park", RequestPriority.CONTROL)),
+        ]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+        self.assertEqual(order, ["park", "read", "poll-1", "poll-2"])
+        self.assertTrue(scheduler.is_idle())
+
+    async def test_cancelled_waiter_is_skipped(self):
+        scheduler = RequestScheduler()
+
+        await scheduler.acquire(RequestPriority.CONTROL)
+        waiter = asyncio.create_task(scheduler.acquire(RequestPriority.INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+
+        scheduler.release()
+        self.assertTrue(scheduler.is_idle())
+
+    async def test_background_waiter_sets_no_preempt(self):
+        scheduler = RequestScheduler()
+
+        await scheduler.acquire(RequestPriority.BACKGROUND)
+        waiter = asyncio.create_task(scheduler.acquire(RequestPriority.BACKGROUND))
+        await asyncio.sleep(0)
+        self.assertFalse(scheduler.preempt.is_set())
+
+        control = asyncio.create_task(scheduler.acquire(RequestPriority.CONTROL))
+        await asyncio.sleep(0)
+        self.assertTrue(scheduler.preempt.is_set())
+
+        scheduler.release()
+        await control
+        scheduler.release()
+        await waiter
+        scheduler.release()
+
+    def test_default_priorities(self):
+        self.assertEqual(priority_for("park"), RequestPriority.CONTROL)
+        self.assertEqual(priority_for("batteryLevel"), RequestPriority.INTERACTIVE)
+
+
+class TestMowerPriority(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            self.protocol = json.load(f)
+
+    async def test_control_preempts_background_polling(self):
+        mower = Mower(1197489075, "00:00:00:00:00:00")
+        park = Command(mower.channel_id, self.protocol["park"])
+        park_request = bytes(park.generate_request())
+
+        def responder(request):
+            if request == park_request:
+                return b""
+            return b"\x64"  # batteryLevel = 100
+
+        fake = attach(mower, responder=responder, delay=0.05)
+
+        polls = [
+            asyncio.create_task(
+                mower.get_parameter("batteryLevel", RequestPriority.BACKGROUND)
+            )
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0.01)
+        await mower._request_response(park.generate_request(), RequestPriority.CONTROL)
+
+        # Only the poll that was already on the air went before the park
+        self.assertEqual(fake.written.index(park_request), 1)
+        self.assertEqual(await asyncio.gather(*polls), [100] * 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+import struct
+from automower_ble.codec import get_protocol
+from automower_ble.mower import Mower
+from automower_ble.protocol import _valid_frame
+from tests.fake_mower import attach, make_response
+
+CHANNEL_ID = 1197489075
+
+
+class TestSession(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.commands = {
+            (spec.major, spec.minor): name for name, spec in get_protocol().items()
+        }
+        self.mower = Mower(CHANNEL_ID, "00:00:00:00:00:00", pin=1234)
+        self.mower.SESSION_PROBE_TIMEOUT = 0.1
+        self.sent = []
+        self.logged_in = True
+        self.channel_open = True
+        self.pin_result = 0
+
+    def responder(self, request):
+        if request[8] == 0x00:
+            # Channel setup and handshake aren't linked command frames
+            self.sent.append("handshake" if len(request) == 14 else "setup")
+            self.channel_open = True
+            return b""
+
+        name = self.commands[struct.unpack_from("<HB", request, 12)]
+        self.sent.append(name)
+        if not self.channel_open:
+            return None
+        if name == "isOperatorLoggedIn":
+            return bytes([self.logged_in])
+        if name == "pin":
+            self.logged_in = self.pin_result == 0
+            return (b"", self.pin_result)
+        return b""
+
+    async def connect(self) -> bool:
+        """Reconnect, only the session setup of connect() is exercised"""
+        await self.mower.disconnect()
+        attach(self.mower, responder=self.responder)
+        self.mower._disconnected.clear()
+        self.mower.notifications.open()
+        self.sent.clear()
+        return await self.mower._setup_session()
+
+    async def test_full_handshake(self):
+        self.assertTrue(await self.connect())
+        self.assertEqual(self.sent, ["setup", "handshake", "pin"])
+        self.assertTrue(self.mower.session.authenticated)
+        self.assertEqual(self.mower.link_stats()["handshakes"], 1)
+
+    async def test_quick_reconnect_resumes(self):
+        await self.connect()
+        self.assertTrue(await self.connect())
+        self.assertEqual(self.sent, ["isOperatorLoggedIn"])
+        self.assertEqual(self.mower.link_stats()["resumed_sessions"], 1)
+
+    async def test_resume_sends_pin_when_logged_out(self):
+        await self.connect()
+        self.logged_in = False
+        self.assertTrue(await self.connect())
+        self.assertEqual(self.sent, ["isOperatorLoggedIn", "pin"])
+        self.assertTrue(self.mower.session.authenticated)
+
+    async def test_forgotten_channel_falls_back(self):
+        await self.connect()
+        self.channel_open = False
+        self.assertTrue(await self.connect())
+        self.assertEqual(self.sent, ["isOperatorLoggedIn", "setup", "handshake", "pin"])
+        self.assertEqual(self.mower.link_stats()["handshakes"], 2)
+
+    async def test_expired_session(self):
+        await self.connect()
+        self.mower.SESSION_TTL = 0
+        self.assertTrue(await self.connect())
+        self.assertEqual(self.sent, ["setup", "handshake", "pin"])
+
+    async def test_disconnect_does_not_refresh(self):
+        await self.connect()
+        # Nothing was heard from the mower since, however recently the
+        # link was dropped
+        self.mower.session.last_seen -= self.mower.SESSION_TTL + 1
+        self.assertTrue(await self.connect())
+        self.assertEqual(self.sent, ["setup", "handshake", "pin"])
+
+    async def test_failed_request_forgets_session(self):
+        await self.connect()
+        self.mower.RESPONSE_TIMEOUT = 0.01
+        self.mower.REQUEST_ATTEMPTS = 2
+        self.channel_open = False
+        self.assertIsNone(await self.mower.get_parameter("batteryLevel"))
+        self.assertIsNone(self.mower.session)
+
+    async def test_rejected_pin(self):
+        self.pin_result = 9  # INVALID_PIN
+        self.assertTrue(await self.connect())
+        self.assertFalse(self.mower.session.authenticated)
+
+        # Not logged in, so the PIN is tried again on a quick reconnect
+        self.assertTrue(await self.connect())
+        self.assertEqual(self.sent, ["isOperatorLoggedIn", "pin"])
+
+    def test_valid_frame(self):
+        request = self.mower.generate_request_handshake()
+        response = make_response(request)
+        self.assertTrue(_valid_frame(response, CHANNEL_ID))
+        self.assertFalse(_valid_frame(response, CHANNEL_ID + 1))
+
+        # A corrupted body with an intact header
+        corrupted = bytearray(response)
+        corrupted[12] ^= 0xFF
+        self.assertFalse(_valid_frame(corrupted, CHANNEL_ID))
+
+        response[9] ^= 0xFF
+        self.assertFalse(_valid_frame(response))
+        self.assertFalse(_valid_frame(response[:-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
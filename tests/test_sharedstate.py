@@ -0,0 +1,140 @@
+import unittest
+import os
+import tempfile
+import threading
+from automower_ble.codec import SnapshotLayout
+from automower_ble.sharedstate import StatePublisher, StateReader
+
+PARAMETERS = ("batteryLevel", "isCharging", "deviceType", "getStatuses")
+
+
+class TestSnapshotLayout(unittest.TestCase):
+    def test_round_trip(self):
+        layout = SnapshotLayout(PARAMETERS)
+        snapshot = {
+            "batteryLevel": 87,
+            "isCharging": True,
+            "deviceType": {"deviceType": 12, "deviceSubType": 1},
+            "getStatuses": None,
+        }
+        decoded = layout.unpack_from(layout.pack(snapshot))
+        self.assertEqual(decoded["batteryLevel"], 87)
+        self.assertEqual(decoded["isCharging"], 1)
+        self.assertEqual(decoded["deviceType"].deviceSubType, 1)
+        self.assertIsNone(decoded["getStatuses"])
+
+    def test_schema_hash(self):
+        self.assertEqual(
+            SnapshotLayout(PARAMETERS).schema_hash,
+            SnapshotLayout(PARAMETERS).schema_hash,
+        )
+        self.assertNotEqual(
+            SnapshotLayout(PARAMETERS).schema_hash,
+            SnapshotLayout(PARAMETERS[:2]).schema_hash,
+        )
+        with self.assertRaises(ValueError):
+            SnapshotLayout(["getTask", "getMessage", "keepalive"])
+
+
+class TestSharedState(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "state")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_publish_and_read(self):
+        publisher = StatePublisher(self.path, PARAMETERS, slots=2)
+        reader = StateReader(self.path, PARAMETERS)
+        self.assertIsNone(reader.read("a"))
+
+        publisher.publish("a", {"batteryLevel": 10}, timestamp=1.0)
+        publisher.publish("b", {"batteryLevel": 20}, timestamp=2.0)
+        publisher.publish("a", {"batteryLevel": 11}, timestamp=3.0)
+
+        timestamp, snapshot = reader.read("a")
+        self.assertEqual((timestamp, snapshot["batteryLevel"]), (3.0, 11))
+        self.assertEqual(reader.read("b")[1]["batteryLevel"], 20)
+        self.assertEqual(sorted(reader.read_all()), ["a", "b"])
+
+        with self.assertRaises(ValueError):
+            publisher.publish("c", {})
+        with self.assertRaises(ValueError):
+            StateReader(self.path, PARAMETERS[:2])
+
+        reader.close()
+        publisher.close()
+
+    def test_long_addresses(self):
+        publisher = StatePublisher(self.path, PARAMETERS, slots=2)
+        reader = StateReader(self.path, PARAMETERS)
+        # macOS identifies peripherals by UUID rather than MAC address
+        address = "5A1B2C3D-4E5F-6A7B-8C9D-0E1F2A3B4C5D"
+        publisher.publish(address, {"batteryLevel": 10}, timestamp=1.0)
+        self.assertEqual(reader.read(address)[0], 1.0)
+
+        with self.assertRaises(ValueError):
+            publisher.publish("x" * 65, {})
+        reader.close()
+        publisher.close()
+
+    def test_restart_keeps_readers_mapped(self):
+        publisher = StatePublisher(self.path, PARAMETERS, slots=4)
+        publisher.publish("a", {"batteryLevel": 10})
+        publisher.close()
+        reader = StateReader(self.path, PARAMETERS)
+        size = os.path.getsize(self.path)
+
+        # A restart with fewer slots neither shrinks the file nor
+        # leaves the mowers of the previous run behind
+        publisher = StatePublisher(self.path, PARAMETERS, slots=2)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(reader.read_all(), {})
+        publisher.publish("b", {"batteryLevel": 20})
+        self.assertEqual(reader.read("b")[1]["batteryLevel"], 20)
+        reader.close()
+        publisher.close()
+
+    def test_readers_never_see_torn_writes(self):
+        publisher = StatePublisher(self.path, ("batteryLevel", "getStatuses"))
+        reader = StateReader(self.path, ("batteryLevel", "getStatuses"))
+        fields = ("totalRunningTime", "totalCuttingTime", "numberOfCollisions")
+        done = threading.Event()
+
+        def write():
+            for i in range(1, 5000):
+                statuses = dict.fromkeys(
+                    [
+                        "totalRunningTime",
+                        "totalCuttingTime",
+                        "totalChargingTime",
+                        "totalSearchingTime",
+                        "numberOfCollisions",
+                        "numberOfChargingCycles",
+                        "cuttingBladeUsageTime",
+                    ],
+                    i,
+                )
+                publisher.publish(
+                    "a", {"batteryLevel": i % 100, "getStatuses": statuses}
+                )
+            done.set()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        reads = 0
+        while not done.is_set():
+            state = reader.read("a")
+            if state is None:
+                continue
+            statuses = state[1]["getStatuses"]
+            self.assertEqual(len({statuses[f] for f in fields}), 1)
+            self.assertEqual(state[1]["batteryLevel"], statuses[fields[0]] % 100)
+            reads += 1
+        writer.join()
+        self.assertGreater(reads, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
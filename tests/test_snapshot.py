@@ -0,0 +1,81 @@
+import unittest
+from automower_ble.codec import TaskInformation
+from automower_ble.fleet import DEFAULT_POLL_PARAMETERS
+from automower_ble.snapshot import (
+    HEADER,
+    SnapshotCodec,
+    decode_messages,
+    decode_statuses,
+    decode_tasks,
+    encode_messages,
+    encode_statuses,
+    encode_tasks,
+)
+
+
+class TestSnapshot(unittest.TestCase):
+    def test_snapshot(self):
+        codec = SnapshotCodec(DEFAULT_POLL_PARAMETERS)
+        snapshot = {
+            "batteryLevel": 87,
+            "isCharging": False,
+            "mowerState": 2,
+            "mowerActivity": 3,
+            "nextStartTime": 1700000000,
+            "errorCode": None,
+        }
+        data = codec.encode(snapshot, 1234.5)
+        self.assertEqual(len(data), HEADER.size + 8 + 4 + 1 + 1 + 1 + 1 + 4 + 4)
+
+        timestamp, decoded = codec.decode(data)
+        self.assertEqual(timestamp, 1234.5)
+        self.assertEqual(decoded, snapshot)
+
+        with self.assertRaises(ValueError):
+            SnapshotCodec(DEFAULT_POLL_PARAMETERS[:-1]).decode(data)
+        with self.assertRaises(ValueError):
+            codec.decode(data[:-1])
+        with self.assertRaises(ValueError):
+            codec.decode(b"JSON" + data[4:])
+
+    def test_statuses(self):
+        statuses = {
+            "totalRunningTime": 1,
+            "totalCuttingTime": 2,
+            "totalChargingTime": 3,
+            "totalSearchingTime": 4,
+            "numberOfCollisions": 5,
+            "numberOfChargingCycles": 6,
+            "cuttingBladeUsageTime": 7,
+        }
+        decoded = decode_statuses(encode_statuses(statuses))
+        self.assertEqual(dict(decoded.items()), statuses)
+        self.assertEqual(decoded.numberOfCollisions, 5)
+
+        # A record count of zero, the mower didn't answer
+        self.assertIsNone(decode_statuses(encode_statuses(None)))
+
+    def test_tasks(self):
+        tasks = [
+            TaskInformation(3600, 7200, 1, 0, 1, 0, 1, 0, 0),
+            TaskInformation(0, 60, 0, 0, 0, 0, 0, 1, 1),
+        ]
+        data = encode_tasks(tasks)
+        self.assertEqual(decode_tasks(data), tasks)
+        self.assertEqual(decode_tasks(encode_tasks([])), [])
+
+        # Tasks and messages have different schemas
+        with self.assertRaises(ValueError):
+            decode_messages(data)
+
+    def test_messages(self):
+        messages = [
+            {"messageTime": 1700000000, "code": 13, "severity": 2},
+            {"messageTime": 1700000100, "code": 1, "severity": 0},
+        ]
+        decoded = decode_messages(encode_messages(messages))
+        self.assertEqual([dict(m.items()) for m in decoded], messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
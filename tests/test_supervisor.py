@@ -0,0 +1,155 @@
+import unittest
+import asyncio
+import multiprocessing
+import os
+import tempfile
+from automower_ble import fleet
+from automower_ble.supervisor import MowerConfig, Supervisor, _worker
+from tests.test_fleet import FakeMower
+
+
+class CrashingMower(FakeMower):
+    """Kills its worker process the first time it is polled"""
+
+    async def get_parameter(self, name, priority=None, **kwargs):
+        marker = os.path.join(os.environ["SUPERVISOR_TEST_DIR"], self.address)
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(3)
+        return await super().get_parameter(name, priority, **kwargs)
+
+
+def create_fake_mower(config):
+    if config.address.startswith("crash"):
+        return CrashingMower(config.address), object()
+    return FakeMower(config.address), object()
+
+
+class TestSupervisor(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.environ["SUPERVISOR_TEST_DIR"] = self.tmp.name
+
+    def tearDown(self):
+        del os.environ["SUPERVISOR_TEST_DIR"]
+        self.tmp.cleanup()
+
+    async def run_until(self, supervisor, condition, timeout=20):
+        async def wait():
+            while not condition():
+                await asyncio.sleep(0.05)
+
+        runner = asyncio.create_task(supervisor.run())
+        try:
+            await asyncio.wait_for(wait(), timeout)
+        finally:
+            await supervisor.stop()
+            await runner
+
+    def test_sharding(self):
+        mowers = [MowerConfig("mower-%d" % i) for i in range(5)]
+        supervisor = Supervisor(mowers, adapters=["hci0", "hci1"])
+
+        self.assertEqual(len(supervisor.workers), 2)
+        self.assertEqual(supervisor.workers[0].adapters, ["hci0"])
+        self.assertEqual(supervisor.workers[1].adapters, ["hci1"])
+        self.assertEqual(
+            [c.address for _, c in supervisor.workers[0].shard],
+            ["mower-0", "mower-2", "mower-4"],
+        )
+        with self.assertRaises(ValueError):
+            Supervisor(mowers, workers=3, adapters=["hci0", "hci1"])
+
+    async def test_snapshots(self):
+        mowers = [
+            MowerConfig("mower-%d" % i, parameters=("batteryLevel", "errorCode"))
+            for i in range(4)
+        ]
+        received = []
+        supervisor = Supervisor(
+            mowers,
+            workers=2,
+            on_snapshot=lambda config, snapshot: received.append(config.address),
+            check_interval=0.1,
+            mower_factory=create_fake_mower,
+        )
+
+        await self.run_until(supervisor, lambda: len(supervisor.snapshots) == 4)
+
+        self.assertEqual(sorted(received[:4]), [c.address for c in mowers])
+        _, snapshot = supervisor.snapshots["mower-0"]
+        self.assertEqual(snapshot, {"batteryLevel": 42, "errorCode": 42})
+        for worker in supervisor.workers:
+            self.assertFalse(worker.process.is_alive())
+
+    async def test_restart(self):
+        mowers = [MowerConfig("crash-0"), MowerConfig("mower-1")]
+        supervisor = Supervisor(
+            mowers,
+            workers=2,
+            check_interval=0.1,
+            mower_factory=create_fake_mower,
+        )
+
+        await self.run_until(supervisor, lambda: "crash-0" in supervisor.snapshots)
+
+        self.assertEqual(supervisor.workers[0].restarts, 1)
+        self.assertFalse(supervisor.workers[0].retired)
+
+    async def test_reassign(self):
+        mowers = [MowerConfig("crash-0"), MowerConfig("mower-1")]
+        supervisor = Supervisor(
+            mowers,
+            workers=2,
+            max_restarts=0,
+            check_interval=0.1,
+            mower_factory=create_fake_mower,
+        )
+
+        await self.run_until(supervisor, lambda: "crash-0" in supervisor.snapshots)
+
+        self.assertTrue(supervisor.workers[0].retired)
+        self.assertEqual(len(supervisor.workers[1].shard), 2)
+        self.assertEqual(supervisor.stats()["workers"][1]["mowers"], 2)
+
+    async def test_worker_stops_once_on_eof(self):
+        stops = []
+        stop = fleet.Fleet.stop
+
+        async def slow_stop(self):
+            stops.append(self)
+            await asyncio.sleep(0.2)
+            await stop(self)
+
+        fleet.Fleet.stop = slow_stop
+        try:
+            parent, child = multiprocessing.Pipe()
+            shard = [(0, MowerConfig("mower-0", parameters=("batteryLevel",)))]
+            worker = asyncio.create_task(
+                _worker(shard, None, None, child, create_fake_mower)
+            )
+            await asyncio.sleep(0.05)
+            # The supervisor goes away
+            parent.close()
+            await asyncio.wait_for(worker, 5)
+        finally:
+            fleet.Fleet.stop = stop
+            child.close()
+        # Once for the EOF, once more as run() finishes
+        self.assertLessEqual(len(stops), 2)
+
+    def test_retire_to_exited_worker(self):
+        mowers = [MowerConfig("mower-%d" % i) for i in range(4)]
+        supervisor = Supervisor(mowers, workers=2)
+        parent, child = multiprocessing.Pipe()
+        child.close()
+        supervisor.workers[1].conn = parent
+
+        supervisor._retire(supervisor.workers[0])
+        # The mowers wait in the shard for the worker to be restarted
+        self.assertEqual(len(supervisor.workers[1].shard), 4)
+        parent.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
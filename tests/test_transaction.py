@@ -0,0 +1,91 @@
+import unittest
+import json
+from importlib.resources import files
+from automower_ble.mower import Mower
+from automower_ble.protocol import Command, ModeOfOperation, ResponseResult
+from tests.fake_mower import attach
+
+
+class TestTransaction(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        with files("automower_ble").joinpath("protocol.json").open("r") as f:
+            self.protocol = json.load(f)
+
+        self.mower = Mower(0x5798CA1A, "00:00:00:00:00:00")
+
+    def request_for(self, name, **kwargs):
+        command = Command(self.mower.channel_id, self.protocol[name])
+        return bytes(command.generate_request(**kwargs))
+
+    async def test_override_is_pipelined(self):
+        written_before_response = []
+
+        def responder(request):
+            written_before_response.append(len(fake.written))
+            return b""
+
+        fake = attach(self.mower, responder=responder, delay=0.01)
+
+        await self.mower.mower_override(duration_hours=3)
+
+        self.assertEqual(
+            fake.written,
+            [
+                self.request_for(
+                    "setModeOfOperation", mode=ModeOfOperation.MANUAL.value
+                ),
+                self.request_for("overrideDuration", duration=3 * 3600),
+            ],
+        )
+        # Both requests were on the air before the first acknowledgement
+        self.assertEqual(written_before_response, [2, 2])
+
+    async def test_per_command_results(self):
+        busy = self.request_for("pause")
+
+        def responder(request):
+            if request == busy:
+                return (b"", ResponseResult.DEVICE_BUSY.value)
+            return b"\x05"
+
+        attach(self.mower, responder=responder)
+
+        async with self.mower.transaction() as transaction:
+            transaction.add("mowerState")
+            transaction.add("pause")
+
+        self.assertEqual(
+            [(r.name, r.result) for r in transaction.results],
+            [("mowerState", ResponseResult.OK), ("pause", ResponseResult.DEVICE_BUSY)],
+        )
+        self.assertEqual(transaction.results[0].value["response"], 5)
+        self.assertFalse(transaction.succeeded())
+
+    async def test_missing_acknowledgement(self):
+        park = self.request_for("park")
+        attach(self.mower, responder=lambda r: None if r == park else b"")
+
+        async with self.mower.transaction(timeout=0.1) as transaction:
+            transaction.add("resume")
+            transaction.add("park")
+
+        self.assertEqual(transaction.results[0].result, ResponseResult.OK)
+        self.assertIsNone(transaction.results[1].result)
+
+    async def test_set_parameter_is_sent(self):
+        fake = attach(self.mower)
+
+        result = await self.mower.set_parameter("park")
+
+        self.assertEqual(result, ResponseResult.OK)
+        self.assertEqual(fake.written, [self.request_for("park")])
+
+    async def test_set_parameter_without_acknowledgement(self):
+        self.mower.RESPONSE_TIMEOUT = 0.01
+        self.mower.REQUEST_ATTEMPTS = 1
+        attach(self.mower, responder=lambda r: None)
+        self.assertIsNone(await self.mower.set_parameter("park"))
+
+
+if __name__ == "__main__":
+    unittest.main()
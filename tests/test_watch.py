@@ -0,0 +1,79 @@
+import unittest
+import asyncio
+import gc
+from automower_ble.mower import Mower
+from automower_ble.watch import WatchHub
+from tests.fake_mower import attach
+
+
+class TestWatch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.values = {"a": 0, "b": 100}
+        self.polls = []
+
+        async def poll(name):
+            self.polls.append(name)
+            await asyncio.sleep(0)
+            return self.values[name]
+
+        self.hub = WatchHub(poll)
+
+    async def test_shared_poll(self):
+        first = self.hub.watch(["a"], interval=0.01)
+        second = self.hub.watch(["a"], interval=0.05)
+        self.assertEqual(await anext(first), 0)
+        self.assertEqual(await anext(second), 0)
+
+        self.values["a"] = 1
+        self.assertEqual(await anext(first), 1)
+        self.assertEqual(await anext(second), 1)
+
+        # One poller at the shortest interval
+        self.assertEqual(self.hub.stats(), {"a": {"watchers": 2, "polls": 2}})
+
+        first.close()
+        second.close()
+        self.assertEqual(self.hub.stats(), {})
+        polls = len(self.polls)
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(self.polls), polls)
+
+        with self.assertRaises(StopAsyncIteration):
+            await anext(first)
+
+    async def test_conflation(self):
+        async with self.hub.watch(["a"], interval=0.001) as watch:
+            self.assertEqual(await anext(watch), 0)
+            for i in range(1, 20):
+                self.values["a"] = i
+                await asyncio.sleep(0.003)
+            # The values in between were skipped
+            self.assertEqual(await anext(watch), 19)
+
+    async def test_snapshot(self):
+        async with self.hub.watch(["a", "b"], interval=0.01) as watch:
+            self.assertEqual(await anext(watch), {"a": 0, "b": 100})
+            self.values["b"] = 101
+            self.assertEqual(await anext(watch), {"a": 0, "b": 101})
+
+    async def test_abandoned_watch_stops_polling(self):
+        watch = self.hub.watch(["a"], interval=0.01)
+        await anext(watch)
+        del watch
+        gc.collect()
+        self.assertEqual(self.hub.stats(), {})
+
+    async def test_mower_watch(self):
+        mower = Mower(0x5798CA1A, "00:00:00:00:00:00")
+        fake = attach(mower, responder=lambda request: bytes([55]))
+
+        async with mower.watch("batteryLevel", interval=0.01) as first:
+            async with mower.watch("batteryLevel", interval=0.01) as second:
+                self.assertEqual(await anext(first), 55)
+                self.assertEqual(await anext(second), 55)
+                self.assertEqual(len(fake.written), 1)
+        self.assertEqual(mower.watch_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()